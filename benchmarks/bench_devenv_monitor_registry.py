@@ -0,0 +1,74 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Micro-benchmark for resolving the available Dev Env Monitor classes
+
+Compares the three ways DevEnvMonitorManager could get its class registry:
+
+    registry  - the process level registry (the hot path in workers)
+    imports   - discovering the classes by importing the monitor_* modules
+    redis     - resolving the classes from the `##AVAILABLE_DEV_ENV_MONITOR_CLASSES##` redis hash
+
+Requires a running redis server. Usage: PYTHONPATH=. python benchmarks/bench_devenv_monitor_registry.py [iterations]
+"""
+import importlib
+import sys
+import timeit
+
+import redis
+
+from lmcommon.activity.monitors.devenv import DevEnvMonitorManager
+
+
+REDIS_KEY = '##BENCHMARK_AVAILABLE_DEV_ENV_MONITOR_CLASSES##'
+
+
+def resolve_from_redis() -> dict:
+    """Resolve monitor classes the way DevEnvMonitorManager used to, connecting to redis and reading a hash of
+    class paths"""
+    redis_conn = redis.Redis(db=1)
+    result_dict = {}
+    for key, value in redis_conn.hgetall(REDIS_KEY).items():
+        module_name, class_name = value.decode('utf-8').rsplit('.', 1)
+        result_dict[key.decode('utf-8')] = getattr(importlib.import_module(module_name), class_name)
+    return result_dict
+
+
+def main(iterations: int) -> None:
+    manager = DevEnvMonitorManager()
+
+    redis_conn = redis.Redis(db=1)
+    for key, cls in manager.available_monitors.items():
+        redis_conn.hset(REDIS_KEY, key, f"{cls.__module__}.{cls.__name__}")
+
+    try:
+        assert resolve_from_redis() == manager._register_monitor_classes() == manager.available_monitors
+
+        results = {'registry': timeit.timeit(lambda: DevEnvMonitorManager(), number=iterations),
+                   'imports': timeit.timeit(lambda: manager._register_monitor_classes(), number=iterations),
+                   'redis': timeit.timeit(lambda: resolve_from_redis(), number=iterations)}
+    finally:
+        redis_conn.delete(REDIS_KEY)
+
+    for name, total in results.items():
+        print(f"{name:>10}: {total / iterations * 1e6:10.2f} us/call")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,82 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Benchmark for per-operation overhead of small repository operations with each git backend
+
+Creates a small temporary repository with some history, then times common operations (status, dirty check, history,
+single commit lookup, branch listing, and add + commit) with the GitPython, subprocess shim and libgit2 backends.
+
+Usage: PYTHONPATH=. python benchmarks/bench_git_backends.py [iterations]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+from lmcommon.gitlib import GitFilesystem, GitFilesystemShimmed
+from lmcommon.gitlib.git_libgit2 import GitFilesystemLibgit2
+
+
+def main(iterations: int) -> None:
+    working_dir = tempfile.mkdtemp()
+    try:
+        config = {"backend": "filesystem", "working_directory": working_dir, "commit_cache": False}
+        setup_git = GitFilesystem(config)
+        setup_git.initialize()
+        for i in range(50):
+            with open(os.path.join(working_dir, f"file{i % 10}.txt"), 'at') as f:
+                f.write(f"line {i}\n")
+            setup_git.add_all()
+            setup_git.commit(f"commit {i}")
+
+        implementations = {'gitpython': GitFilesystem(config),
+                           'shim': GitFilesystemShimmed(config),
+                           'libgit2': GitFilesystemLibgit2(config)}
+        counter = [0]
+
+        def add_commit(git):
+            counter[0] += 1
+            filename = os.path.join(working_dir, f"bench{counter[0]}.txt")
+            with open(filename, 'wt') as f:
+                f.write("benchmark\n")
+            git.add(filename)
+            git.commit(f"bench commit {counter[0]}")
+
+        operations = {'status': lambda git: git.status(),
+                      'is_dirty': lambda git: git.is_dirty(),
+                      'log(max_count=10)': lambda git: git.log(max_count=10),
+                      'log_entry': lambda git: git.log_entry(git.commit_hash),
+                      'list_branches': lambda git: git.list_branches(),
+                      'add + commit': add_commit}
+
+        print(f"{'operation':>20} " + " ".join(f"{name:>12}" for name in implementations))
+        for op_name, op in operations.items():
+            timings = []
+            for git in implementations.values():
+                op(git)
+                total = timeit.timeit(lambda: op(git), number=iterations)
+                timings.append(f"{total / iterations * 1000:9.2f} ms")
+            print(f"{op_name:>20} " + " ".join(f"{t:>12}" for t in timings))
+    finally:
+        shutil.rmtree(working_dir)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
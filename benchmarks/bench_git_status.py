@@ -0,0 +1,89 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""Benchmark for computing repository status with the GitPython and porcelain v2 implementations
+
+Creates a temporary repository with a number of committed files, then modifies, deletes, stages and adds some of
+them before timing GitFilesystem.status (GitPython) against GitFilesystemShimmed.status (`git status
+--porcelain=v2`), with and without git's untracked cache.
+
+Usage: PYTHONPATH=. python benchmarks/bench_git_status.py [num_files] [iterations]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+from git import Repo
+
+from lmcommon.gitlib import GitFilesystem, GitFilesystemShimmed
+
+
+def create_repo(working_dir: str, num_files: int) -> None:
+    """Create a repository with `num_files` committed files spread across directories, then dirty it"""
+    repo = Repo.init(working_dir)
+    for i in range(num_files):
+        directory = os.path.join(working_dir, f"dir{i % 20}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{i}.txt"), 'wt') as f:
+            f.write(f"content {i}\n")
+    repo.git.add(A=True)
+    repo.index.commit("initial commit")
+
+    for i in range(0, num_files, 50):
+        with open(os.path.join(working_dir, f"dir{i % 20}", f"file{i}.txt"), 'at') as f:
+            f.write("modified\n")
+    for i in range(1, num_files, 100):
+        os.remove(os.path.join(working_dir, f"dir{i % 20}", f"file{i}.txt"))
+    for i in range(num_files // 100):
+        with open(os.path.join(working_dir, f"dir{i % 20}", f"untracked{i}.txt"), 'wt') as f:
+            f.write("untracked\n")
+    for i in range(2, num_files, 100):
+        filename = os.path.join(working_dir, f"dir{i % 20}", f"file{i}.txt")
+        with open(filename, 'at') as f:
+            f.write("staged\n")
+        repo.git.add(filename)
+
+
+def main(num_files: int, iterations: int) -> None:
+    working_dir = tempfile.mkdtemp()
+    try:
+        create_repo(working_dir, num_files)
+        config = {"backend": "filesystem", "working_directory": working_dir}
+        implementations = {'gitpython': GitFilesystem(config),
+                           'porcelain-v2': GitFilesystemShimmed(config),
+                           'porcelain-v2+uc': GitFilesystemShimmed(dict(config, untracked_cache=True))}
+
+        # Warm up, and check the implementations agree
+        results = [git.status() for git in implementations.values()]
+        assert all(r == results[0] for r in results)
+
+        print(f"{num_files} files, {len(results[0]['staged'])} staged, {len(results[0]['unstaged'])} unstaged, "
+              f"{len(results[0]['untracked'])} untracked")
+        for name, git in implementations.items():
+            total = timeit.timeit(git.status, number=iterations)
+            print(f"{name:>16}: {total / iterations * 1000:10.2f} ms/call")
+    finally:
+        shutil.rmtree(working_dir)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -23,7 +23,9 @@ from typing import (Any, Dict, List, Optional)
 import redis
 
 from lmcommon.activity import ActivityRecord, ActivityStore, ActivityType
-from lmcommon.activity.processors.processor import ActivityProcessor, ExecutionData
+from lmcommon.activity.monitors.metrics import MonitorMetrics
+from lmcommon.activity.processors.processor import ActivityProcessor, ActivityPipelineProcessor, ExecutionData, \
+    walk_execution_data
 from lmcommon.configuration import get_docker_client
 from lmcommon.labbook import LabBook
 from lmcommon.gitlib.git import GitAuthor
@@ -72,6 +74,9 @@ class ActivityMonitor(metaclass=abc.ABCMeta):
         # A flag indicating if the activity record is OK to store
         self.can_store_activity_record = False
 
+        # Per-stage timing and throughput metrics, published to redis by the monitor loop
+        self.metrics = MonitorMetrics(monitor_key)
+
     def add_processor(self, processor_instance: ActivityProcessor) -> None:
         """
 
@@ -102,8 +107,9 @@ class ActivityMonitor(metaclass=abc.ABCMeta):
         Returns:
             str
         """
-        self.labbook.git.add_all()
-        commit = self.labbook.git.commit("Auto-commit from activity monitoring")
+        with self.metrics.timer('git_commit'):
+            self.labbook.git.add_all()
+            commit = self.labbook.git.commit("Auto-commit from activity monitoring")
         return commit.hexsha
 
     def store_activity_record(self, linked_commit: str, activity_record: ActivityRecord) -> Optional[str]:
@@ -119,7 +125,11 @@ class ActivityMonitor(metaclass=abc.ABCMeta):
         activity_record.linked_commit = linked_commit
 
         # Create a activity record
-        record = self.activity_store.create_activity_record(activity_record)
+        with self.metrics.timer('store_activity_record'):
+            record = self.activity_store.create_activity_record(activity_record)
+
+        for stage, seconds in self.activity_store.timings.items():
+            self.metrics.record_time(f"activity_store.{stage}", seconds)
 
         return record.commit
 
@@ -139,11 +149,23 @@ class ActivityMonitor(metaclass=abc.ABCMeta):
         activity_record = ActivityRecord(activity_type=activity_type)
 
         # Get git status for tracking file changes
-        status = self.labbook.git.status()
+        with self.metrics.timer('git_status'):
+            status = self.labbook.git.status()
+
+        # Walk the execution data a single time, dispatching entries to all pipeline processors
+        with self.metrics.timer('process.walk'):
+            pipeline_processors = [p for p in self.processors if isinstance(p, ActivityPipelineProcessor)]
+            for pp in pipeline_processors:
+                pp.begin(activity_record, status, metadata)
+            walk_execution_data(pipeline_processors, activity_record, data)
 
-        # Run processors to populate the record
+        # Finish populating the record, running processors in the order they were registered
         for p in self.processors:
-            activity_record = p.process(activity_record, data, status, metadata)
+            with self.metrics.timer(f"process.{type(p).__name__}"):
+                if isinstance(p, ActivityPipelineProcessor):
+                    activity_record = p.end(activity_record, data, status, metadata)
+                else:
+                    activity_record = p.process(activity_record, data, status, metadata)
 
         return activity_record
 
@@ -23,7 +23,6 @@ import os
 from typing import (Any, Dict, List, Optional)
 
 import importlib
-import redis
 from pkg_resources import resource_filename
 
 from lmcommon.logging import LMLogger
@@ -50,41 +49,31 @@ class DevEnvMonitor(metaclass=abc.ABCMeta):
         raise NotImplemented
 
 
+# Process level registry of available Dev Env Monitor classes, populated on first use
+_MONITOR_CLASS_REGISTRY: Optional[Dict[str, Any]] = None
+
+
 class DevEnvMonitorManager(object):
     """Class to manage creating DevEnvMonitor instances"""
 
     def __init__(self, database=1) -> None:
-        # Get available monitor classes from redis or register available classes
-        # Redis is used to store this information to reduce the overhead of re-registering all classes every time
-        # DevEnvMonitorManager is instantiated, which happens often, both in the LabManager API and in async workers
-        redis_conn = redis.Redis(db=database)
-        data = redis_conn.hgetall('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##')
-        if data:
-            # Load the class info from redis
-            # TODO: verify if loading from imports is actually faster than using this redis cache implementation
-            result_dict = {}
-            for key in data:
-                # Decode from bytes to strings if needed
-                value = data[key]
-                if type(key) == bytes:
-                    key = key.decode('utf-8')
-                if type(value) == bytes:
-                    value = value.decode('utf-8')
-
-                module_name, class_name = value.rsplit('.', 1)
-                # load the module
-                m = importlib.import_module(module_name)
-                # get the class and store
-                result_dict[key] = getattr(m, class_name)
-
-            self.available_monitors = result_dict
-        else:
-            self.available_monitors = self._register_monitor_classes()
-            for key in self.available_monitors:
-                logger.info("Registering DevEnvMonitor Class: {} for {}".format(self.available_monitors[key], key))
-                redis_conn.hset('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##', key,
-                                "{}.{}".format(self.available_monitors[key].__module__,
-                                               self.available_monitors[key].__name__))
+        """Constructor
+
+        Available monitor classes are discovered once per process and cached in a module level registry, since
+        DevEnvMonitorManager is instantiated often, both in the LabManager API and in async workers. After the first
+        instance, construction is a dictionary lookup instead of a redis round trip plus an import per class (see
+        benchmarks/bench_devenv_monitor_registry.py).
+
+        Args:
+            database(int): Unused, retained for compatibility
+        """
+        global _MONITOR_CLASS_REGISTRY
+        if _MONITOR_CLASS_REGISTRY is None:
+            _MONITOR_CLASS_REGISTRY = self._register_monitor_classes()
+            for key in _MONITOR_CLASS_REGISTRY:
+                logger.info("Registering DevEnvMonitor Class: {} for {}".format(_MONITOR_CLASS_REGISTRY[key], key))
+
+        self.available_monitors = _MONITOR_CLASS_REGISTRY
 
     def _register_monitor_classes(self) -> Dict[str, Any]:
         """Private method to register all available Dev Env Monitor classes
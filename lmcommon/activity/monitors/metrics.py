@@ -0,0 +1,160 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import time
+from contextlib import contextmanager
+from typing import (Dict, Iterator)
+
+import redis
+
+from lmcommon.logging import LMLogger
+
+logger = LMLogger.get_logger()
+
+
+class MonitorMetrics(object):
+    """Class to collect per-stage timing and throughput metrics for an activity monitor and publish them to redis
+
+    Metrics are written to a redis hash named `activity_monitor_metrics:<monitor key>`, so monitors that are falling
+    behind can be identified per project. Timings for a stage are stored as `<stage>.last`, `<stage>.max`,
+    `<stage>.total` and `<stage>.count` (seconds and calls).
+    """
+
+    def __init__(self, monitor_key: str, flush_interval: float = 5.0, ttl: int = 86400) -> None:
+        """Constructor
+
+        Args:
+            monitor_key(str): Unique key for the activity monitor in redis
+            flush_interval(float): Minimum number of seconds between writes to redis
+            ttl(int): Number of seconds the metrics hash is kept after the last write
+        """
+        self.key = f"activity_monitor_metrics:{monitor_key}"
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+
+        self.values: Dict[str, float] = dict()
+
+        # Messages received since the last flush, used to compute the receive rate
+        self.window_start = time.time()
+        self.window_messages = 0
+        self.last_flush = 0.0
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Method to increment a counter
+
+        Args:
+            name(str): Name of the counter
+            value(float): Amount to increment by
+
+        Returns:
+            None
+        """
+        self.values[name] = self.values.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Method to set a gauge to its current value
+
+        Args:
+            name(str): Name of the gauge
+            value(float): Current value
+
+        Returns:
+            None
+        """
+        self.values[name] = value
+
+    def message_received(self, count: int = 1) -> None:
+        """Method to record messages received from the dev env
+
+        Args:
+            count(int): Number of messages received
+
+        Returns:
+            None
+        """
+        self.increment('messages.received', count)
+        self.window_messages += count
+
+    def record_time(self, stage: str, seconds: float) -> None:
+        """Method to record the duration of a single run of a stage
+
+        Args:
+            stage(str): Name of the stage
+            seconds(float): Duration in seconds
+
+        Returns:
+            None
+        """
+        self.values[f"{stage}.last"] = seconds
+        self.values[f"{stage}.max"] = max(self.values.get(f"{stage}.max", 0), seconds)
+        self.increment(f"{stage}.total", seconds)
+        self.increment(f"{stage}.count")
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Context manager to time a stage
+
+        Args:
+            stage(str): Name of the stage
+
+        Returns:
+            None
+        """
+        t_start = time.time()
+        try:
+            yield
+        finally:
+            self.record_time(stage, time.time() - t_start)
+
+    def to_dict(self) -> Dict[str, float]:
+        """Method to get a snapshot of all metrics, including the current message receive rate
+
+        Returns:
+            dict
+        """
+        now = time.time()
+        snapshot = dict(self.values)
+        snapshot['messages.rate'] = self.window_messages / max(now - self.window_start, 1e-6)
+        snapshot['updated_at'] = now
+        return snapshot
+
+    def flush(self, redis_conn: redis.Redis, force: bool = False) -> None:
+        """Method to write the metrics to redis, at most once per flush interval unless forced
+
+        Args:
+            redis_conn(redis.Redis): Connection to write the metrics hash with
+            force(bool): If True, write even if the flush interval has not elapsed
+
+        Returns:
+            None
+        """
+        now = time.time()
+        if not force and now - self.last_flush < self.flush_interval:
+            return
+
+        try:
+            redis_conn.hmset(self.key, self.to_dict())
+            redis_conn.expire(self.key, self.ttl)
+        except Exception as err:
+            # Metrics should never stop more important operations
+            logger.warning(f"An error occurred while writing activity monitor metrics to {self.key}: {err}")
+
+        self.last_flush = now
+        self.window_start = now
+        self.window_messages = 0
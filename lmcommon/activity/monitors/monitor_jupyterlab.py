@@ -189,6 +189,16 @@ class JupyterLabNotebookMonitor(ActivityMonitor):
         self.cell_data: List[ExecutionData] = list()
         self.execution_count = 0
 
+        # Record coalescing policy. Executions are merged into a single record (and commit) until the policy says
+        # it is time to store them
+        monitor_config = self.labbook.labmanager_config.config.get('activity_monitor', dict())
+        self.idle_timeout: float = monitor_config.get('idle_timeout', 1)
+        self.min_record_interval: float = monitor_config.get('min_record_interval', 0)
+        self.max_cells_per_record: Optional[int] = monitor_config.get('max_cells_per_record')
+        self.max_messages_per_batch: int = monitor_config.get('max_messages_per_batch', 1000)
+        self.last_message_time = time.time()
+        self.last_record_time = 0.0
+
     def register_processors(self) -> None:
         """Method to register processors
 
@@ -211,6 +221,9 @@ class JupyterLabNotebookMonitor(ActivityMonitor):
         Returns:
             None
         """
+        self.last_message_time = time.time()
+        self.metrics.message_received()
+
         # Initialize can_process to False. This variable is used to indicate if the cell data should be processed into
         # an ActivityRecord and saved
         if msg['msg_type'] == 'status':
@@ -267,6 +280,53 @@ class JupyterLabNotebookMonitor(ActivityMonitor):
         else:
             logger.info("Received and ignored IOPUB Message of type {}".format(msg['msg_type']))
 
+    def get_messages(self, kernel_client: jupyter_client.BlockingKernelClient,
+                     timeout: float = 1) -> List[Dict[str, Dict]]:
+        """Method to get the next batch of IOPub messages from a kernel
+
+        Waits up to `timeout` seconds for the first message, then drains any messages that are already queued without
+        blocking, up to `max_messages_per_batch`. This lets bursts of output (e.g. many stream messages) be handled
+        together instead of one message per loop iteration.
+
+        Args:
+            kernel_client(BlockingKernelClient): The client connected to the kernel being monitored
+            timeout(float): Number of seconds to wait for the first message
+
+        Returns:
+            list
+        """
+        messages: List[Dict[str, Dict]] = list()
+        try:
+            messages.append(kernel_client.get_iopub_msg(timeout=timeout))
+            while len(messages) < self.max_messages_per_batch:
+                messages.append(kernel_client.get_iopub_msg(block=False))
+        except queue.Empty:
+            pass
+
+        return messages
+
+    def is_record_ready(self) -> bool:
+        """Method to check the coalescing policy and determine if the collected executions should be stored now
+
+        A record is stored once the kernel is idle and either `max_cells_per_record` executions have been collected,
+        or no message has arrived for `idle_timeout` seconds and at least `min_record_interval` seconds have passed
+        since the last record was stored.
+
+        Returns:
+            bool
+        """
+        if self.can_store_activity_record is False:
+            return False
+
+        if self.max_cells_per_record and len(self.cell_data) >= self.max_cells_per_record:
+            return True
+
+        now = time.time()
+        if now - self.last_message_time < self.idle_timeout:
+            return False
+
+        return now - self.last_record_time >= self.min_record_interval
+
     def store_record(self, metadata: Dict[str, str]) -> None:
         """Method to create and store an activity record
 
@@ -288,8 +348,13 @@ class JupyterLabNotebookMonitor(ActivityMonitor):
             # Create note record
             activity_commit = self.store_activity_record(commit, activity_record)
 
+            self.metrics.record_time('record', time.time() - t_start)
+            self.metrics.increment('records.stored')
+            self.metrics.increment('records.cells', len(self.cell_data))
             logger.info(f"Created auto-generated activity record {activity_commit} in {time.time() - t_start} seconds")
 
+            self.last_record_time = time.time()
+
         # Reset for next execution
         self.can_store_activity_record = False
         self.cell_data = list()
@@ -327,19 +392,28 @@ class JupyterLabNotebookMonitor(ActivityMonitor):
 
         try:
             while True:
-                try:
-                    # Check for messages, waiting up to 1 second. This is the rate that records will be merged
-                    msg = km.get_iopub_msg(timeout=1)
+                # Check for messages, waiting up to 1 second. This is the rate the coalescing policy is checked
+                messages = self.get_messages(km, timeout=1)
+                for msg in messages:
                     self.handle_message(msg)
+                self.metrics.set_gauge('messages.batch_size', len(messages))
 
-                except queue.Empty:
-                    # if queue is empty and the record is ready to store, save it!
-                    if self.can_store_activity_record is True:
-                        self.store_record(metadata)
+                # If the coalescing policy says the collected executions are ready, save them!
+                if self.is_record_ready():
+                    self.store_record(metadata)
+
+                # Publish metrics, including how many executions are waiting to be stored
+                self.metrics.set_gauge('cells.pending', len(self.cell_data))
+                self.metrics.flush(redis_conn)
 
                 # Check if you should exit
                 if redis_conn.hget(self.monitor_key, "run").decode() == "False":
                     logger.info("Received Activity Monitor Shutdown Message for {}".format(metadata["kernel_id"]))
+
+                    # Force a flush of any executions still waiting on the coalescing window
+                    self.store_record(metadata)
+                    self.metrics.set_gauge('cells.pending', 0)
+                    self.metrics.flush(redis_conn, force=True)
                     break
 
         except Exception as err:
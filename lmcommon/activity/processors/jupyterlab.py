@@ -20,47 +20,71 @@
 from typing import (Any, Dict, List)
 
 from lmcommon.logging import LMLogger
-from lmcommon.activity.processors.processor import ActivityProcessor, ExecutionData
+from lmcommon.activity.processors.processor import ActivityProcessor, ActivityPipelineProcessor, ExecutionData
 from lmcommon.activity import ActivityRecord, ActivityDetailType, ActivityDetailRecord, ActivityAction
 from lmcommon.labbook import LabBook
 
 logger = LMLogger.get_logger()
 
 
-class JupyterLabCodeProcessor(ActivityProcessor):
+class JupyterLabCodeProcessor(ActivityPipelineProcessor):
     """Class to process code records into activity detail records"""
 
-    def process(self, result_obj: ActivityRecord, data: List[ExecutionData],
-                status: Dict[str, Any], metadata: Dict[str, Any]) -> ActivityRecord:
-        """Method to update a result object based on code and result data
+    def __init__(self) -> None:
+        self.result_cnt = 0
+
+    def begin(self, result_obj: ActivityRecord, status: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+        """Method to reset the count of code entries processed for this record
 
         Args:
             result_obj(ActivityNote): An object containing the note
-            data(list): A list of ExecutionData instances containing the data for this record
             status(dict): A dict containing the result of git status from gitlib
             metadata(str): A dictionary containing Dev Env specific or other developer defined data
 
         Returns:
-            ActivityRecord
+            None
+        """
+        self.result_cnt = 0
+
+    def handle_code(self, result_obj: ActivityRecord, cell: ExecutionData, code_entry: Dict[str, Any]) -> None:
+        """Method to create a detail record for an executed code entry
+
+        Args:
+            result_obj(ActivityNote): An object containing the note
+            cell(ExecutionData): The execution the code entry belongs to
+            code_entry(dict): The code entry
+
+        Returns:
+            None
         """
-        # If there was some code, assume a cell was executed
-        result_cnt = 0
-        for cell_cnt, cell in enumerate(data):
-            for result_entry in reversed(cell.code):
-                if result_entry.get('code'):
-                    # Create detail record to capture executed code
-                    adr_code = ActivityDetailRecord(ActivityDetailType.CODE_EXECUTED, show=False,
-                                                    action=ActivityAction.EXECUTE,
-                                                    importance=max(255-result_cnt, 0))
+        if code_entry.get('code'):
+            # Create detail record to capture executed code
+            adr_code = ActivityDetailRecord(ActivityDetailType.CODE_EXECUTED, show=False,
+                                            action=ActivityAction.EXECUTE,
+                                            importance=max(255-self.result_cnt, 0))
+
+            adr_code.add_value('text/markdown', f"```\n{code_entry.get('code')}\n```")
+            adr_code.tags = cell.tags
 
-                    adr_code.add_value('text/markdown', f"```\n{result_entry.get('code')}\n```")
-                    adr_code.tags = cell.tags
+            result_obj.add_detail_object(adr_code)
 
-                    result_obj.add_detail_object(adr_code)
+            self.result_cnt += 1
 
-                    result_cnt += 1
+    def end(self, result_obj: ActivityRecord, data: List[ExecutionData],
+            status: Dict[str, Any], metadata: Dict[str, Any]) -> ActivityRecord:
+        """Method to set the record message once all code has been processed
+
+        Args:
+            result_obj(ActivityNote): An object containing the note
+            data(list): A list of ExecutionData instances containing the data for this record
+            status(dict): A dict containing the result of git status from gitlib
+            metadata(str): A dictionary containing Dev Env specific or other developer defined data
 
+        Returns:
+            ActivityRecord
+        """
         # Set Activity Record Message
+        cell_cnt = len(data) - 1
         cell_str = f"{cell_cnt} cells" if cell_cnt > 1 else "cell"
         result_obj.message = f"Executed {cell_str} in notebook {metadata['path']}"
 
@@ -127,65 +151,114 @@ class JupyterLabFileChangeProcessor(ActivityProcessor):
         return result_obj
 
 
-class JupyterLabPlaintextProcessor(ActivityProcessor):
+class JupyterLabPlaintextProcessor(ActivityPipelineProcessor):
     """Class to process plaintext result entries into activity detail records"""
+    mime_types = ['text/plain']
 
-    def process(self, result_obj: ActivityRecord, data: List[ExecutionData],
-                status: Dict[str, Any], metadata: Dict[str, Any]) -> ActivityRecord:
-        """Method to update a result object based on code and result data
+    # Only store up to 64kB of plain text result data (if the user printed a TON don't save it all)
+    truncate_at = 64 * 1000
+    max_show_len = 280
+
+    def __init__(self) -> None:
+        self.result_cnt = 0
+
+    def begin(self, result_obj: ActivityRecord, status: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+        """Method to reset the count of plaintext results processed for this record
 
         Args:
             result_obj(ActivityNote): An object containing the note
-            data(list): A list of ExecutionData instances containing the data for this record
             status(dict): A dict containing the result of git status from gitlib
             metadata(str): A dictionary containing Dev Env specific or other developer defined data
 
         Returns:
-            ActivityNote
+            None
         """
-        # Only store up to 64kB of plain text result data (if the user printed a TON don't save it all)
-        truncate_at = 64 * 1000
-        max_show_len = 280
-
-        result_cnt = 0
-        for cell in data:
-            for result_entry in reversed(cell.result):
-                if 'metadata' in result_entry:
-                    if 'source' in result_entry['metadata']:
-                        if result_entry['metadata']['source'] == "display_data":
-                            # Don't save plain-text representations of displayed data by default.
-                            continue
-
-                if 'data' in result_entry:
-                    if 'text/plain' in result_entry['data']:
-                        text_data = result_entry['data']['text/plain']
-
-                        if len(text_data) > 0:
-                            adr = ActivityDetailRecord(ActivityDetailType.RESULT,
-                                                       show=True if len(text_data) < max_show_len else False,
-                                                       action=ActivityAction.CREATE,
-                                                       importance=max(255-result_cnt-100, 0))
-
-                            if len(text_data) <= truncate_at:
-                                adr.add_value("text/plain", text_data)
-                            else:
-                                adr.add_value("text/plain", text_data[:truncate_at] + " ...\n\n <result truncated>")
-
-                            # Set cell data to tag
-                            adr.tags = cell.tags
-                            result_obj.add_detail_object(adr)
-
-                            result_cnt += 1
+        self.result_cnt = 0
 
-        return result_obj
+    def handle_result(self, result_obj: ActivityRecord, cell: ExecutionData, result_entry: Dict[str, Any],
+                      mime_type: str) -> None:
+        """Method to create a detail record for a plaintext result entry
+
+        Args:
+            result_obj(ActivityNote): An object containing the note
+            cell(ExecutionData): The execution the result entry belongs to
+            result_entry(dict): The result entry
+            mime_type(str): The consumed MIME type, always text/plain
+
+        Returns:
+            None
+        """
+        if result_entry.get('metadata', dict()).get('source') == "display_data":
+            # Don't save plain-text representations of displayed data by default.
+            return
+
+        text_data = result_entry['data'][mime_type]
+        if len(text_data) > 0:
+            adr = ActivityDetailRecord(ActivityDetailType.RESULT,
+                                       show=True if len(text_data) < self.max_show_len else False,
+                                       action=ActivityAction.CREATE,
+                                       importance=max(255-self.result_cnt-100, 0))
+
+            if len(text_data) <= self.truncate_at:
+                adr.add_value("text/plain", text_data)
+            else:
+                adr.add_value("text/plain", text_data[:self.truncate_at] + " ...\n\n <result truncated>")
+
+            # Set cell data to tag
+            adr.tags = cell.tags
+            result_obj.add_detail_object(adr)
+
+            self.result_cnt += 1
 
 
-class JupyterLabImageExtractorProcessor(ActivityProcessor):
+class JupyterLabImageExtractorProcessor(ActivityPipelineProcessor):
     """Class to perform image extraction for JupyterLab activity"""
+    mime_types = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/bmp']
 
-    def process(self, result_obj: ActivityRecord, data: List[ExecutionData],
-                status: Dict[str, Any], metadata: Dict[str, Any]) -> ActivityRecord:
-        """Method to update a result object based on code and result data
+    def __init__(self) -> None:
+        self.result_cnt = 0
+
+    def begin(self, result_obj: ActivityRecord, status: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+        """Method to reset the count of images processed for this record
+
+        Args:
+            result_obj(ActivityNote): An object containing the note
+            status(dict): A dict containing the result of git status from gitlib
+            metadata(str): A dictionary containing Dev Env specific or other developer defined data
+
+        Returns:
+            None
+        """
+        self.result_cnt = 0
+
+    def handle_result(self, result_obj: ActivityRecord, cell: ExecutionData, result_entry: Dict[str, Any],
+                      mime_type: str) -> None:
+        """Method to create a detail record for an image in a result entry
+
+        Args:
+            result_obj(ActivityNote): An object containing the note
+            cell(ExecutionData): The execution the result entry belongs to
+            result_entry(dict): The result entry
+            mime_type(str): The supported image MIME type present in the result entry
+
+        Returns:
+            None
+        """
+        # You got an image
+        adr_img = ActivityDetailRecord(ActivityDetailType.RESULT, show=True,
+                                       action=ActivityAction.CREATE,
+                                       importance=max(255-self.result_cnt, 0))
+
+        adr_img.add_value(mime_type, result_entry['data'][mime_type])
+
+        adr_img.tags = cell.tags
+        result_obj.add_detail_object(adr_img)
+
+        self.result_cnt += 1
+
+    def end(self, result_obj: ActivityRecord, data: List[ExecutionData],
+            status: Dict[str, Any], metadata: Dict[str, Any]) -> ActivityRecord:
+        """Method to set the record message if any images were extracted
 
         Args:
             result_obj(ActivityNote): An object containing the note
@@ -194,31 +267,10 @@ class JupyterLabImageExtractorProcessor(ActivityProcessor):
             metadata(str): A dictionary containing Dev Env specific or other developer defined data
 
         Returns:
-            ActivityNote
+            ActivityRecord
         """
-        supported_image_types = ['image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/bmp']
-
-        # If a supported image exists in the result, grab it and create a detail record
-        result_cnt = 0
-        for cell in data:
-            for result_entry in reversed(cell.result):
-                if 'data' in result_entry:
-                    for mime_type in result_entry['data']:
-                        if mime_type in supported_image_types:
-                            # You got an image
-                            adr_img = ActivityDetailRecord(ActivityDetailType.RESULT, show=True,
-                                                           action=ActivityAction.CREATE,
-                                                           importance=max(255-result_cnt, 0))
-
-                            adr_img.add_value(mime_type, result_entry['data'][mime_type])
-
-                            adr_img.tags = cell.tags
-                            result_obj.add_detail_object(adr_img)
-
-                            # Set Activity Record Message
-                            result_obj.message = "Executed cell in notebook {} and generated a result".format(
-                                metadata['path'])
-
-                            result_cnt += 1
+        if self.result_cnt > 0:
+            # Set Activity Record Message
+            result_obj.message = "Executed cell in notebook {} and generated a result".format(metadata['path'])
 
         return result_obj
@@ -18,7 +18,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import abc
-from typing import (Any, Dict, List)
+from typing import (Any, Dict, List, Sequence)
 
 from lmcommon.activity import ActivityRecord
 
@@ -63,3 +63,122 @@ class ActivityProcessor(metaclass=abc.ABCMeta):
             ActivityRecord
         """
         raise NotImplemented
+
+
+class ActivityPipelineProcessor(ActivityProcessor):
+    """Class to process activity by handling individual code and result entries while the execution data is walked
+    a single time
+
+    Subclasses declare the result MIME types they consume in `mime_types` and implement the handler methods they need.
+    Handlers are only called for entries the processor consumes, so processors that ignore most output are cheap.
+    """
+    # MIME types of result entries this processor consumes
+    mime_types: List[str] = list()
+
+    def begin(self, result_obj: ActivityRecord, status: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+        """Method called before the execution data is walked, used to reset any per-record state
+
+        Args:
+            result_obj(ActivityRecord): An object containing the ActivityRecord
+            status(dict): A dictionary containing the git status for this record
+            metadata(dict): A dictionary containing Dev Env specific or other developer defined data
+
+        Returns:
+            None
+        """
+        pass
+
+    def handle_code(self, result_obj: ActivityRecord, cell: ExecutionData, code_entry: Dict[str, Any]) -> None:
+        """Method called for every code entry in the execution data
+
+        Args:
+            result_obj(ActivityRecord): An object containing the ActivityRecord
+            cell(ExecutionData): The execution the code entry belongs to
+            code_entry(dict): The code entry
+
+        Returns:
+            None
+        """
+        pass
+
+    def handle_result(self, result_obj: ActivityRecord, cell: ExecutionData, result_entry: Dict[str, Any],
+                      mime_type: str) -> None:
+        """Method called for every MIME type in a result entry that is listed in `mime_types`
+
+        Args:
+            result_obj(ActivityRecord): An object containing the ActivityRecord
+            cell(ExecutionData): The execution the result entry belongs to
+            result_entry(dict): The result entry
+            mime_type(str): The consumed MIME type present in the result entry's data
+
+        Returns:
+            None
+        """
+        pass
+
+    def end(self, result_obj: ActivityRecord, data: List[ExecutionData], status: Dict[str, Any],
+            metadata: Dict[str, Any]) -> ActivityRecord:
+        """Method called after the execution data has been walked, used to finalize the record
+
+        Args:
+            result_obj(ActivityRecord): An object containing the ActivityRecord
+            data(list): A list of ExecutionData instances containing the data for this record
+            status(dict): A dictionary containing the git status for this record
+            metadata(dict): A dictionary containing Dev Env specific or other developer defined data
+
+        Returns:
+            ActivityRecord
+        """
+        return result_obj
+
+    def process(self, result_obj: ActivityRecord, data: List[ExecutionData], status: Dict[str, Any],
+                metadata: Dict[str, Any]) -> ActivityRecord:
+        """Method to update a result object based on code and result data, running only this processor
+
+        Args:
+            result_obj(ActivityRecord): An object containing the ActivityRecord
+            data(list): A list of ExecutionData instances containing the data for this record
+            status(dict): A dictionary containing the git status for this record
+            metadata(dict): A dictionary containing Dev Env specific or other developer defined data
+
+        Returns:
+            ActivityRecord
+        """
+        self.begin(result_obj, status, metadata)
+        walk_execution_data([self], result_obj, data)
+        return self.end(result_obj, data, status, metadata)
+
+
+def walk_execution_data(processors: Sequence[ActivityPipelineProcessor], result_obj: ActivityRecord,
+                        data: List[ExecutionData]) -> None:
+    """Function to walk execution data once, dispatching each code entry and each consumed result MIME type to the
+    processors' handlers
+
+    Code and result entries are visited newest first within each cell, matching the order processors have always
+    used to assign importance.
+
+    Args:
+        processors(list): The pipeline processors to dispatch to, in order
+        result_obj(ActivityRecord): An object containing the ActivityRecord
+        data(list): A list of ExecutionData instances containing the data for this record
+
+    Returns:
+        None
+    """
+    handlers_by_mime_type: Dict[str, List[ActivityPipelineProcessor]] = dict()
+    for p in processors:
+        for mime_type in p.mime_types:
+            handlers_by_mime_type.setdefault(mime_type, list()).append(p)
+
+    for cell in data:
+        for code_entry in reversed(cell.code):
+            for p in processors:
+                p.handle_code(result_obj, cell, code_entry)
+
+        if not handlers_by_mime_type:
+            continue
+
+        for result_entry in reversed(cell.result):
+            for mime_type in result_entry.get('data', dict()):
+                for p in handlers_by_mime_type.get(mime_type, list()):
+                    p.handle_result(result_obj, cell, result_entry, mime_type)
@@ -18,6 +18,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import re
+import time
 import uuid
 import datetime
 from typing import (Any, Dict, List, Tuple, Optional)
@@ -65,6 +66,9 @@ class ActivityStore(object):
             self.compress_details: bool = False
             self.compress_min_bytes: int = 0
 
+        # Seconds spent in each stage of the last create_activity_record call, accumulated across detail records
+        self.timings: Dict[str, float] = dict()
+
     def _validate_tags(self, tags: List[str]) -> List[str]:
         """Method to clean and validate tags
 
@@ -124,14 +128,25 @@ class ActivityStore(object):
         if after:
             path_info = after
 
+        deepened_at = -1
         while True:
-            for entry in self.labbook.git.log(path_info=path_info, **kwargs):
+            num_commits = 0
+            for entry in self.labbook.git.iter_log(path_info=path_info, fields=['author', 'committed_on', 'message'],
+                                                   **kwargs):
+                num_commits += 1
                 m = self.note_regex.match(entry['message'])
                 if m:
                     log_entries.append((m.group(0), entry['commit'], entry['committed_on'],
                                         entry['author']['name'],
                                         entry['author']['email']))
 
+            if first is not None and num_commits < kwargs['max_count'] and num_commits != deepened_at \
+                    and self._deepen_history(kwargs['max_count']):
+                # Reached the start of a shallow clone's history before the page was full. Retry with more history
+                deepened_at = num_commits
+                log_entries = list()
+                continue
+
             if first is not None:
                 if first == -1:
                     # If you get here, you already tried to load more records. Give up
@@ -162,6 +177,25 @@ class ActivityStore(object):
 
         return log_entries
 
+    def _deepen_history(self, count: int) -> bool:
+        """Method to fetch older history if the labbook is a shallow clone
+
+        Args:
+            count(int): Number of additional commits to fetch
+
+        Returns:
+            bool: True if more history was fetched
+        """
+        if not self.labbook.git.is_shallow:
+            return False
+
+        try:
+            self.labbook.git.deepen(count)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not fetch more history for {str(self.labbook)}: {e}")
+            return False
+
     def create_activity_record(self, record: ActivityRecord) -> ActivityRecord:
         """Method to write an activity record and its details to the git log and detaildb
 
@@ -176,11 +210,15 @@ class ActivityStore(object):
         if not record.linked_commit:
             record.linked_commit = uuid.uuid4().hex
 
+        self.timings = {'serialize': 0.0, 'detaildb_write': 0.0}
+
         # Write all ActivityDetailObjects to the datastore
         for idx, detail in enumerate(record.detail_objects):
             updated_detail = self.put_detail_record(detail[3])
             record.update_detail_object(updated_detail, idx)
 
+        t_start = time.time()
+
         # Add everything in the LabBook activity/log directory
         self.labbook.git.add_all(self.detaildb.root_path)
 
@@ -188,6 +226,8 @@ class ActivityStore(object):
         commit = self.labbook.git.commit(record.log_str)
         record.commit = commit.hexsha
 
+        self.timings['git_commit'] = time.time() - t_start
+
         # Update record with username and email
         record.username = self.labbook.git.author.name
         record.email = self.labbook.git.author.email
@@ -288,9 +328,15 @@ class ActivityStore(object):
             if detail_obj.data_size >= self.compress_min_bytes:
                 compress = True
 
+        t_start = time.time()
+        detail_bytes = self._encode_write_options(compress=compress) + detail_obj.to_bytes(compress)
+        t_serialized = time.time()
+
         # Write record and store key
-        detail_obj.key = self.detaildb.put(self._encode_write_options(compress=compress) +
-                                           detail_obj.to_bytes(compress))
+        detail_obj.key = self.detaildb.put(detail_bytes)
+
+        self.timings['serialize'] = self.timings.get('serialize', 0.0) + t_serialized - t_start
+        self.timings['detaildb_write'] = self.timings.get('detaildb_write', 0.0) + time.time() - t_serialized
 
         logger.debug(f"Successfully wrote ActivityDetailRecord {detail_obj.key}")
         return detail_obj
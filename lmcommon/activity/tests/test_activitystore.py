@@ -477,6 +477,25 @@ class TestActivityStore:
         assert activity_records[0].linked_commit == record2.linked_commit
         assert activity_records[0].message == record2.message
 
+    def test_get_activity_records_deepens_shallow_clone(self, mock_config_with_activitystore):
+        """Method to test paging past the start of a shallow clone's history fetches older commits"""
+        store, lb = mock_config_with_activitystore
+        records = []
+        for cnt in range(3):
+            linked_commit = helper_create_labbook_change(lb, cnt)
+            ar = ActivityRecord(ActivityType.CODE, show=True, message=f"added some code {cnt}", importance=50,
+                                linked_commit=linked_commit.hexsha)
+            records.append(store.create_activity_record(ar))
+
+        clone_dir = os.path.join(os.path.dirname(lb.root_dir), 'shallow-clone')
+        clone_lb = LabBook(lb.labmanager_config.config_file)
+        clone_lb.git.clone("file://" + lb.root_dir, directory=clone_dir, depth=2)
+        clone_lb.from_directory(clone_dir)
+        assert clone_lb.git.is_shallow is True
+
+        activity_records = ActivityStore(clone_lb).get_activity_records(first=3)
+        assert [r.commit for r in activity_records] == [r.commit for r in reversed(records)]
+
     def test_get_activity_records_with_intermediate_commits(self, mock_config_with_activitystore):
         """Method to test creating and getting a bunch of activity records with intermediate commits made"""
 
@@ -27,31 +27,25 @@ from lmcommon.activity.monitors.monitor_jupyterlab import JupyterLabMonitor
 class TestDevEnvMonitorManager(object):
     def test_load_monitors(self, redis_client):
         """Test loading monitors from the filesystem"""
-        assert redis_client.keys('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##') == []
-
         demm = DevEnvMonitorManager()
 
         assert type(demm.available_monitors['jupyterlab']()) == JupyterLabMonitor
-        assert redis_client.keys('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##') is not None
-        data = redis_client.hgetall('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##')
-        assert b'jupyterlab' in data
 
-    def test_load_monitors_precached(self, redis_client):
-        """Test loading monitors from redis"""
+        # Discovery no longer goes through redis
+        assert redis_client.keys('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##') == []
+
+    def test_load_monitors_process_registry(self, redis_client, monkeypatch):
+        """Test that monitor classes are only discovered once per process"""
         demm = DevEnvMonitorManager()
 
-        assert type(demm.available_monitors['jupyterlab']()) == JupyterLabMonitor
-        assert redis_client.keys('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##') is not None
-        data = redis_client.hgetall('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##')
-        assert b'jupyterlab' in data
+        def fail(*args):
+            raise AssertionError("Monitor classes should not be re-registered")
+        monkeypatch.setattr(DevEnvMonitorManager, '_register_monitor_classes', fail)
 
         demm2 = DevEnvMonitorManager()
 
-        assert demm.available_monitors == demm2.available_monitors
+        assert demm.available_monitors is demm2.available_monitors
         assert type(demm2.available_monitors['jupyterlab']()) == JupyterLabMonitor
-        assert redis_client.keys('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##') is not None
-        data = redis_client.hgetall('##AVAILABLE_DEV_ENV_MONITOR_CLASSES##')
-        assert b'jupyterlab' in data
 
     def test_is_available(self, redis_client):
         """Test if a dev env has a monitor available"""
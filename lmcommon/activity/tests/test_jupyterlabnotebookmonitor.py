@@ -21,10 +21,12 @@ from lmcommon.activity.tests.fixtures import redis_client, mock_kernel
 from lmcommon.fixtures import mock_labbook
 import uuid
 import os
+import time
 
 from lmcommon.activity.monitors.monitor_jupyterlab import JupyterLabNotebookMonitor, JupyterLabCodeProcessor, \
     JupyterLabFileChangeProcessor, JupyterLabPlaintextProcessor, JupyterLabImageExtractorProcessor
 from lmcommon.activity.processors.core import ActivityShowBasicProcessor
+from lmcommon.activity.processors.processor import ExecutionData
 from lmcommon.activity import ActivityStore, ActivityType, ActivityDetailType
 
 
@@ -53,6 +55,72 @@ class TestJupyterLabNotebookMonitor(object):
         assert type(monitor.processors[3]) == JupyterLabImageExtractorProcessor
         assert type(monitor.processors[4]) == ActivityShowBasicProcessor
 
+    def test_coalescing_policy(self, redis_client, mock_labbook):
+        """Test the policy that decides when collected executions are stored as a record"""
+        monitor_key = "dev_env_monitor:{}:{}:{}:{}:activity_monitor:{}".format('test',
+                                                                               'test',
+                                                                               'labbook1',
+                                                                               'jupyterlab-ubuntu1604',
+                                                                               uuid.uuid4())
+
+        monitor = JupyterLabNotebookMonitor("test", "test", mock_labbook[2].name,
+                                            monitor_key, config_file=mock_labbook[0])
+
+        # Defaults from the config file
+        assert monitor.idle_timeout == 1
+        assert monitor.min_record_interval == 0
+        assert monitor.max_cells_per_record is None
+
+        # Never ready while the kernel is busy
+        monitor.last_message_time = time.time() - 10
+        assert monitor.is_record_ready() is False
+
+        # Ready once idle for longer than the idle timeout
+        monitor.can_store_activity_record = True
+        assert monitor.is_record_ready() is True
+
+        # Not ready if a message arrived within the idle timeout
+        monitor.last_message_time = time.time()
+        assert monitor.is_record_ready() is False
+
+        # Not ready if the minimum interval since the last record has not elapsed
+        monitor.last_message_time = time.time() - 10
+        monitor.min_record_interval = 60
+        monitor.last_record_time = time.time()
+        assert monitor.is_record_ready() is False
+
+        # Ready immediately when the max number of cells has been collected
+        monitor.max_cells_per_record = 2
+        monitor.cell_data = [ExecutionData(), ExecutionData()]
+        monitor.last_message_time = time.time()
+        assert monitor.is_record_ready() is True
+
+    def test_get_messages(self, redis_client, mock_labbook, mock_kernel):
+        """Test draining queued IOPub messages in batches"""
+        monitor_key = "dev_env_monitor:{}:{}:{}:{}:activity_monitor:{}".format('test',
+                                                                               'test',
+                                                                               'labbook1',
+                                                                               'jupyterlab-ubuntu1604',
+                                                                               uuid.uuid4())
+
+        monitor = JupyterLabNotebookMonitor("test", "test", mock_labbook[2].name,
+                                            monitor_key, config_file=mock_labbook[0])
+        assert monitor.max_messages_per_batch == 1000
+
+        # Perform an action and let all of its messages queue up
+        mock_kernel[0].execute("print('Hello, World')")
+        time.sleep(2)
+
+        monitor.max_messages_per_batch = 2
+        messages = monitor.get_messages(mock_kernel[0])
+        assert [m['msg_type'] for m in messages] == ['status', 'execute_input']
+
+        monitor.max_messages_per_batch = 1000
+        messages = monitor.get_messages(mock_kernel[0])
+        assert [m['msg_type'] for m in messages] == ['stream', 'status']
+
+        assert monitor.get_messages(mock_kernel[0], timeout=.1) == []
+
     def test_start(self, redis_client, mock_labbook, mock_kernel):
         """Test processing notebook activity"""
         dummy_file = os.path.join(mock_labbook[2].root_dir, 'code', 'Test.ipynb')
@@ -0,0 +1,62 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import pytest
+import time
+
+from lmcommon.activity.tests.fixtures import redis_client
+from lmcommon.activity.monitors.metrics import MonitorMetrics
+
+
+class TestMonitorMetrics(object):
+
+    def test_timer(self):
+        """Test recording stage timings"""
+        metrics = MonitorMetrics("dev_env_monitor:test:test:labbook1:jupyterlab:activity_monitor:1234")
+
+        with metrics.timer('git_commit'):
+            time.sleep(.01)
+        metrics.record_time('git_commit', 0.5)
+
+        assert metrics.values['git_commit.count'] == 2
+        assert metrics.values['git_commit.last'] == 0.5
+        assert metrics.values['git_commit.max'] == 0.5
+        assert metrics.values['git_commit.total'] > 0.51
+
+    def test_flush(self, redis_client):
+        """Test publishing metrics to redis"""
+        metrics = MonitorMetrics("dev_env_monitor:test:test:labbook1:jupyterlab:activity_monitor:1234")
+        assert metrics.key == "activity_monitor_metrics:dev_env_monitor:test:test:labbook1:jupyterlab:activity_monitor:1234"
+
+        metrics.message_received(10)
+        metrics.set_gauge('cells.pending', 3)
+        metrics.flush(redis_client)
+
+        data = redis_client.hgetall(metrics.key)
+        assert float(data[b'messages.received']) == 10
+        assert float(data[b'messages.rate']) > 0
+        assert float(data[b'cells.pending']) == 3
+        assert metrics.window_messages == 0
+
+        # Writes are rate limited unless forced
+        metrics.set_gauge('cells.pending', 0)
+        metrics.flush(redis_client)
+        assert float(redis_client.hget(metrics.key, 'cells.pending')) == 3
+        metrics.flush(redis_client, force=True)
+        assert float(redis_client.hget(metrics.key, 'cells.pending')) == 0
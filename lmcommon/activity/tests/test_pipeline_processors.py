@@ -0,0 +1,93 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import pytest
+
+from lmcommon.activity import ActivityRecord, ActivityType
+from lmcommon.activity.processors.processor import ActivityPipelineProcessor, ExecutionData, walk_execution_data
+from lmcommon.activity.processors.jupyterlab import JupyterLabCodeProcessor, JupyterLabPlaintextProcessor, \
+    JupyterLabImageExtractorProcessor
+
+
+class CountingProcessor(ActivityPipelineProcessor):
+    """A processor that records what it was dispatched"""
+    mime_types = ['text/plain']
+
+    def __init__(self):
+        self.code = list()
+        self.results = list()
+
+    def handle_code(self, result_obj, cell, code_entry):
+        self.code.append(code_entry['code'])
+
+    def handle_result(self, result_obj, cell, result_entry, mime_type):
+        self.results.append((mime_type, result_entry['data'][mime_type]))
+
+
+@pytest.fixture()
+def execution_data():
+    cell1 = ExecutionData()
+    cell1.code.append({'code': 'print(1)'})
+    cell1.result.append({'data': {'text/plain': '1'}, 'metadata': {'source': 'stream'}})
+    cell1.tags.append('ex:1')
+
+    cell2 = ExecutionData()
+    cell2.code.append({'code': 'plot()'})
+    cell2.result.append({'data': {'text/plain': '<Figure>', 'image/png': 'abcd'},
+                         'metadata': {'source': 'display_data'}})
+    cell2.result.append({'data': {'text/plain': 'done'}, 'metadata': {'source': 'stream'}})
+    cell2.tags.append('ex:2')
+
+    return [cell1, cell2]
+
+
+class TestPipelineProcessors(object):
+
+    def test_walk_dispatch(self, execution_data):
+        """Test that entries are dispatched once, newest first, and only for consumed MIME types"""
+        p = CountingProcessor()
+        walk_execution_data([p], ActivityRecord(ActivityType.CODE), execution_data)
+
+        assert p.code == ['print(1)', 'plot()']
+        assert p.results == [('text/plain', '1'), ('text/plain', 'done'), ('text/plain', '<Figure>')]
+
+    def test_single_pass_matches_individual_process(self, execution_data):
+        """Test that walking once for all processors produces the same record as running each processor"""
+        metadata = {'path': 'code/Test.ipynb'}
+        status = {'staged': [], 'unstaged': [], 'untracked': []}
+
+        processors = [JupyterLabCodeProcessor(), JupyterLabPlaintextProcessor(), JupyterLabImageExtractorProcessor()]
+        individual = ActivityRecord(ActivityType.CODE)
+        for p in processors:
+            individual = p.process(individual, execution_data, status, metadata)
+
+        single_pass = ActivityRecord(ActivityType.CODE)
+        for p in processors:
+            p.begin(single_pass, status, metadata)
+        walk_execution_data(processors, single_pass, execution_data)
+        for p in processors:
+            single_pass = p.end(single_pass, execution_data, status, metadata)
+
+        assert single_pass.message == individual.message
+        assert single_pass.message == "Executed cell in notebook code/Test.ipynb and generated a result"
+        assert len(single_pass.detail_objects) == len(individual.detail_objects) == 5
+        for d1, d2 in zip(single_pass.detail_objects, individual.detail_objects):
+            assert d1[:3] == d2[:3]
+            assert d1[3].data == d2[3].data
+            assert d1[3].tags == d2[3].tags
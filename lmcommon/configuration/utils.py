@@ -18,16 +18,17 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
 import time
 import subprocess
-from typing import List
+from typing import Dict, List, Optional
 from lmcommon.logging import LMLogger
 
 logger = LMLogger.get_logger()
 
 
 def call_subprocess(cmd_tokens: List[str], cwd: str, check: bool = True,
-                    shell: bool = False) -> str:
+                    shell: bool = False, env: Optional[Dict[str, str]] = None) -> str:
     """Execute a subprocess call and properly benchmark and log
 
     Args:
@@ -35,6 +36,7 @@ def call_subprocess(cmd_tokens: List[str], cwd: str, check: bool = True,
         cwd: Current working directory
         check: Raise exception if command fails
         shell: Run as shell command (not recommended)
+        env: Extra environment variables for the command, added to the current environment
 
     Returns:
         Decoded stdout of called process after completing
@@ -46,7 +48,7 @@ def call_subprocess(cmd_tokens: List[str], cwd: str, check: bool = True,
     start_time = time.time()
     try:
         r = subprocess.run(cmd_tokens, cwd=cwd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, check=check,
-                           shell=shell)
+                           shell=shell, env=dict(os.environ, **env) if env else None)
         finish_time = time.time()
         elapsed_time = finish_time - start_time
         logger.debug(f"Finished command `{' '.join(cmd_tokens)}` in {elapsed_time}s")
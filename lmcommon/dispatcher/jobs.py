@@ -31,9 +31,11 @@ from rq import get_current_job
 from lmcommon.activity.monitors.devenv import DevEnvMonitorManager
 from lmcommon.configuration import Configuration
 from lmcommon.configuration.utils import call_subprocess
+from lmcommon.files import FileOperations
 from lmcommon.labbook import LabBook
 from lmcommon.logging import LMLogger
 from lmcommon.workflows import sync_locally
+from lmcommon.workflows.core import git_maintenance, git_refresh_commit_graph, lfs_is_lazy
 from lmcommon.container.core import (build_docker_image as build_image,
                                      start_labbook_container as start_container,
                                      stop_labbook_container as stop_container)
@@ -64,6 +66,11 @@ def export_labbook_as_zip(labbook_path: str, lb_export_directory: str) -> str:
         labbook.from_directory(labbook_path)
         sync_locally(labbook)
 
+        if lfs_is_lazy(labbook):
+            # The archive must hold file contents, not the LFS pointers a lazy clone leaves in place
+            logger.info(f"(Job {p}) Hydrating all LFS files of lazily cloned {str(labbook)} before export")
+            call_subprocess(['git', 'lfs', 'pull'], cwd=labbook.root_dir, check=True)
+
         labbook_dir, _ = labbook.root_dir.rsplit(os.path.sep, 1)
 
         logger.info(f"(Job {p}) Exporting `{labbook.root_dir}` to `{lb_export_directory}`")
@@ -178,6 +185,7 @@ def import_labboook_from_zip(archive_path: str, username: str, owner: str,
 
         # This makes sure the working directory is set properly.
         sync_locally(lb, username=username)
+        git_refresh_commit_graph(lb)
 
         if not lb._data:
             raise ValueError(f'Could not load data from imported LabBook {lb}')
@@ -363,6 +371,95 @@ def start_and_run_activity_monitor(module_name, class_name, user, owner, labbook
         raise e
 
 
+def run_git_maintenance(labbook_path: str, force: bool = False) -> int:
+    """Run rate-limited background git maintenance (repack, gc --auto, commit-graph) over a labbook.
+
+    Args:
+        labbook_path(str): Root directory of the labbook
+        force(bool): Run even if maintenance already ran within the configured interval
+
+    Returns:
+        0 to indicate no failure
+    """
+    p = os.getpid()
+    logger = LMLogger.get_logger()
+    logger.info(f"(Job {p}) Starting run_git_maintenance({labbook_path})")
+
+    try:
+        labbook = LabBook()
+        labbook.from_directory(labbook_path)
+        if not git_maintenance(labbook, force=force):
+            logger.info(f"(Job {p}) Skipped git maintenance of {str(labbook)}, not yet due")
+        return 0
+    except Exception as e:
+        logger.exception(f"(Job {p}) Error on run_git_maintenance: {e}")
+        raise
+
+
+def fetch_labbook_remote(labbook_path: str, remote: str = "origin") -> int:
+    """Fetch a labbook's remote in the background, so sync status checks can use the refreshed remote refs
+    (`LabBook.get_commits_behind_remote(fetch=False)`) without waiting on the network.
+
+    Args:
+        labbook_path(str): Root directory of the labbook
+        remote(str): Name of the git remote
+
+    Returns:
+        0 to indicate no failure
+    """
+    p = os.getpid()
+    logger = LMLogger.get_logger()
+    logger.info(f"(Job {p}) Starting fetch_labbook_remote({labbook_path}, {remote})")
+
+    try:
+        labbook = LabBook()
+        labbook.from_directory(labbook_path)
+        if remote in [n['name'] for n in labbook.git.list_remotes()]:
+            labbook.git.fetch(remote=remote)
+        return 0
+    except Exception as e:
+        logger.exception(f"(Job {p}) Error on fetch_labbook_remote: {e}")
+        raise
+
+
+def prefetch_lfs_objects(labbook_path: str, max_commits: int = 20) -> int:
+    """Hydrate the LFS files touched by the most recent commits of a lazily cloned labbook, so the files a user is
+    most likely to open are already downloaded.
+
+    Args:
+        labbook_path(str): Root directory of the labbook
+        max_commits(int): Number of recent commits whose files are prefetched
+
+    Returns:
+        0 to indicate no failure
+    """
+    p = os.getpid()
+    logger = LMLogger.get_logger()
+    logger.info(f"(Job {p}) Starting prefetch_lfs_objects({labbook_path})")
+
+    try:
+        labbook = LabBook()
+        labbook.from_directory(labbook_path)
+
+        recent_paths = call_subprocess(['git', 'log', f'-{max_commits}', '--name-only', '--format='],
+                                       cwd=labbook.root_dir).splitlines()
+        section_paths: dict = {}
+        for path in recent_paths:
+            section, _, relative_path = path.partition('/')
+            if section in ['code', 'input', 'output'] and relative_path:
+                section_paths.setdefault(section, [])
+                if relative_path not in section_paths[section]:
+                    section_paths[section].append(relative_path)
+
+        for section, relative_paths in section_paths.items():
+            hydrated = FileOperations.hydrate(labbook, section, relative_paths)
+            logger.info(f"(Job {p}) Prefetched {len(hydrated)} LFS file(s) in {str(labbook)} section {section}")
+        return 0
+    except Exception as e:
+        logger.exception(f"(Job {p}) Error on prefetch_lfs_objects: {e}")
+        raise
+
+
 def index_labbook_filesystem():
     """To be implemented later. """
     raise NotImplemented
@@ -310,6 +310,7 @@ exec gosu giguser "$@"
                             linked_commit="",
                             tags=["environment", 'package_manager', package_manager])
 
+        removed_yaml_paths = []
         for pkg in package_names:
             yaml_filename = '{}_{}.yaml'.format(package_manager, pkg)
             package_yaml_path = os.path.join(self.env_dir, 'package_manager', yaml_filename)
@@ -333,7 +334,7 @@ exec gosu giguser "$@"
             if os.path.exists(package_yaml_path):
                 raise ValueError(f"Failed to remove package.")
 
-            self.labbook.git.remove(package_yaml_path)
+            removed_yaml_paths.append(package_yaml_path)
 
             # Create detail record
             adr = ActivityDetailRecord(ActivityDetailType.ENVIRONMENT, show=False, action=ActivityAction.DELETE)
@@ -343,8 +344,9 @@ exec gosu giguser "$@"
 
         # Add to git
         short_message = f"Removed {len(package_names)} {package_manager} managed package(s)"
-        commit = self.labbook.git.commit(short_message)
-        ar.linked_commit = commit.hexsha
+        with self.labbook.git.transaction(short_message) as tx:
+            tx.remove(removed_yaml_paths)
+        ar.linked_commit = tx.commit.hexsha
         ar.message = short_message
 
         # Store
@@ -17,17 +17,18 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
+import itertools
 import shutil
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from lmcommon.labbook import LabBook
-from lmcommon.labbook import shims
 from lmcommon.logging import LMLogger
 from lmcommon.activity import (ActivityDetailRecord, ActivityRecord,
                                ActivityStore, ActivityAction)
 from lmcommon.configuration.utils import call_subprocess
-from lmcommon.files.utils import in_untracked
+from lmcommon.files.gitignore import get_gitignore_matcher
+from lmcommon.files.utils import is_lfs_pointer, lfs_is_lazy, lfs_pointer_size
 
 logger = LMLogger.get_logger()
 
@@ -74,7 +75,7 @@ class FileOperations(object):
         Returns:
             bool indicating whether the labbook's section is set as untracked
         """
-        return in_untracked(labbook.root_dir, section)
+        return section in labbook.untracked_sections
 
     @classmethod
     def set_untracked(cls, labbook: LabBook, section: str) -> LabBook:
@@ -124,6 +125,75 @@ class FileOperations(object):
 
         return labbook
 
+    @classmethod
+    def hydrate(cls, labbook: LabBook, section: str, relative_paths: List[str]) -> List[str]:
+        """ Download the contents of Git LFS files that are still pointers, e.g., after a lazy clone. Call this
+        before reading files; paths that are already hydrated (or not in LFS) only cost a small read.
+
+        Args:
+            labbook: Subject labbook
+            section: Section one of code, input, or output.
+            relative_paths: Paths of files relative to the section
+
+        Returns:
+            List of the relative paths that were hydrated
+        """
+        pointer_paths = [_make_path_relative(p) for p in relative_paths
+                         if is_lfs_pointer(os.path.join(labbook.root_dir, section, _make_path_relative(p)))]
+        if not pointer_paths:
+            return []
+
+        logger.info(f"Hydrating {len(pointer_paths)} LFS file(s) in {str(labbook)} section {section}")
+        with labbook.lock_labbook():
+            call_subprocess(['git', 'lfs', 'pull', '--include',
+                             ','.join(os.path.join(section, p) for p in pointer_paths)],
+                            cwd=labbook.root_dir)
+        return pointer_paths
+
+    @classmethod
+    def get_file_path(cls, labbook: LabBook, section: str, relative_path: str) -> str:
+        """ Return the absolute path of a file for reading its contents. This is the access hook for lazily cloned
+        labbooks: a file that is still an LFS pointer is hydrated on first access.
+
+        Args:
+            labbook: Subject labbook
+            section: Section one of code, input, or output.
+            relative_path: Path of the file relative to the section
+
+        Returns:
+            Absolute path to the file
+        """
+        labbook.validate_section(section)
+        relative_path = _make_path_relative(relative_path).replace('..', '')
+        full_path = os.path.join(labbook.root_dir, section, relative_path)
+        if not os.path.isfile(full_path):
+            raise ValueError(f"No file exists at `{full_path}`")
+
+        cls.hydrate(labbook, section, [relative_path])
+        return full_path
+
+    @staticmethod
+    def _reported_size(full_path: str, size: int, lfs_lazy: bool) -> int:
+        """ Size to report for a file. LFS pointers left by a lazy clone report the size of the file they stand in
+        for, as that is what the file will contain once hydrated. """
+        if lfs_lazy and size <= 1024:
+            return lfs_pointer_size(full_path) or size
+        return size
+
+    @classmethod
+    def is_ignored(cls, labbook: LabBook, paths: List[str]) -> List[bool]:
+        """ Query whether each path matches the labbook's ignore rules, without spawning git. Use this to screen a
+        batch of uploads up front.
+
+        Args:
+            labbook: Subject labbook
+            paths: Paths relative to the labbook root
+
+        Returns:
+            List of booleans, in the same order as `paths`
+        """
+        return get_gitignore_matcher(labbook.root_dir).is_ignored(paths)
+
     @classmethod
     def put_file(cls, labbook: LabBook, section: str, src_file: str,
                  dst_path: str, txid: Optional[str] = None) -> Dict[str, Any]:
@@ -148,9 +218,8 @@ class FileOperations(object):
             raise ValueError(f"Source file does not exist at `{src_file}`")
 
         labbook.validate_section(section)
-        r = call_subprocess(['git', 'check-ignore', os.path.basename(dst_path)],
-                            cwd=labbook.root_dir, check=False)
-        if dst_path and r and os.path.basename(dst_path) in r:
+        # Only the file name is checked, so uploads into untracked sections are still allowed
+        if dst_path and os.path.basename(dst_path) and cls.is_ignored(labbook, [os.path.basename(dst_path)])[0]:
             logger.warning(f"File {dst_path} matches gitignore; "
                            f"not put into {str(labbook)}")
             raise FileOperationsException(f"`{dst_path}` matches "
@@ -194,7 +263,7 @@ class FileOperations(object):
                                         src_file=src_file, dst_path=dst_path)
 
         rel_path = os.path.join(section, finfo['key'])
-        if shims.in_untracked(labbook.root_dir, section):
+        if section in labbook.untracked_sections:
             logger.warning(f"Inserted file {rel_path} ({finfo['size']} bytes)"
                            f" to untracked section {section}. This will not"
                            f" be tracked by commits or activity records.")
@@ -287,7 +356,7 @@ class FileOperations(object):
                 target_type = 'file' if os.path.isfile(target_path) else 'directory'
                 logger.info(f"Removing {target_type} at `{target_path}`")
 
-                if shims.in_untracked(labbook.root_dir, section=section):
+                if section in labbook.untracked_sections:
                     logger.info(f"Removing untracked target {target_path}")
                     if os.path.isdir(target_path):
                         shutil.rmtree(target_path)
@@ -352,7 +421,7 @@ class FileOperations(object):
         if not dst_rel_path:
             raise ValueError("dst_rel_path cannot be None or empty")
 
-        is_untracked = shims.in_untracked(labbook.root_dir, section)
+        is_untracked = section in labbook.untracked_sections
         with labbook.lock_labbook():
             src_rel_path = LabBook.make_path_relative(src_rel_path)
             dst_rel_path = LabBook.make_path_relative(dst_rel_path)
@@ -367,20 +436,18 @@ class FileOperations(object):
                 src_type = 'directory' if os.path.isdir(src_abs_path) else 'file'
                 logger.info(f"Moving {src_type} `{src_abs_path}` to `{dst_abs_path}`")
 
-                if not is_untracked:
-                    labbook.git.remove(src_abs_path, keep_file=True)
-
-                shutil.move(src_abs_path, dst_abs_path)
-
-                if not is_untracked:
+                if is_untracked:
+                    shutil.move(src_abs_path, dst_abs_path)
+                else:
                     commit_msg = f"Moved {src_type} `{src_rel_path}` to `{dst_rel_path}`"
-
-                    if os.path.isdir(dst_abs_path):
-                        labbook.git.add_all(dst_abs_path)
-                    else:
-                        labbook.git.add(dst_abs_path)
-
-                    commit = labbook.git.commit(commit_msg)
+                    with labbook.git.transaction(commit_msg) as tx:
+                        tx.remove(src_abs_path, keep_file=True)
+                        shutil.move(src_abs_path, dst_abs_path)
+                        if os.path.isdir(dst_abs_path):
+                            tx.add_all(dst_abs_path)
+                        else:
+                            tx.add(dst_abs_path)
+                    commit = tx.commit
 
                     # Get LabBook section
                     activity_type, activity_detail_type, section_str = labbook.get_activity_type_from_section(section)
@@ -430,7 +497,7 @@ class FileOperations(object):
             relative_path = LabBook.make_path_relative(relative_path)
             new_directory_path = os.path.join(labbook.root_dir, relative_path)
             section = relative_path.split(os.sep)[0]
-            git_untracked = shims.in_untracked(labbook.root_dir, section)
+            git_untracked = section in labbook.untracked_sections
             if os.path.exists(new_directory_path):
                 return
             else:
@@ -440,6 +507,7 @@ class FileOperations(object):
                     logger.warning(f'New {str(labbook)} untracked directory `{new_directory_path}`')
                     return
                 new_dir = ''
+                gitkeep_paths = []
                 for d in relative_path.split(os.sep):
                     new_dir = os.path.join(new_dir, d)
                     full_new_dir = os.path.join(labbook.root_dir, new_dir)
@@ -449,7 +517,8 @@ class FileOperations(object):
                         with open(gitkeep_path, 'w') as gitkeep:
                             gitkeep.write("This file is necessary to keep this directory tracked by Git"
                                           " and archivable by compression tools. Do not delete or modify!")
-                        labbook.git.add(gitkeep_path)
+                        gitkeep_paths.append(gitkeep_path)
+                labbook.git.add(gitkeep_paths)
 
                 if create_activity_record:
                     # Create detail record
@@ -476,7 +545,8 @@ class FileOperations(object):
                     ars.create_activity_record(ar)
 
     @classmethod
-    def walkdir(cls, labbook: LabBook, section: str, show_hidden: bool = False) -> List[Dict[str, Any]]:
+    def walkdir(cls, labbook: LabBook, section: str, show_hidden: bool = False, first: Optional[int] = None,
+                after: Optional[str] = None, max_depth: Optional[int] = None) -> List[Dict[str, Any]]:
         """Return a list of all files and directories in a section of the labbook. Never includes the .git or
          .gigantum directory.
 
@@ -484,39 +554,124 @@ class FileOperations(object):
             labbook: Subject LabBook
             section(str): The labbook section (code, input, output) to walk
             show_hidden(bool): If True, include hidden directories (EXCLUDING .git and .gigantum)
+            first(int): If set, return at most this many entries
+            after(str): Cursor to resume from, the key of the last entry of the previous page
+            max_depth(int): If set, only include entries at most this many levels below the section
 
         Returns:
             List[Dict[str, str]]: List of dictionaries containing file and directory metadata
         """
+        entries = cls.iter_walkdir(labbook, section, show_hidden=show_hidden, after=after, max_depth=max_depth)
+        return list(entries if first is None else itertools.islice(entries, first))
+
+    @classmethod
+    def iter_walkdir(cls, labbook: LabBook, section: str, show_hidden: bool = False, after: Optional[str] = None,
+                     max_depth: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Lazily yield the files and directories in a section of the labbook, in the order of `walkdir`. Each
+        directory lists its subdirectories and then its files, sorted by name, before its subdirectories are
+        visited. Hidden directories are pruned during the walk unless `show_hidden` is set.
+
+        Resuming from a cursor only re-lists the directories along the cursor's path, so every page costs about the
+        same regardless of how far into the section it starts.
+
+        Args:
+            labbook: Subject LabBook
+            section(str): The labbook section (code, input, output) to walk
+            show_hidden(bool): If True, include hidden directories (EXCLUDING .git and .gigantum)
+            after(str): Cursor to resume from, the key of the last entry of the previous page
+            max_depth(int): If set, only include entries at most this many levels below the section
+
+        Returns:
+            Iterator[Dict[str, str]]: Dictionaries containing file and directory metadata
+        """
         labbook.validate_section(section)
 
-        keys: List[str] = list()
         # base_dir is the root directory to search, to account for relative paths inside labbook.
         base_dir = os.path.join(labbook.root_dir, section)
         if not os.path.isdir(base_dir):
             raise ValueError(f"Labbook walkdir base_dir {base_dir} not an existing directory")
 
-        for root, dirs, files in os.walk(base_dir):
-            # Remove directories we ignore so os.walk does not traverse into them during future iterations
-            if '.git' in dirs:
-                del dirs[dirs.index('.git')]
-            if '.gigantum' in dirs:
-                del dirs[dirs.index('.gigantum')]
+        if max_depth is not None and max_depth < 1:
+            raise ValueError("max_depth must be at least 1")
 
-            # For more deterministic responses, sort resulting paths alphabetically.
-            # Store directories then files, so pagination loads things in an intuitive order
-            dirs.sort()
-            keys.extend(sorted([os.path.join(root.replace(base_dir, ''), d) for d in dirs]))
-            keys.extend(sorted([os.path.join(root.replace(base_dir, ''), f) for f in files]))
+        favorites = set(labbook.favorite_keys[section])
+        lfs_lazy = lfs_is_lazy(labbook.root_dir)
 
-        # Create stats
-        stats: List[Dict[str, Any]] = list()
-        for f_p in keys:
-            if not show_hidden and any([len(p) and p[0] == '.' for p in f_p.split(os.path.sep)]):
-                continue
-            stats.append(labbook.get_file_info(section, f_p))
+        def scan(rel_dir: str) -> Tuple[List[os.DirEntry], List[os.DirEntry]]:
+            """Sorted subdirectories and files of a directory, skipping ignored and hidden entries"""
+            try:
+                # Exhausting the iterator closes the directory
+                entries = list(os.scandir(os.path.join(base_dir, rel_dir)))
+            except (FileNotFoundError, NotADirectoryError):
+                # Removed since the previous page was listed
+                return [], []
+
+            dirs, files = [], []
+            for entry in entries:
+                if not show_hidden and entry.name[0] == '.':
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if entry.name not in ['.git', '.gigantum']:
+                        dirs.append(entry)
+                else:
+                    files.append(entry)
+            return sorted(dirs, key=lambda e: e.name), sorted(files, key=lambda e: e.name)
+
+        def emit(rel_dir: str, dirs: List[os.DirEntry], files: List[os.DirEntry]) -> Iterator[Dict[str, Any]]:
+            """File info from the cached DirEntry stat, in the same format as LabBook.get_file_info"""
+            for entries, is_dir in [(dirs, True), (files, False)]:
+                for entry in entries:
+                    try:
+                        file_info = entry.stat()
+                    except FileNotFoundError:
+                        # Dangling symlink, or removed during the walk
+                        continue
+                    key = os.path.join(rel_dir, entry.name, '') if is_dir else os.path.join(rel_dir, entry.name)
+                    yield {
+                        'key': key,
+                        'is_dir': is_dir,
+                        'size': cls._reported_size(entry.path, file_info.st_size, lfs_lazy) if not is_dir else 0,
+                        'modified_at': file_info.st_mtime,
+                        'is_favorite': key in favorites
+                    }
+
+        def subdirs(rel_dir: str, depth: int, dirs: List[os.DirEntry]) -> List[Tuple[str, int]]:
+            """Directories to visit after `rel_dir` (at `depth`), in stack order. Like os.walk, symlinks are not
+            followed."""
+            if max_depth is not None and depth + 1 >= max_depth:
+                return []
+            return [(os.path.join(rel_dir, d.name), depth + 1) for d in reversed(dirs) if not d.is_symlink()]
+
+        # Directories left to visit, with their depth below the section. The next one is at the end.
+        pending: List[Tuple[str, int]] = list()
+        if after:
+            parts = LabBook.make_path_relative(after).rstrip(os.path.sep).split(os.path.sep)
+            # Subdirectories of each ancestor that sort after the cursor's path are visited last
+            for depth in range(len(parts) - 1):
+                ancestor = os.path.join(*parts[:depth]) if depth else ''
+                dirs, _ = scan(ancestor)
+                pending.extend(subdirs(ancestor, depth, [d for d in dirs if d.name > parts[depth]]))
+
+            # Then finish the listing of the cursor's directory and visit all of its subdirectories
+            parent = os.path.join(*parts[:-1]) if len(parts) > 1 else ''
+            dirs, files = scan(parent)
+            if after.endswith(os.path.sep):
+                yield from emit(parent, [d for d in dirs if d.name > parts[-1]], files)
+            else:
+                yield from emit(parent, [], [f for f in files if f.name > parts[-1]])
+            pending.extend(subdirs(parent, len(parts) - 1, dirs))
+        else:
+            pending.append(('', 0))
 
-        return stats
+        while pending:
+            rel_dir, depth = pending.pop()
+            dirs, files = scan(rel_dir)
+            yield from emit(rel_dir, dirs, files)
+            pending.extend(subdirs(rel_dir, depth, dirs))
 
     @classmethod
     def listdir(cls, labbook: LabBook, section: str, base_path: Optional[str] = None,
@@ -539,6 +694,7 @@ class FileOperations(object):
         if not os.path.isdir(base_dir):
             raise ValueError(f"Labbook listdir base_dir {base_dir} not an existing directory")
 
+        lfs_lazy = lfs_is_lazy(labbook.root_dir)
         stats: List[Dict[str, Any]] = list()
         for item in os.listdir(base_dir):
             if item in ['.git', '.gigantum']:
@@ -549,7 +705,10 @@ class FileOperations(object):
                 continue
 
             # Create tuple (isDir, key)
-            stats.append(labbook.get_file_info(section, os.path.join(base_path or "", item)))
+            file_info = labbook.get_file_info(section, os.path.join(base_path or "", item))
+            if not file_info['is_dir']:
+                file_info['size'] = cls._reported_size(os.path.join(base_dir, item), file_info['size'], lfs_lazy)
+            stats.append(file_info)
 
         # For more deterministic responses, sort resulting paths alphabetically.
         return sorted(stats, key=lambda a: a['key'])
@@ -0,0 +1,247 @@
+# Copyright (c) 2018 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Pattern, Tuple
+
+from lmcommon.gitlib.stat_cache import StatCache
+from lmcommon.logging import LMLogger
+
+logger = LMLogger.get_logger()
+
+# Matchers keyed by repository root, most recently used last
+MATCHER_CACHE_SIZE = 64
+_matchers: 'OrderedDict[str, GitignoreMatcher]' = OrderedDict()
+_matchers_lock = threading.Lock()
+
+# Parsed ignore files kept per matcher, keyed by path
+RULES_CACHE_SIZE = 1024
+
+
+class _Rule(NamedTuple):
+    regex: Pattern
+    negate: bool
+    dir_only: bool
+
+
+def _translate(pattern: str) -> str:
+    """Translate the body of a gitignore pattern (no negation or trailing slash) into a regular expression that
+    matches paths relative to the directory of the ignore file."""
+    if '/' in pattern:
+        # Patterns containing a slash are anchored to the ignore file's directory
+        prefix = ''
+        pattern = pattern.lstrip('/')
+    else:
+        # Otherwise the pattern matches a file or directory name at any depth
+        prefix = '(?:.*/)?'
+
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern[i:i + 2] == '**' and (i == 0 or pattern[i - 1] == '/'):
+                if pattern[i + 2:i + 3] == '/':
+                    # Leading "**/" or inner "/**/" matches zero or more directories
+                    out.append('(?:.*/)?')
+                    i += 3
+                    continue
+                if i + 2 == n:
+                    # Trailing "/**" matches everything inside
+                    out.append('.*')
+                    i += 2
+                    continue
+            while pattern[i:i + 1] == '*':
+                i += 1
+            out.append('[^/]*')
+            continue
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace('\\', '\\\\')
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                i = end + 1
+                continue
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+
+    return f'^{prefix}{"".join(out)}$'
+
+
+def parse_gitignore(text: str) -> List[_Rule]:
+    """Compile the lines of a gitignore file into rules, in file order.
+
+    Args:
+        text: Contents of a .gitignore or info/exclude file
+
+    Returns:
+        List of compiled rules
+    """
+    rules = []
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+
+        # Trailing spaces are ignored unless escaped
+        line = re.sub(r'(?<!\\) +$', '', line)
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        elif line.startswith('\\#') or line.startswith('\\!'):
+            line = line[1:]
+
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+
+        try:
+            rules.append(_Rule(re.compile(_translate(line)), negate, dir_only))
+        except re.error as e:
+            logger.warning(f"Skipping unparseable gitignore pattern `{line}`: {e}")
+    return rules
+
+
+class GitignoreMatcher(object):
+    """Answers `git check-ignore` queries in process from a repository's .gitignore hierarchy and .git/info/exclude.
+
+    Each ignore file is compiled once and reused until its stat signature changes, so a batch of queries costs one
+    stat per directory involved rather than one git process per path. The user's global `core.excludesFile` is not
+    consulted, as labbooks are expected to carry their own ignore rules.
+    """
+
+    def __init__(self, root_dir: str) -> None:
+        self.root_dir = root_dir
+        self._rules: StatCache[List[_Rule]] = StatCache(RULES_CACHE_SIZE)
+
+    def is_ignored(self, paths: List[str]) -> List[bool]:
+        """Query whether each path would be ignored by Git.
+
+        Args:
+            paths: Paths relative to the repository root (absolute paths inside the root are also accepted). A
+                   trailing slash marks a directory, otherwise existing directories are detected on disk.
+
+        Returns:
+            List of booleans, in the same order as `paths`
+        """
+        # Rules and directory results are memoized for the duration of the batch
+        sources: Dict[str, List[Tuple[str, List[_Rule]]]] = dict()
+        dir_results: Dict[str, bool] = dict()
+
+        results = []
+        for path in paths:
+            rel_path, is_dir = self._normalize(path)
+            if not rel_path:
+                results.append(False)
+                continue
+
+            parts = rel_path.split('/')
+            ignored = False
+            # A path inside an excluded directory is ignored and can not be re-included
+            for depth in range(1, len(parts)):
+                parent = '/'.join(parts[:depth])
+                if parent not in dir_results:
+                    dir_results[parent] = self._match(parent, True, sources)
+                if dir_results[parent]:
+                    ignored = True
+                    break
+
+            if not ignored:
+                ignored = self._match(rel_path, is_dir, sources)
+            results.append(ignored)
+
+        return results
+
+    def _normalize(self, path: str) -> Tuple[str, bool]:
+        if os.path.isabs(path):
+            # Resolve the containing directory only, as the root is resolved but the entry may be a symlink
+            path = os.path.relpath(os.path.join(os.path.realpath(os.path.dirname(path)), os.path.basename(path)),
+                                   self.root_dir) + ('/' if path.endswith('/') else '')
+        is_dir = path.endswith('/') or os.path.isdir(os.path.join(self.root_dir, path))
+        rel_path = os.path.normpath(path).replace(os.sep, '/').strip('/')
+        if rel_path in ('.', '') or rel_path.startswith('..'):
+            return '', is_dir
+        return rel_path, is_dir
+
+    def _match(self, rel_path: str, is_dir: bool, sources: Dict[str, List[Tuple[str, List[_Rule]]]]) -> bool:
+        parent = rel_path.rsplit('/', 1)[0] if '/' in rel_path else ''
+        if parent not in sources:
+            sources[parent] = self._sources_for(parent, sources)
+
+        # Sources are ordered by increasing precedence and the last matching rule wins
+        result = False
+        for base, rules in sources[parent]:
+            candidate = rel_path[len(base) + 1:] if base else rel_path
+            for rule in rules:
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.regex.match(candidate):
+                    result = not rule.negate
+        return result
+
+    def _sources_for(self, rel_dir: str, sources: Dict[str, List[Tuple[str, List[_Rule]]]]) -> \
+            List[Tuple[str, List[_Rule]]]:
+        """Rules that apply to entries of `rel_dir`: info/exclude, then each .gitignore from the root down."""
+        if not rel_dir:
+            chain = [('', self._load(os.path.join(self.root_dir, '.git', 'info', 'exclude'))),
+                     ('', self._load(os.path.join(self.root_dir, '.gitignore')))]
+        else:
+            grandparent = rel_dir.rsplit('/', 1)[0] if '/' in rel_dir else ''
+            if grandparent not in sources:
+                sources[grandparent] = self._sources_for(grandparent, sources)
+            chain = sources[grandparent] + [(rel_dir, self._load(os.path.join(self.root_dir, rel_dir, '.gitignore')))]
+        return [(base, rules) for base, rules in chain if rules]
+
+    def _load(self, ignore_path: str) -> List[_Rule]:
+        return self._rules.load(ignore_path, parse_gitignore) or []
+
+
+def get_gitignore_matcher(root_dir: str) -> GitignoreMatcher:
+    """Return the process-wide matcher for the repository at `root_dir`.
+
+    Args:
+        root_dir: Root directory of the repository
+
+    Returns:
+        GitignoreMatcher
+    """
+    key = os.path.realpath(root_dir)
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is None:
+            matcher = GitignoreMatcher(key)
+            _matchers[key] = matcher
+        _matchers.move_to_end(key)
+        while len(_matchers) > MATCHER_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    return matcher
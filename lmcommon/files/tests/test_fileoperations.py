@@ -21,9 +21,11 @@
 import pprint
 import pytest
 import os
+import mock
 
 from lmcommon.fixtures import mock_labbook
 from lmcommon.files import FileOperations, FileOperationsException
+from lmcommon.files.utils import lfs_is_lazy
 
 
 class TestFileOps(object):
@@ -62,6 +64,23 @@ class TestFileOps(object):
         for key in s.keys():
             assert not s[key]
 
+    def test_untracked_sections_cached_until_gitignore_changes(self, mock_labbook):
+        x, y, lb = mock_labbook
+        assert lb.untracked_sections == frozenset()
+
+        FileOperations.set_untracked(labbook=lb, section='output')
+        assert lb.untracked_sections == frozenset(['output'])
+
+        # Once the .gitignore has settled it is not read again until it changes
+        with mock.patch('lmcommon.gitlib.stat_cache.RACY_WINDOW', -1.0):
+            assert lb.untracked_sections == frozenset(['output'])
+            with mock.patch('builtins.open', side_effect=AssertionError):
+                assert FileOperations.is_set_untracked(labbook=lb, section='output') is True
+                assert FileOperations.is_set_untracked(labbook=lb, section='input') is False
+
+            FileOperations.set_untracked(labbook=lb, section='input')
+            assert lb.untracked_sections == frozenset(['input', 'output'])
+
     def test_make_sure_cannot_set_when_files_already_exist_in_section(self, mock_labbook):
         x, y, lb = mock_labbook
 
@@ -149,3 +168,74 @@ class TestFileOps(object):
         hash_7 = lb.git.commit_hash
         assert hash_6 == hash_7
 
+    def test_hydrate_only_pulls_lfs_pointers(self, mock_labbook):
+        x, y, lb = mock_labbook
+
+        pointer = ("version https://git-lfs.github.com/spec/v1\n"
+                   "oid sha256:4d7a214614ab2935c943f9e0ff69d22eadbb8f32b1258daaa5e2ca24d17e2393\n"
+                   "size 12345\n")
+        with open(os.path.join(lb.root_dir, 'input', 'pointer.dat'), 'wt') as f:
+            f.write(pointer)
+        with open(os.path.join(lb.root_dir, 'input', 'real.dat'), 'wt') as f:
+            f.write("actual file contents\n")
+
+        with mock.patch('lmcommon.files.files.call_subprocess') as call:
+            assert FileOperations.hydrate(lb, 'input', ['real.dat', 'missing.dat']) == []
+            assert call.call_count == 0
+
+            assert FileOperations.hydrate(lb, 'input', ['/pointer.dat', 'real.dat']) == ['pointer.dat']
+            assert call.call_count == 1
+            assert call.call_args[0][0] == ['git', 'lfs', 'pull', '--include', 'input/pointer.dat']
+
+    def test_lazy_lfs_files_hydrate_on_access(self, mock_labbook):
+        x, y, lb = mock_labbook
+
+        pointer = ("version https://git-lfs.github.com/spec/v1\n"
+                   "oid sha256:4d7a214614ab2935c943f9e0ff69d22eadbb8f32b1258daaa5e2ca24d17e2393\n"
+                   "size 12345\n")
+        os.makedirs(os.path.join(lb.root_dir, 'input', 'sub'))
+        with open(os.path.join(lb.root_dir, 'input', 'sub', 'pointer.dat'), 'wt') as f:
+            f.write(pointer)
+        with open(os.path.join(lb.root_dir, 'input', 'real.dat'), 'wt') as f:
+            f.write("actual file contents\n")
+
+        # Listings of a lazy clone report the size of the files pointers stand in for
+        with mock.patch('lmcommon.files.files.lfs_is_lazy', return_value=True):
+            sizes = {d['key']: d['size'] for d in FileOperations.walkdir(lb, 'input')}
+            assert sizes['sub/pointer.dat'] == 12345
+            assert sizes['real.dat'] == len("actual file contents\n")
+            assert [d['size'] for d in FileOperations.listdir(lb, 'input', base_path='sub')] == [12345]
+
+        with mock.patch('lmcommon.files.files.lfs_is_lazy', return_value=False):
+            sizes = {d['key']: d['size'] for d in FileOperations.walkdir(lb, 'input')}
+            assert sizes['sub/pointer.dat'] == len(pointer)
+
+        # Reading a file through the access hook hydrates it first
+        with mock.patch('lmcommon.files.files.call_subprocess') as call:
+            assert FileOperations.get_file_path(lb, 'input', 'real.dat') == \
+                os.path.join(lb.root_dir, 'input', 'real.dat')
+            assert call.call_count == 0
+
+            assert FileOperations.get_file_path(lb, 'input', '/sub/pointer.dat') == \
+                os.path.join(lb.root_dir, 'input', 'sub', 'pointer.dat')
+            assert call.call_args[0][0] == ['git', 'lfs', 'pull', '--include', 'input/sub/pointer.dat']
+
+        with pytest.raises(ValueError):
+            FileOperations.get_file_path(lb, 'input', 'missing.dat')
+
+    def test_lfs_is_lazy_reads_git_config(self, mock_labbook):
+        x, y, lb = mock_labbook
+        assert lfs_is_lazy(lb.root_dir) is False
+
+        lb.git.repo.git.config('filter.lfs.smudge', 'git-lfs smudge --skip -- %f')
+        assert lfs_is_lazy(lb.root_dir) is True
+
+        # The flag is read without spawning git, and once .git/config settles it is not re-read until it changes
+        with mock.patch('lmcommon.gitlib.stat_cache.RACY_WINDOW', -1.0):
+            with mock.patch('subprocess.Popen', side_effect=AssertionError):
+                assert lfs_is_lazy(lb.root_dir) is True
+                with mock.patch('builtins.open', side_effect=AssertionError):
+                    assert lfs_is_lazy(lb.root_dir) is True
+
+            lb.git.repo.git.config('filter.lfs.smudge', 'git-lfs smudge -- %f')
+            assert lfs_is_lazy(lb.root_dir) is False
@@ -0,0 +1,106 @@
+# Copyright (c) 2018 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import subprocess
+import tempfile
+import shutil
+
+import mock
+import pytest
+from pkg_resources import resource_filename
+
+from lmcommon.files import FileOperations, FileOperationsException
+from lmcommon.files import gitignore
+from lmcommon.files.gitignore import get_gitignore_matcher
+from lmcommon.fixtures import mock_labbook
+
+PATHS = ['.DS_Store', 'code/.DS_Store', 'code/mod.pyc', 'code/mod.py', 'code/__pycache__',
+         'code/__pycache__/mod.cpython-36.pyc', 'input/data.csv', 'input/.gitkeep', 'input/nested/data.csv',
+         'output/keep.log', 'output/drop.log', 'output/sub/drop.log', 'output/logs/', 'output/logs/a.txt',
+         'docs/a[1].md', 'docs/#notes', 'docs/build/', 'docs/build/index.html', 'docs/deep/x/build/index.html',
+         'docs/local.tmp', 'docs/sub/local.tmp', 'docs/ok.txt', 'spaces.txt', 'a/b/c/d.bin', 'a/x.bin']
+
+GITIGNORE = '\n'.join([open(os.path.join(resource_filename('lmcommon', 'labbook'), 'gitignore.default')).read(),
+                       'input/*', '!input/.gitkeep', '*.log', '!output/keep.log', 'output/logs/',
+                       'docs/a\\[1\\].md', '\\#notes', '/**/build/', 'spaces.txt   ', 'a/**/*.bin', ''])
+
+
+def git_check_ignore(root_dir, paths):
+    """Ignored paths according to git itself"""
+    r = subprocess.run(['git', 'check-ignore', '--no-index', '--stdin'], cwd=root_dir,
+                       input='\n'.join(paths).encode(), stdout=subprocess.PIPE)
+    return set(r.stdout.decode().splitlines())
+
+
+@pytest.fixture()
+def ignore_repo():
+    """A git repository with a .gitignore hierarchy and info/exclude"""
+    root_dir = tempfile.mkdtemp()
+    subprocess.run(['git', 'init', '-q'], cwd=root_dir, check=True)
+    with open(os.path.join(root_dir, '.gitignore'), 'w') as f:
+        f.write(GITIGNORE)
+    os.makedirs(os.path.join(root_dir, 'docs', 'sub'))
+    with open(os.path.join(root_dir, 'docs', '.gitignore'), 'w') as f:
+        f.write('*.tmp\n!/sub/*.tmp\n')
+    with open(os.path.join(root_dir, '.git', 'info', 'exclude'), 'a') as f:
+        f.write('a/x.bin\n')
+    os.makedirs(os.path.join(root_dir, 'code', '__pycache__'))
+    yield root_dir
+    shutil.rmtree(root_dir)
+
+
+class TestGitignoreMatcher(object):
+    def test_matches_git_check_ignore(self, ignore_repo):
+        """Test that the matcher agrees with git for the default labbook rules and the pattern syntax"""
+        expected = git_check_ignore(ignore_repo, PATHS)
+        assert 'docs/sub/local.tmp' not in expected
+        assert 'docs/local.tmp' in expected
+
+        result = get_gitignore_matcher(ignore_repo).is_ignored(PATHS)
+        assert {p for p, ignored in zip(PATHS, result) if ignored} == expected
+
+        abs_paths = [os.path.join(ignore_repo, p) for p in PATHS]
+        assert get_gitignore_matcher(ignore_repo).is_ignored(abs_paths) == result
+
+    def test_cached_until_ignore_files_change(self, ignore_repo):
+        """Test that rules are parsed once and reloaded when an ignore file changes"""
+        with mock.patch('lmcommon.gitlib.stat_cache.RACY_WINDOW', -1.0):
+            matcher = get_gitignore_matcher(ignore_repo)
+            assert matcher.is_ignored(['notes.md', 'docs/local.tmp']) == [False, True]
+
+            with mock.patch.object(gitignore, 'parse_gitignore', side_effect=AssertionError):
+                assert matcher.is_ignored(['code/mod.pyc', 'docs/ok.txt']) == [True, False]
+
+            with open(os.path.join(ignore_repo, '.gitignore'), 'a') as f:
+                f.write('notes.md\n')
+            os.remove(os.path.join(ignore_repo, 'docs', '.gitignore'))
+            assert matcher.is_ignored(['notes.md', 'docs/local.tmp']) == [True, False]
+
+    def test_put_file_rejects_ignored_name(self, mock_labbook):
+        """Test that put_file checks the upload name against the labbook's rules"""
+        x, y, lb = mock_labbook
+        assert FileOperations.is_ignored(lb, ['code/.DS_Store', 'code/script.py']) == [True, False]
+
+        with open('/tmp/.DS_Store', 'w') as f:
+            f.write('finder metadata')
+        with pytest.raises(FileOperationsException):
+            FileOperations.put_file(lb, section='code', src_file=f.name, dst_path='sub/.DS_Store')
+        assert os.path.isfile(f.name)
+        assert not os.path.exists(os.path.join(lb.root_dir, 'code', 'sub'))
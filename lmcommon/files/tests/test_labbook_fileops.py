@@ -268,6 +268,41 @@ class TestLabbookFileOperations(object):
         assert dir_walks[5]['key'] == 'mouse_dir/new_dir/'
         assert dir_walks[6]['is_dir'] is False
 
+    def test_walkdir_paginated(self, mock_config_file):
+        lb = LabBook(mock_config_file[0])
+        lb.new(owner={"username": "test"}, name="test-walkdir-paginated", description="validate tests.")
+        dirs = ["code/cat_dir", "code/dog_dir", "code/mouse_dir/new_dir/deep_dir", "code/.hidden_dir"]
+        for d in dirs:
+            FO.makedir(lb, d)
+        for d in ['.hidden_dir/', '', 'dog_dir', 'mouse_dir/new_dir/deep_dir/', 'cat_dir']:
+            open('/tmp/myfile.c', 'w').write('data')
+            FO.insert_file(lb, 'code', '/tmp/myfile.c', d)
+
+        for show_hidden in [True, False]:
+            full = FO.walkdir(lb, 'code', show_hidden=show_hidden)
+            assert [d['key'] for d in full] == [d['key'] for d in FO.iter_walkdir(lb, 'code', show_hidden)]
+
+            # Resuming from every cursor, with any page size, reproduces the full listing
+            for page_size in [1, 2, 5]:
+                pages: list = []
+                while True:
+                    page = FO.walkdir(lb, 'code', show_hidden=show_hidden, first=page_size,
+                                      after=pages[-1]['key'] if pages else None)
+                    if not page:
+                        break
+                    assert len(page) <= page_size
+                    pages.extend(page)
+                assert pages == full
+
+        assert [d['key'] for d in FO.walkdir(lb, 'code', max_depth=1)] == \
+            ['cat_dir/', 'dog_dir/', 'mouse_dir/', 'myfile.c']
+        assert [d['key'] for d in FO.walkdir(lb, 'code', max_depth=2, after='dog_dir/')] == \
+            ['mouse_dir/', 'myfile.c', 'cat_dir/myfile.c', 'dog_dir/myfile.c', 'mouse_dir/new_dir/']
+        assert len(FO.walkdir(lb, 'code', max_depth=4)) == len(FO.walkdir(lb, 'code'))
+
+        with pytest.raises(ValueError):
+            FO.walkdir(lb, 'code', max_depth=0)
+
     def test_listdir(self, mock_config_file, sample_src_file):
         def write_test_file(base, name):
             with open(os.path.join(base, name), 'wt') as f:
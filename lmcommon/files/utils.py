@@ -18,6 +18,18 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import os
+import re
+from typing import Optional
+
+from lmcommon.gitlib.stat_cache import StatCache
+from lmcommon.labbook import shims
+
+# First line of every Git LFS pointer file
+LFS_POINTER_PREFIX = b'version https://git-lfs.github.com/spec/v1'
+
+# Lazy LFS flags keyed by .git/config path, stored with the stat signature of the config they were parsed from
+LFS_LAZY_CACHE_SIZE = 256
+_lfs_lazy_cache: StatCache[bool] = StatCache(LFS_LAZY_CACHE_SIZE)
 
 
 def in_untracked(labbook_root: str, section: str) -> bool:
@@ -30,12 +42,75 @@ def in_untracked(labbook_root: str, section: str) -> bool:
     Returns:
         True if the given section is untracked (as workaround for Git performance).
     """
-    gitignore_path = os.path.join(labbook_root, '.gitignore')
-    if not os.path.exists(gitignore_path):
-        return False
-    gitignore_lines = [l.strip() for l in open(gitignore_path).readlines()]
-    target_lines = [f'{section}/*', f'!{section}/.gitkeep']
-    if all([a in gitignore_lines for a in target_lines]):
-        return True
-    else:
+    return shims.in_untracked(labbook_root, section)
+
+
+def is_lfs_pointer(path: str) -> bool:
+    """ Query whether the file at path is a Git LFS pointer (left in place of the file contents by a lazy clone).
+
+    Args:
+        path: Absolute path to the file
+
+    Returns:
+        True if the file exists and is an LFS pointer
+    """
+    try:
+        # Pointer files are always well under 1 KB, so anything larger has real contents
+        if not os.path.isfile(path) or os.path.getsize(path) > 1024:
+            return False
+        with open(path, 'rb') as f:
+            return f.read(len(LFS_POINTER_PREFIX)) == LFS_POINTER_PREFIX
+    except OSError:
         return False
+
+
+def lfs_pointer_size(path: str) -> Optional[int]:
+    """ Return the size of the file a Git LFS pointer stands in for, as recorded in the pointer.
+
+    Args:
+        path: Absolute path to the file
+
+    Returns:
+        Size in bytes of the LFS object, or None if the file is not an LFS pointer
+    """
+    if not is_lfs_pointer(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            for line in f.read(1024).splitlines():
+                if line.startswith(b'size '):
+                    return int(line[5:])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def lfs_is_lazy(labbook_root: str) -> bool:
+    """ Query whether the labbook was cloned with lazy LFS, so LFS files stay pointers until they are hydrated.
+
+    The repository's .git/config is read in process and re-parsed only when it changes, as this is checked for
+    every directory listing.
+
+    Args:
+        labbook_root: Root directory of labbook
+
+    Returns:
+        True if LFS smudging is disabled for the repository
+    """
+    return _lfs_lazy_cache.load(os.path.join(labbook_root, '.git', 'config'), _parse_lfs_lazy) or False
+
+
+def _parse_lfs_lazy(config_text: str) -> bool:
+    """Whether the `filter.lfs.smudge` command in the text of a git config skips downloading LFS objects"""
+    smudge = ''
+    in_lfs_filter = False
+    for line in config_text.splitlines():
+        section = re.match(r'\s*\[([^\]]*)\]', line)
+        if section:
+            in_lfs_filter = re.fullmatch(r'\s*filter\s+"lfs"\s*', section.group(1)) is not None
+            line = line[section.end():]
+        if in_lfs_filter:
+            value = re.match(r'\s*smudge\s*=\s*(.*)', line, re.IGNORECASE)
+            if value:
+                smudge = value.group(1)
+    return '--skip' in smudge
@@ -1,3 +1,4 @@
 from lmcommon.gitlib.git import get_git_interface, GitAuthor, GitRepoInterface
 from lmcommon.gitlib.git_fs import GitFilesystem
 from lmcommon.gitlib.git_fs_shim import GitFilesystemShimmed
+from lmcommon.gitlib.repo_pool import discard_pooled_repo
@@ -0,0 +1,131 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from lmcommon.logging import LMLogger
+
+logger = LMLogger.get_logger()
+
+
+class BlameCache(object):
+    """Persistent cache of blame results, keyed by path and blob hash
+
+    Each entry stores, for every line of a version of a file, the commit that introduced the line and the line's
+    number in that commit, along with the revision the blame was computed at. When a file changes, the most recent
+    entry for its path lets the new blame be computed over only the commits since that revision. The cache is a
+    sqlite database stored in the repository's .git directory.
+    """
+    # Number of versions of each file to keep. Older versions are dropped, which only makes blaming them slower
+    max_entries_per_path = 5
+
+    def __init__(self, git_dir: str) -> None:
+        """Constructor
+
+        Args:
+            git_dir(str): Absolute path to the repository's .git directory
+        """
+        self.path = os.path.join(git_dir, 'lmcommon-blame-cache.sqlite')
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection to the cache database, created on first use
+
+        Returns:
+            sqlite3.Connection
+        """
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            with self._conn:
+                self._conn.execute("CREATE TABLE IF NOT EXISTS blames (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                   "path TEXT, blob TEXT, rev TEXT, lines TEXT, content TEXT, UNIQUE (path, blob))")
+        return self._conn
+
+    def close(self) -> None:
+        """Method to close the connection to the cache database
+
+        Returns:
+            None
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @staticmethod
+    def _row_to_entry(row) -> Dict[str, Any]:
+        rev, lines, content = row
+        return {"rev": rev, "lines": [tuple(line) for line in json.loads(lines)], "content": json.loads(content)}
+
+    def get(self, path: str, blob: str) -> Optional[Dict[str, Any]]:
+        """Method to get the cached blame for a version of a file
+
+        Entries are dictionaries in the format:
+
+            {
+                "rev": <commit hash the blame was computed at (str)>,
+                "lines": [(<commit hash (str)>, <line number in that commit (int)>), ...],
+                "content": [<line content (str)>, ...]
+            }
+
+        Args:
+            path(str): Path of the file, relative to the repository root
+            blob(str): Blob hash of the version of the file
+
+        Returns:
+            dict, or None if the version isn't cached
+        """
+        row = self.conn.execute("SELECT rev, lines, content FROM blames WHERE path = ? AND blob = ?",
+                                (path, blob)).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def get_latest(self, path: str) -> Optional[Dict[str, Any]]:
+        """Method to get the most recently cached blame for any version of a file
+
+        Args:
+            path(str): Path of the file, relative to the repository root
+
+        Returns:
+            dict, in the format returned by `get`, or None if no version is cached
+        """
+        row = self.conn.execute("SELECT rev, lines, content FROM blames WHERE path = ? ORDER BY id DESC LIMIT 1",
+                                (path,)).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def put(self, path: str, blob: str, rev: str, lines: List[tuple], content: List[str]) -> None:
+        """Method to cache the blame for a version of a file
+
+        Args:
+            path(str): Path of the file, relative to the repository root
+            blob(str): Blob hash of the version of the file
+            rev(str): Commit hash the blame was computed at
+            lines(list): (commit hash, line number in that commit) for each line
+            content(list): Content of each line
+
+        Returns:
+            None
+        """
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO blames (path, blob, rev, lines, content) "
+                              "VALUES (?, ?, ?, ?, ?)", (path, blob, rev, json.dumps(lines), json.dumps(content)))
+            self.conn.execute("DELETE FROM blames WHERE path = ? AND id NOT IN (SELECT id FROM blames WHERE path = ? "
+                              "ORDER BY id DESC LIMIT ?)", (path, path, self.max_entries_per_path))
@@ -0,0 +1,152 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import datetime
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional
+
+from lmcommon.logging import LMLogger
+
+logger = LMLogger.get_logger()
+
+
+class CommitCache(object):
+    """Persistent cache of commit metadata, keyed by commit hash
+
+    Commits never change, so once a commit's author, committer, date, parents and message have been read from git
+    they can be served from this cache. The cache is a sqlite database stored in the repository's .git directory.
+
+    The cache also records "tips", commits whose entire history has been cached, so it can be populated incrementally
+    by only loading commits that are not reachable from a tip.
+    """
+    # Number of tips to remember. Older tips are dropped, which only makes the next incremental update slower
+    max_tips = 50
+
+    def __init__(self, git_dir: str) -> None:
+        """Constructor
+
+        Args:
+            git_dir(str): Absolute path to the repository's .git directory
+        """
+        self.path = os.path.join(git_dir, 'lmcommon-commit-cache.sqlite')
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection to the cache database, created on first use
+
+        Returns:
+            sqlite3.Connection
+        """
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            with self._conn:
+                self._conn.execute("CREATE TABLE IF NOT EXISTS commits (sha TEXT PRIMARY KEY, author_name TEXT, "
+                                   "author_email TEXT, committer_name TEXT, committer_email TEXT, "
+                                   "committed_ts INTEGER, committed_offset INTEGER, parents TEXT, message TEXT)")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS tips (sha TEXT PRIMARY KEY)")
+        return self._conn
+
+    def close(self) -> None:
+        """Method to close the connection to the cache database
+
+        Returns:
+            None
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def get(self, shas: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Method to get cached entries
+
+        Entries are in the format returned by GitRepoInterface.log, with an additional "parents" list of hashes
+
+        Args:
+            shas(list): Full commit hashes to look up
+
+        Returns:
+            dict: entries keyed by hash. Hashes that aren't cached are omitted
+        """
+        result: Dict[str, Dict[str, Any]] = dict()
+        # Stay well under sqlite's default limit on the number of query parameters
+        for start in range(0, len(shas), 500):
+            batch = shas[start:start + 500]
+            rows = self.conn.execute("SELECT * FROM commits WHERE sha IN ({})".format(','.join('?' * len(batch))),
+                                     batch)
+            for row in rows:
+                sha, author_name, author_email, committer_name, committer_email, ts, offset, parents, message = row
+                tz = datetime.timezone(datetime.timedelta(seconds=offset))
+                result[sha] = {"commit": sha,
+                               "author": {"name": author_name, "email": author_email},
+                               "committer": {"name": committer_name, "email": committer_email},
+                               "committed_on": datetime.datetime.fromtimestamp(ts, tz),
+                               "message": message,
+                               "parents": parents.split()}
+        return result
+
+    def put(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Method to add entries to the cache
+
+        Args:
+            entries(iterable): Entries in the format returned by `get`
+
+        Returns:
+            int: the number of entries added that weren't already cached
+        """
+        rows = [(e["commit"], e["author"]["name"], e["author"]["email"], e["committer"]["name"],
+                 e["committer"]["email"], int(e["committed_on"].timestamp()),
+                 int(e["committed_on"].utcoffset().total_seconds()), ' '.join(e["parents"]), e["message"])
+                for e in entries]
+        changes = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return self.conn.total_changes - changes
+
+    def get_tips(self) -> List[str]:
+        """Method to get the commits whose entire history is cached
+
+        Returns:
+            list
+        """
+        return [row[0] for row in self.conn.execute("SELECT sha FROM tips ORDER BY rowid")]
+
+    def add_tip(self, sha: str) -> None:
+        """Method to record that a commit's entire history is cached
+
+        Args:
+            sha(str): Full commit hash
+
+        Returns:
+            None
+        """
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO tips VALUES (?)", (sha,))
+            self.conn.execute("DELETE FROM tips WHERE rowid NOT IN (SELECT rowid FROM tips ORDER BY rowid DESC "
+                              "LIMIT ?)", (self.max_tips,))
+
+    def clear_tips(self) -> None:
+        """Method to forget all tips, e.g. if one no longer exists in the repository
+
+        Returns:
+            None
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM tips")
@@ -19,13 +19,24 @@
 # SOFTWARE.
 import abc
 import importlib
+import os
+import shutil
+from contextlib import contextmanager
 from typing import Dict, List, Optional, Tuple
 
+from lmcommon.logging import LMLogger
+
+logger = LMLogger.get_logger()
+
 # Dictionary of supported implementations.
 # Key is the value to put in the config_dict["backend"].
 # Value is a list with the first entry being the module and the second the class
 SUPPORTED_GIT_INTERFACES = {'filesystem': ["lmcommon.gitlib.git_fs", "GitFilesystem"],
-                            'filesystem-shim': ["lmcommon.gitlib.git_fs_shim", "GitFilesystemShimmed"]}
+                            'filesystem-shim': ["lmcommon.gitlib.git_fs_shim", "GitFilesystemShimmed"],
+                            'filesystem-libgit2': ["lmcommon.gitlib.git_libgit2", "GitFilesystemLibgit2"]}
+
+# Fields that can be requested from GitRepoInterface.iter_log, in the order they appear in a log entry
+LOG_FIELDS = ["author", "committer", "committed_on", "message"]
 
 
 def get_git_interface(config_dict):
@@ -94,6 +105,18 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
 
         self.update_author(author=author, committer=committer)
 
+    @staticmethod
+    def _as_path_list(filename) -> List[str]:
+        """Method to normalize a filename or list of filenames into a list
+
+        Args:
+            filename(str|list): Filename, or list of filenames
+
+        Returns:
+            list
+        """
+        return [filename] if isinstance(filename, str) else list(filename)
+
     def set_working_directory(self, directory):
         """Method to change the current working directory of the repository
 
@@ -165,6 +188,15 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
         """
         raise NotImplemented
 
+    @property
+    def is_shallow(self):
+        """Get whether the repository was cloned or fetched with truncated history
+
+        Returns:
+            bool
+        """
+        raise NotImplemented
+
     @abc.abstractmethod
     def get_current_branch_name(self):
         """Method to get the current branch name
@@ -188,11 +220,13 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
         raise NotImplemented
 
     @abc.abstractmethod
-    def clone(self, source, directory: Optional[str] = None):
+    def clone(self, source, directory: Optional[str] = None, depth: Optional[int] = None):
         """Clone a repo
 
         Args:
             source (str): Git ssh or https string to clone
+            directory(str): Directory to clone into (optional argument)
+            depth(int): If set, only fetch this many commits of history for each branch (optional argument)
 
         Returns:
             None
@@ -221,12 +255,25 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
         """
         raise NotImplemented
 
+    @abc.abstractmethod
+    def is_dirty(self) -> bool:
+        """Check if a repo has any staged, unstaged, or untracked changes
+
+        Cheaper than building the full status, as it should return as soon as the first change is found
+
+        Returns:
+            bool
+        """
+        raise NotImplemented
+
     @abc.abstractmethod
     def add(self, filename):
-        """Add a file to a commit
+        """Add a file, or a batch of files, to a commit
+
+        A list of files is staged with a single index update.
 
         Args:
-            filename(str): Filename to add.
+            filename(str|list): Filename, or list of filenames, to add.
 
         Returns:
             None
@@ -247,10 +294,12 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def remove(self, filename, force=False, keep_file=True):
-        """Remove a file from tracking
+        """Remove a file, or a batch of files, from tracking
+
+        A list of files is removed with a single index update.
 
         Args:
-            filename(str): Filename to remove.
+            filename(str|list): Filename, or list of filenames, to remove.
             force(bool): Force removal
             keep_file(bool): If true, don't delete the file (e.g. use the --cached flag)
 
@@ -259,6 +308,41 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
         """
         raise NotImplemented
 
+    @abc.abstractmethod
+    def iter_diff(self, commit_a=None, commit_b=None, staged=False, filename=None, ignore_white_space=True,
+                  numstat_only=False, max_file_bytes=None, max_total_bytes=None):
+        """Method to lazily iterate over the changes in a diff, one file at a time
+
+        By default unstaged changes are diffed. If `staged` is set, staged changes are diffed, and if `commit_a` is
+        set, the diff is between two commits.
+
+        Yields a dictionary per changed file of the format:
+
+            {
+                "path": <filename (str)>,
+                "added": <number of lines added (int), None for binary files>,
+                "deleted": <number of lines deleted (int), None for binary files>,
+                "binary": <True if the file is binary (bool)>,
+                "truncated": <True if some or all hunks were omitted because of a size limit (bool)>,
+                "hunks": [(<line_string>, <change_string>), ...], or None for binary files, numstat only diffs and
+                         files after the total size limit was reached
+            }
+
+        Args:
+            commit_a(str): Optional commit hash to diff from
+            commit_b(str): Optional commit hash to diff to, defaults to the current HEAD if commit_a is set
+            staged(bool): If True, diff staged changes instead of unstaged changes
+            filename(str): Optional filename to filter diff. If omitted all files will be diffed
+            ignore_white_space (bool): If True, ignore whitespace during diff. True if omitted
+            numstat_only(bool): If True, only get line counts and binary detection, not hunks
+            max_file_bytes(int): Optional limit on the patch bytes loaded for a single file
+            max_total_bytes(int): Optional limit on the patch bytes loaded for the whole diff
+
+        Returns:
+            iterator(dict)
+        """
+        raise NotImplemented
+
     @abc.abstractmethod
     def diff_unstaged(self, filename=None, ignore_white_space=True):
         """Method to return the diff for unstaged files, optionally for a specific file
@@ -336,6 +420,68 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
             git.Commit -- hash of new commit
         """
         raise NotImplemented
+
+    @abc.abstractmethod
+    def reset_index(self, filename=None):
+        """Method to reset files in the index to their state at HEAD, without changing the working tree
+
+        Args:
+            filename(str|list): Filename, or list of filenames, to reset. If omitted, reset the whole index
+
+        Returns:
+            None
+        """
+        raise NotImplemented
+
+    @abc.abstractmethod
+    def apply_index_updates(self, updates):
+        """Method to apply a sequence of index updates in order, with a single write of the index
+
+        Args:
+            updates(list): ("add", path), ("add_all", directory or None) or ("remove", path) tuples, in order
+
+        Returns:
+            list: Paths, relative to the working directory, whose index entries were changed
+        """
+        raise NotImplemented
+
+    @abc.abstractmethod
+    def write_commit_graph(self):
+        """Method to write the repository's commit-graph, adding a layer for commits not yet covered by it
+
+        Returns:
+            None
+        """
+        raise NotImplemented
+
+    @contextmanager
+    def transaction(self, message, author=None, committer=None):
+        """Context manager to group the index updates of several operations into a single commit
+
+        Index updates made through the yielded GitTransaction are collected while the block runs, then applied in
+        order with a single write of the index and committed once when it exits. If the block raises, nothing is applied. The commit is available
+        as `tx.commit` after the block.
+
+            with labbook.git.transaction("Moved a file") as tx:
+                tx.remove(src_path)
+                shutil.move(src_path, dst_path)
+                tx.add(dst_path)
+            commit_hash = tx.commit.hexsha
+
+        Args:
+            message(str): Commit message
+            author(GitAuthor): User info for the author, if omitted, assume the "system"
+            committer(GitAuthor): User info for the committer. If omitted, set to the author
+
+        Returns:
+            GitTransaction
+        """
+        if not message:
+            raise ValueError("message cannot be None or empty")
+
+        tx = GitTransaction(self, message, author=author, committer=committer)
+        yield tx
+        tx.apply()
     # LOCAL CHANGE METHODS
 
     # HISTORY METHODS
@@ -366,6 +512,27 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
         """
         raise NotImplemented
 
+    @abc.abstractmethod
+    def iter_log(self, path_info=None, max_count=None, filename=None, skip=None, since=None, author=None,
+                 fields=None):
+        """Method to lazily iterate over the commit history, loading only the requested fields
+
+        Yields dictionaries in the same format as `log`, but containing only "commit" and the requested fields.
+
+        Args:
+            path_info(str): Optional path info to filter (e.g., hash1, hash2..hash1, master)
+            filename(str): Optional filename to filter on
+            max_count(int): Optional number of commit records to return
+            skip(int): Optional number of commit records to skip (supports building pagination)
+            since(datetime.datetime): Optional *date* to limit on
+            author(str): Optional filter based on author name
+            fields(list): Optional list of fields to load, from LOG_FIELDS. If omitted, load all fields
+
+        Returns:
+            (iterator(dict))
+        """
+        raise NotImplemented
+
     @abc.abstractmethod
     def log_entry(self, commit):
         """Method to get single commit records
@@ -454,6 +621,19 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
         """
         raise NotImplemented
 
+    @abc.abstractmethod
+    def ahead_behind(self, local_ref, remote_ref) -> Tuple[int, int]:
+        """Method to count the commits a local ref is ahead of and behind another (usually remote) ref
+
+        Args:
+            local_ref(str): Local branch name or revision
+            remote_ref(str): Remote branch name (e.g. `origin/master`) or revision
+
+        Returns:
+            tuple(int, int): Commits reachable only from local_ref, and commits reachable only from remote_ref
+        """
+        raise NotImplemented
+
     @abc.abstractmethod
     def delete_branch(self, name, remote=False, force=False):
         """Method to delete a branch
@@ -573,6 +753,19 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
         """
         raise NotImplemented
 
+    @abc.abstractmethod
+    def deepen(self, count, remote="origin"):
+        """Method to fetch more history into a shallow repository
+
+        Args:
+            count(int): Number of additional commits of history to fetch for each branch
+            remote(str): name of remote, default to `origin`
+
+        Returns:
+            None
+        """
+        raise NotImplemented
+
     @abc.abstractmethod
     def pull(self, refspec=None, remote="origin"):
         """Method fetch and integrate a remote
@@ -612,6 +805,37 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
             None
         """
         raise NotImplemented
+
+    @abc.abstractmethod
+    def preview_merge(self, target, source) -> List[str]:
+        """Method to check whether merging one revision into another would conflict, without touching the index,
+        the working tree or any refs
+
+        Args:
+            target(str): Branch name or revision that would receive the merge
+            source(str): Branch name or revision to merge
+
+        Returns:
+            list(str): Paths that would conflict. Empty if the merge is clean
+        """
+        raise NotImplemented
+
+    @abc.abstractmethod
+    def merge_into(self, target_branch, source, message=None, author=None, committer=None) -> str:
+        """Method to merge a revision into a branch that is not checked out, by computing the merge in memory and
+        updating the branch ref directly. The index and working tree are never touched.
+
+        Args:
+            target_branch(str): Name of the local branch to update. Must not be the checked out branch
+            source(str): Branch name or revision to merge
+            message(str): Merge commit message. Defaults to "Merged <source> into <target_branch>"
+            author(GitAuthor): User info for the author, if omitted, assume the "system"
+            committer(GitAuthor): User info for the committer. If omitted, set to the author
+
+        Returns:
+            str: The commit hash target_branch points to after the merge
+        """
+        raise NotImplemented
     # MERGE METHODS
 
     # UNDO METHODS
@@ -684,3 +908,95 @@ class GitRepoInterface(metaclass=abc.ABCMeta):
             None
         """
         raise NotImplemented
+
+
+class GitTransaction(object):
+    """Collects the index updates of several operations and applies them together, with a single commit
+
+    Created by GitRepoInterface.transaction. Updates are applied in the order they were made, with a single write of
+    the index. Files removed with `keep_file=False` are only deleted once the commit succeeds. If committing fails,
+    the touched paths are reset in the index.
+    """
+
+    def __init__(self, git: GitRepoInterface, message: str, author: Optional[GitAuthor] = None,
+                 committer: Optional[GitAuthor] = None) -> None:
+        """Constructor
+
+        Args:
+            git(GitRepoInterface): The git interface to apply the updates with
+            message(str): Commit message
+            author(GitAuthor): User info for the author, if omitted, assume the "system"
+            committer(GitAuthor): User info for the committer. If omitted, set to the author
+        """
+        self.git = git
+        self.message = message
+        self.author = author
+        self.committer = committer
+        self.commit = None
+
+        self._updates: List[Tuple[str, Optional[str]]] = list()
+        self._delete: List[str] = list()
+
+    def add(self, filename) -> None:
+        """Stage a file, or a list of files, when the transaction is applied
+
+        Args:
+            filename(str|list): Filename, or list of filenames, to add.
+
+        Returns:
+            None
+        """
+        self._updates.extend(('add', path) for path in GitRepoInterface._as_path_list(filename))
+
+    def add_all(self, relative_directory=None) -> None:
+        """Stage all changes, optionally in a directory, when the transaction is applied
+
+        Args:
+            relative_directory(str): Relative directory (from the root_dir) to add everything
+
+        Returns:
+            None
+        """
+        self._updates.append(('add_all', relative_directory))
+
+    def remove(self, filename, keep_file=True) -> None:
+        """Remove a file, or a list of files, from tracking when the transaction is applied
+
+        Args:
+            filename(str|list): Filename, or list of filenames, to remove.
+            keep_file(bool): If false, delete the files once the transaction has been committed
+
+        Returns:
+            None
+        """
+        paths = GitRepoInterface._as_path_list(filename)
+        self._updates.extend(('remove', path) for path in paths)
+        if not keep_file:
+            self._delete.extend(paths)
+
+    def apply(self):
+        """Method to apply the collected index updates and commit them
+
+        Returns:
+            git.Commit -- the new commit
+        """
+        # The index is only written once all updates are known to apply, so a failure here leaves it untouched
+        paths = self.git.apply_index_updates(self._updates)
+        try:
+            self.commit = self.git.commit(self.message, author=self.author, committer=self.committer)
+        except Exception:
+            try:
+                if paths:
+                    self.git.reset_index(paths)
+            except Exception as e:
+                logger.error(f"Failed to reset the index after a failed transaction: {e}")
+            raise
+
+        for path in self._delete:
+            path = os.path.join(self.git.working_directory, path)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+        return self.commit
@@ -17,19 +17,64 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
-from .git import GitRepoInterface
-from git import Repo, Head, RemoteReference
-from git import InvalidGitRepositoryError, BadName
+from .blame_cache import BlameCache
+from .commit_cache import CommitCache
+from .repo_pool import get_repo_pool
+from .git import GitRepoInterface, LOG_FIELDS
+from git import Repo, Head, RemoteReference, IndexFile
+from git.index.typ import IndexEntry
+from git.objects.blob import Blob
+from git.objects.commit import Commit
+from gitdb import IStream
+from git import InvalidGitRepositoryError, BadName, GitCommandError
+import datetime
 import os
 import re
 import shutil
+import stat
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
 
 from typing import Dict, List, Optional, Tuple
 
+from lmcommon.gitlib.stat_cache import StatCache
 from lmcommon.logging import LMLogger
 
 logger = LMLogger.get_logger()
 
+# Hunk header of a unified diff, captured so splitting on it keeps the headers
+DIFF_HUNK_HEADER_RE = re.compile(r'(@{2}\s-?\+?\d+,?\s?\d+\s-?\+?\d+,?\s?\d+\s@{2})')
+
+# Commit hash at the start of a `git blame --porcelain` header line
+BLAME_HEADER_SHA_RE = re.compile(rb'^[0-9a-f]{40}$')
+
+# `git log` format placeholders used to load each log field
+LOG_FIELD_PLACEHOLDERS = {"author": ["%an", "%ae"],
+                          "committer": ["%cn", "%ce"],
+                          "committed_on": ["%ct", "%cI"],
+                          "message": ["%B"],
+                          "parents": ["%P"]}
+
+# Fields stored in the commit metadata cache
+COMMIT_CACHE_FIELDS = LOG_FIELDS + ["parents"]
+
+
+# Ahead/behind counts keyed by (local sha, remote sha). The counts for a pair of commits never change, so entries
+# are only ever evicted to bound memory.
+AHEAD_BEHIND_CACHE_SIZE = 256
+_ahead_behind_cache: 'OrderedDict[Tuple[str, str], Tuple[int, int]]' = OrderedDict()
+_ahead_behind_lock = threading.Lock()
+
+
+# Branch listings keyed by git dir, stored with the stat snapshot of the refs they were read from
+BRANCH_CACHE_SIZE = 64
+_branch_cache: StatCache[Dict[str, List[str]]] = StatCache(BRANCH_CACHE_SIZE)
+
 
 class GitFilesystem(GitRepoInterface):
 
@@ -56,6 +101,8 @@ class GitFilesystem(GitRepoInterface):
 
         # Set up the repository instance
         self.repo = None
+        self._commit_cache: Optional[CommitCache] = None
+        self._blame_cache: Optional[BlameCache] = None
         self.set_working_directory(self.config["working_directory"])
 
     def set_working_directory(self, directory):
@@ -75,7 +122,11 @@ class GitFilesystem(GitRepoInterface):
 
         # Check to see if the working dir is already a repository
         try:
-            self.repo = Repo(directory)
+            pool_config = self.config.get('repo_pool')
+            if pool_config:
+                self.repo = get_repo_pool(**pool_config).get(directory)
+            else:
+                self.repo = Repo(directory)
         except InvalidGitRepositoryError:
             # Make sure the working dir exists
             if not os.path.exists(directory):
@@ -111,6 +162,15 @@ class GitFilesystem(GitRepoInterface):
         """
         return self.repo.head.object.committed_datetime
 
+    @property
+    def is_shallow(self):
+        """Get whether the repository was cloned or fetched with truncated history
+
+        Returns:
+            bool
+        """
+        return os.path.exists(os.path.join(self.repo.git_dir, "shallow"))
+
     @property
     def git_path(self):
         """Get the full git path of the active branch
@@ -144,12 +204,13 @@ class GitFilesystem(GitRepoInterface):
         logger.info("Initializing Git repository in {}".format(self.working_directory))
         self.repo = Repo.init(self.working_directory, bare=bare)
 
-    def clone(self, source, directory: Optional[str] = None):
+    def clone(self, source, directory: Optional[str] = None, depth: Optional[int] = None):
         """Clone a repo
 
         Args:
             source (str): Git ssh or https string to clone
             directory(str): Directory to clone into (optional argument)
+            depth(int): If set, only fetch this many commits of history for each branch (optional argument)
 
         Returns:
             None
@@ -158,7 +219,12 @@ class GitFilesystem(GitRepoInterface):
             raise ValueError("Cannot init an existing git repository. Choose a different working directory")
 
         logger.info("Cloning Git repository from {} into {}".format(source, directory or self.working_directory))
-        self.repo = Repo.clone_from(source, directory or self.working_directory)
+        if depth:
+            # A shallow clone is single-branch by default, but all workspace branches are needed
+            self.repo = Repo.clone_from(source, directory or self.working_directory, depth=depth,
+                                        no_single_branch=True)
+        else:
+            self.repo = Repo.clone_from(source, directory or self.working_directory)
 
     # LOCAL CHANGE METHODS
     def status(self) -> Dict[str, List[Tuple[str, str]]]:
@@ -218,17 +284,63 @@ class GitFilesystem(GitRepoInterface):
 
         return result
 
+    def is_dirty(self) -> bool:
+        """Check if a repo has any staged, unstaged, or untracked changes
+
+        Tracked changes are checked with `git diff --quiet`, which stops at the first difference. Untracked files are
+        checked by reading only the first line of `git ls-files --others`, which is then stopped.
+
+        Returns:
+            bool
+        """
+        # Staged, then unstaged changes. Exit code is 1 if a difference was found
+        for tokens in (['git', 'diff', '--quiet', '--cached'], ['git', 'diff', '--quiet']):
+            exit_code, _, stderr = self.repo.git.execute(tokens, with_exceptions=False, with_extended_output=True)
+            if exit_code == 1:
+                return True
+            elif exit_code != 0:
+                raise ValueError(f"Failed to check for changes in {self.working_directory}: {stderr}")
+
+        # Untracked files. Untracked directories are reported as a single entry, and empty ones are skipped
+        proc = self.repo.git.ls_files(others=True, exclude_standard=True, directory=True, no_empty_directory=True,
+                                      as_process=True)
+        try:
+            return len(proc.proc.stdout.readline()) > 0
+        finally:
+            proc.proc.kill()
+            proc.proc.wait()
+
+    @staticmethod
+    def _describe_paths(paths: List[str]) -> str:
+        """Method to describe a batch of paths for logging, without writing every path of a large batch
+
+        Args:
+            paths(list): Paths in the batch
+
+        Returns:
+            str
+        """
+        if len(paths) == 1:
+            return paths[0]
+        return f"{len(paths)} files ({paths[0]}, ...)"
+
     def add(self, filename):
-        """Add a file to a commit
+        """Add a file, or a batch of files, to a commit
+
+        A list of files is staged with a single index update.
 
         Args:
-            filename(str): Filename to add.
+            filename(str|list): Filename, or list of filenames, to add.
 
         Returns:
             None
         """
-        logger.info("Adding file {} to Git repository in {}".format(filename, self.working_directory))
-        x = self.repo.index.add([filename])
+        paths = self._as_path_list(filename)
+        if not paths:
+            return
+
+        logger.info("Adding {} to Git repository in {}".format(self._describe_paths(paths), self.working_directory))
+        self.repo.index.add(paths)
 
     def add_all(self, relative_directory=None):
         """Add all changes/files using the `git add -A` command
@@ -245,33 +357,166 @@ class GitFilesystem(GitRepoInterface):
             self.repo.git.add(A=True)
 
     def remove(self, filename, force=False, keep_file=True):
-        """Remove a file from tracking
+        """Remove a file, or a batch of files, from tracking
+
+        A list of files is removed with a single index update.
 
         Args:
-            filename(str): Filename to remove.
+            filename(str|list): Filename, or list of filenames, to remove.
             force(bool): Force removal
             keep_file(bool): If true, don't delete the file (e.g. use the --cached flag)
 
         Returns:
             None
         """
-        path_type = 'file' if os.path.isfile(filename) else 'directory'
-        logger.info(f"Removing {path_type} {filename} from Git repo at {self.working_directory}")
+        paths = self._as_path_list(filename)
+        if not paths:
+            return
+
+        is_file = [os.path.isfile(os.path.join(self.working_directory, p)) for p in paths]
+        logger.info(f"Removing {self._describe_paths(paths)} from Git repo at {self.working_directory}")
 
-        if os.path.isfile(filename):
-            self.repo.index.remove([filename])
+        if all(is_file):
+            self.repo.index.remove(paths)
         else:
             # How to pass the -r to handle the directory.
-            self.repo.index.remove([filename], **{'r': True})
+            self.repo.index.remove(paths, **{'r': True})
 
         if not keep_file:
-            if os.path.isfile(filename):
-                os.remove(filename)
-            else:
-                shutil.rmtree(filename)
+            for path, path_is_file in zip(paths, is_file):
+                if path_is_file:
+                    os.remove(os.path.join(self.working_directory, path))
+                else:
+                    shutil.rmtree(os.path.join(self.working_directory, path))
 
         # TODO: DMK look into if force option is needed
 
+    def reset_index(self, filename=None):
+        """Method to reset files in the index to their state at HEAD, without changing the working tree
+
+        Args:
+            filename(str|list): Filename, or list of filenames, to reset. If omitted, reset the whole index
+
+        Returns:
+            None
+        """
+        paths = self._as_path_list(filename) if filename is not None else []
+        self.repo.git.reset('-q', 'HEAD', '--', *paths)
+
+    def apply_index_updates(self, updates: List[Tuple[str, Optional[str]]]) -> List[str]:
+        """Method to apply a sequence of index updates in order, with a single write of the index
+
+        Each update is an ("add", path), ("add_all", directory or None) or ("remove", path) tuple. Later updates to a
+        path override earlier ones, so e.g. adding and then removing a file leaves it untracked. Files are hashed
+        with `git hash-object`, so filters such as git-lfs run as they would for `git add`.
+
+        Args:
+            updates(list): Index updates, in the order they were requested
+
+        Returns:
+            list: Paths, relative to the working directory, whose index entries were changed
+        """
+        index = IndexFile(self.repo)
+        tracked = {path: entry.mode for (path, _), entry in index.entries.items()}
+        filemode = self.repo.config_reader().get_value('core', 'filemode', True)
+
+        # Final action for each path, in call order
+        actions: Dict[str, str] = OrderedDict()
+        for action, path in updates:
+            if action not in ('add', 'add_all', 'remove'):
+                raise ValueError(f"Unsupported index update `{action}`")
+            rel_path = self._index_path(path) if path else ''
+            if action == 'remove':
+                under = rel_path + '/'
+                targets = [p for p in tracked if p == rel_path or p.startswith(under)] + \
+                          [p for p in actions if p == rel_path or p.startswith(under)]
+                for p in targets or [rel_path]:
+                    actions[p] = 'remove'
+            elif action == 'add_all' or os.path.isdir(os.path.join(self.working_directory, rel_path)):
+                for p in self._changed_paths(rel_path):
+                    actions[p] = 'add'
+            else:
+                actions[rel_path] = 'add'
+
+        entries: Dict[str, Optional[IndexEntry]] = dict()
+        to_hash: List[Tuple[str, int, os.stat_result]] = list()
+        for rel_path, action in actions.items():
+            full_path = os.path.join(self.working_directory, rel_path)
+            if action == 'remove' or not os.path.lexists(full_path):
+                if action == 'add' and rel_path not in tracked:
+                    raise ValueError(f"Cannot add {rel_path}, no such file in {self.working_directory}")
+                entries[rel_path] = None
+                continue
+
+            st = os.lstat(full_path)
+            if stat.S_ISLNK(st.st_mode):
+                target = os.fsencode(os.readlink(full_path))
+                istream = self.repo.odb.store(IStream(Blob.type, len(target), BytesIO(target)))
+                entries[rel_path] = self._index_entry(rel_path, stat.S_IFLNK, istream.binsha, st)
+            elif stat.S_ISREG(st.st_mode):
+                if filemode:
+                    mode = 0o100755 if st.st_mode & stat.S_IXUSR else 0o100644
+                else:
+                    # Without core.filemode, like git, keep the executable bit already in the index
+                    mode = tracked.get(rel_path, 0o100644) if stat.S_ISREG(tracked.get(rel_path, 0)) else 0o100644
+                to_hash.append((rel_path, mode, st))
+
+        if to_hash:
+            # One process hashes every file, running the filters configured for its path
+            r = subprocess.run(['git', 'hash-object', '-w', '--stdin-paths'], cwd=self.working_directory,
+                               input='\n'.join(item[0] for item in to_hash).encode(), stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, check=True)
+            for (rel_path, mode, st), hexsha in zip(to_hash, r.stdout.decode().split()):
+                entries[rel_path] = self._index_entry(rel_path, mode, bytes.fromhex(hexsha), st)
+
+        if not entries:
+            return []
+
+        logger.info(f"Updating {self._describe_paths(list(entries))} in the index of {self.working_directory}")
+        for key in [k for k in index.entries if k[0] in entries]:
+            del index.entries[key]
+        for rel_path, entry in entries.items():
+            if entry is not None:
+                index.entries[(rel_path, 0)] = entry
+        # The cached tree extension no longer matches the entries, so it is dropped as GitPython's add does
+        index.write(ignore_extension_data=True)
+        return list(entries)
+
+    @staticmethod
+    def _index_entry(rel_path: str, mode: int, binsha: bytes, st: os.stat_result) -> IndexEntry:
+        """Stage 0 index entry carrying the file's stat data, taken before it was hashed, so status checks can skip
+        re-hashing (and re-filtering) it while it is unchanged"""
+        return IndexEntry((mode, binsha, 0, rel_path,
+                           struct.pack('>LL', int(st.st_ctime), st.st_ctime_ns % 1000000000),
+                           struct.pack('>LL', int(st.st_mtime), st.st_mtime_ns % 1000000000),
+                           st.st_dev & 0xffffffff, st.st_ino & 0xffffffff, st.st_uid, st.st_gid,
+                           st.st_size & 0xffffffff))
+
+    def _index_path(self, path: str) -> str:
+        """Path relative to the working directory, as stored in the index"""
+        if os.path.isabs(path):
+            path = os.path.relpath(path, self.working_directory)
+        path = os.path.normpath(path).replace(os.sep, '/')
+        return '' if path == '.' else path
+
+    def _changed_paths(self, rel_dir: str) -> List[str]:
+        """Modified, deleted and untracked (not ignored) files in a directory, relative to the working directory"""
+        out = self.repo.git.execute(['git', '--literal-pathspecs', 'ls-files', '-z', '--modified', '--deleted',
+                                     '--others', '--exclude-standard', '--', rel_dir or '.'])
+        return list(OrderedDict.fromkeys([p for p in out.split('\0') if p and not p.endswith('/')]))
+
+    def write_commit_graph(self):
+        """Method to write the repository's commit-graph, adding a layer for commits not yet covered by it
+
+        Split commit-graphs only write the new commits, so this is cheap to run after commits are created in bulk
+        (clones, pulls, merges). Ancestry walks (log, merge-base, ahead/behind counts, push negotiation) then read
+        parents and generation numbers from the graph instead of parsing commit objects.
+
+        Returns:
+            None
+        """
+        self.repo.git.commit_graph('write', '--reachable', '--split')
+
     @staticmethod
     def _parse_diff_strings(value):
         """Method to parse diff strings into chunks
@@ -282,9 +527,11 @@ class GitFilesystem(GitRepoInterface):
         Returns:
             list((str, str)): a list of (line string, diff str)
         """
-        value = str(value, 'utf-8')
+        value = str(value, 'utf-8', 'replace')
+        if not value:
+            return []
 
-        split_str = re.split('(@{2}\s-?\+?\d+,?\s?\d+\s-?\+?\d+,?\s?\d+\s@{2})', value)
+        split_str = DIFF_HUNK_HEADER_RE.split(value)
         if len(split_str) == 1:
             split_value = value.split("@@")
             line_info = ["@@{}@@".format(split_value[1])]
@@ -296,6 +543,122 @@ class GitFilesystem(GitRepoInterface):
 
         return [(x, y) for x, y in zip(line_info, change_info)]
 
+    def iter_diff(self, commit_a=None, commit_b=None, staged=False, filename=None, ignore_white_space=True,
+                  numstat_only=False, max_file_bytes=None, max_total_bytes=None):
+        """Method to lazily iterate over the changes in a diff, one file at a time
+
+        By default unstaged changes are diffed. If `staged` is set, staged changes are diffed, and if `commit_a` is
+        set, the diff is between two commits.
+
+        Yields a dictionary per changed file of the format:
+
+            {
+                "path": <filename (str)>,
+                "added": <number of lines added (int), None for binary files>,
+                "deleted": <number of lines deleted (int), None for binary files>,
+                "binary": <True if the file is binary (bool)>,
+                "truncated": <True if some or all hunks were omitted because of a size limit (bool)>,
+                "hunks": [(<line_string>, <change_string>), ...], or None for binary files, numstat only diffs and
+                         files after the total size limit was reached
+            }
+
+        Line counts and binary detection come from `git diff --numstat`, so patch text is only generated and read
+        if hunks are requested, and only up to the size limits.
+
+        Args:
+            commit_a(str): Optional commit hash to diff from
+            commit_b(str): Optional commit hash to diff to, defaults to the current HEAD if commit_a is set
+            staged(bool): If True, diff staged changes instead of unstaged changes
+            filename(str): Optional filename to filter diff. If omitted all files will be diffed
+            ignore_white_space (bool): If True, ignore whitespace during diff. True if omitted
+            numstat_only(bool): If True, only get line counts and binary detection, not hunks
+            max_file_bytes(int): Optional limit on the patch bytes loaded for a single file
+            max_total_bytes(int): Optional limit on the patch bytes loaded for the whole diff
+
+        Returns:
+            iterator(dict)
+        """
+        args = ['--no-color', '--no-ext-diff', '--no-renames', '--diff-filter=cr']
+        if ignore_white_space:
+            args.extend(['--ignore-blank-lines', '--ignore-space-at-eol'])
+        if commit_a:
+            args.extend([commit_a, commit_b or 'HEAD'])
+        elif staged:
+            args.extend(['--cached', 'HEAD'])
+        if filename:
+            args.extend(['--', filename])
+
+        entries = list()
+        for token in self.repo.git.diff('--numstat', '-z', *args).split('\0'):
+            if token:
+                added, deleted, path = token.split('\t', 2)
+                binary = added == '-'
+                entries.append({"path": path,
+                                "added": None if binary else int(added),
+                                "deleted": None if binary else int(deleted),
+                                "binary": binary,
+                                "truncated": False,
+                                "hunks": None})
+
+        if numstat_only or not entries:
+            yield from entries
+            return
+
+        # The patch contains a section per file, in the same order as the numstat output
+        proc = self.repo.git.diff(*args, as_process=True)
+        try:
+            remaining = iter(entries)
+            entry = None
+            chunks: List[bytes] = list()
+            in_hunks = False
+            file_bytes = 0
+            total_bytes = 0
+            for line in proc.proc.stdout:
+                if line.startswith(b'diff --git '):
+                    if entry is not None:
+                        entry["hunks"] = None if entry["binary"] else self._parse_diff_strings(b''.join(chunks))
+                        yield entry
+                    entry = next(remaining)
+                    chunks = list()
+                    in_hunks = False
+                    file_bytes = 0
+                    continue
+
+                if entry is None or entry["truncated"]:
+                    continue
+                if not in_hunks:
+                    # Skip the extended header lines, up to the first hunk
+                    in_hunks = line.startswith(b'@@')
+                    if not in_hunks:
+                        continue
+
+                if max_file_bytes is not None and file_bytes + len(line) > max_file_bytes:
+                    entry["truncated"] = True
+                    continue
+                if max_total_bytes is not None and total_bytes + len(line) > max_total_bytes:
+                    entry["truncated"] = True
+                    break
+
+                chunks.append(line)
+                file_bytes += len(line)
+                total_bytes += len(line)
+            else:
+                if entry is not None:
+                    entry["hunks"] = None if entry["binary"] else self._parse_diff_strings(b''.join(chunks))
+                    yield entry
+                proc.wait()
+                return
+
+            # The total size limit was reached, so stop reading the patch
+            entry["hunks"] = self._parse_diff_strings(b''.join(chunks))
+            yield entry
+            for entry in remaining:
+                entry["truncated"] = not entry["binary"]
+                yield entry
+        finally:
+            # Kills git diff, if the patch wasn't read to the end
+            del proc
+
     # TODO: Add support to diff branches
     def diff_unstaged(self, filename=None, ignore_white_space=True):
         """Method to return the diff for unstaged files, optionally for a specific file
@@ -314,19 +677,8 @@ class GitFilesystem(GitRepoInterface):
         Returns:
             dict
         """
-        changes = self.repo.index.diff(None, paths=filename, create_patch=True,
-                                       ignore_blank_lines=ignore_white_space,
-                                       ignore_space_at_eol=ignore_white_space,
-                                       diff_filter='cr')
-        result = {}
-        for change in changes:
-            detail = self._parse_diff_strings(change.diff)
-            if not change.b_path:
-                result[change.a_path] = detail
-            else:
-                result[change.b_path] = detail
-
-        return result
+        return {change["path"]: change["hunks"] or []
+                for change in self.iter_diff(filename=filename, ignore_white_space=ignore_white_space)}
 
     def diff_staged(self, filename=None, ignore_white_space=True):
         """Method to return the diff for unstaged files, optionally for a specific file
@@ -345,19 +697,8 @@ class GitFilesystem(GitRepoInterface):
         Returns:
             dict
         """
-        changes = self.repo.index.diff("HEAD", paths=filename, create_patch=True,
-                                       ignore_blank_lines=ignore_white_space,
-                                       ignore_space_at_eol=ignore_white_space,
-                                       diff_filter='cr', R=True)
-        result = {}
-        for change in changes:
-            detail = self._parse_diff_strings(change.diff)
-            if not change.b_path:
-                result[change.a_path] = detail
-            else:
-                result[change.b_path] = detail
-
-        return result
+        return {change["path"]: change["hunks"] or []
+                for change in self.iter_diff(staged=True, filename=filename, ignore_white_space=ignore_white_space)}
 
     def diff_commits(self, commit_a='HEAD~1', commit_b='HEAD', ignore_white_space=True):
         """Method to return the diff between two commits
@@ -379,21 +720,9 @@ class GitFilesystem(GitRepoInterface):
         Returns:
             dict
         """
-        commit_obj = self.repo.commit(commit_a)
-
-        changes = commit_obj.diff(commit_b, create_patch=True,
-                                  ignore_blank_lines=ignore_white_space,
-                                  ignore_space_at_eol=ignore_white_space,
-                                  diff_filter='cr')
-        result = {}
-        for change in changes:
-            detail = self._parse_diff_strings(change.diff)
-            if not change.b_path:
-                result[change.a_path] = detail
-            else:
-                result[change.b_path] = detail
-
-        return result
+        return {change["path"]: change["hunks"] or []
+                for change in self.iter_diff(commit_a=commit_a, commit_b=commit_b,
+                                             ignore_white_space=ignore_white_space)}
 
     def commit(self, message, author=None, committer=None):
         """Method to perform a commit operation
@@ -441,38 +770,196 @@ class GitFilesystem(GitRepoInterface):
         Returns:
             list(dict)
         """
-        kwargs = {}
+        return list(self.iter_log(path_info=path_info, max_count=max_count, filename=filename, skip=skip,
+                                  since=since, author=author))
 
+    def iter_log(self, path_info=None, max_count=None, filename=None, skip=None, since=None, author=None,
+                 fields=None):
+        """Method to lazily iterate over the commit history, loading only the requested fields
+
+        Runs a single `git log` process and yields entries as its output is read, without loading commit objects.
+        Entries are dictionaries in the same format as `log`, but only contain "commit" and the requested fields.
+
+        Args:
+            path_info(str): Optional path info to filter (e.g., hash1, hash2..hash1, master)
+            filename(str): Optional filename to filter on
+            max_count(int): Optional number of commit records to return
+            skip(int): Optional number of commit records to skip (supports building pagination)
+            since(datetime.datetime): Optional *date* to limit on
+            author(str): Optional filter based on author name
+            fields(list): Optional list of fields to load, from LOG_FIELDS. If omitted, load all fields
+
+        Returns:
+            iterator(dict)
+        """
+        if fields is None:
+            fields = LOG_FIELDS
+        unsupported = set(fields) - set(LOG_FIELDS)
+        if unsupported:
+            raise ValueError(f"Unsupported log fields: {', '.join(sorted(unsupported))}")
+
+        fields = [f for f in LOG_FIELDS if f in fields]
+
+        args: List[str] = list()
         if max_count:
-            kwargs["max_count"] = max_count
+            args.append(f"--max-count={max_count}")
+        if skip:
+            args.append(f"--skip={skip}")
+        if since:
+            args.append("--since={}".format(since.strftime("%B %d %Y")))
+        if author:
+            args.append(f"--author={author}")
 
+        args.append(path_info if path_info else self.get_current_branch_name())
         if filename:
-            kwargs["paths"] = [filename]
+            args.extend(['--', filename])
+
+        if self.commit_cache is None:
+            yield from self._run_log(args, fields)
+            return
+
+        # Only list the matching commit hashes, and read their metadata from the cache in batches
+        proc = self.repo.git.rev_list(*args, as_process=True)
+        batch: List[str] = list()
+        for line in proc.proc.stdout:
+            batch.append(line.decode().strip())
+            if len(batch) == 500:
+                yield from self._get_cached_log_entries(batch, fields)
+                batch = list()
+        proc.wait()
+        yield from self._get_cached_log_entries(batch, fields)
+
+    def _run_log(self, args, fields):
+        """Method to run `git log` and lazily parse its output into log entries
 
-        if skip:
-            kwargs["skip"] = skip
+        Args:
+            args(list): Revision, filter and path arguments for `git log`
+            fields(list): Fields to load, in LOG_FIELDS order, optionally followed by "parents"
 
-        if since:
-            kwargs["since"] = since.strftime("%B %d %Y")
+        Returns:
+            iterator(dict)
+        """
+        # Build a format string with the placeholders for each field, all separated by NUL. Commit messages can't
+        # contain NUL, and -z terminates each commit with one, so the output is split on NUL and chunked per commit
+        placeholders = ['%H'] + [p for f in fields for p in LOG_FIELD_PLACEHOLDERS[f]]
+        format_args = ['-z', '--format={}'.format('%x00'.join(placeholders))]
+
+        proc = self.repo.git.log(*(format_args + args), as_process=True)
+        values: List[str] = list()
+        remainder = b''
+        for chunk in iter(lambda: proc.proc.stdout.read(65536), b''):
+            tokens = (remainder + chunk).split(b'\0')
+            remainder = tokens.pop()
+            for token in tokens:
+                values.append(token.decode('utf-8', 'replace'))
+                if len(values) == len(placeholders):
+                    yield self._parse_log_values(fields, values)
+                    values = list()
+        proc.wait()
 
-        if author:
-            kwargs["author"] = author
+    @staticmethod
+    def _parse_log_values(fields, values):
+        """Method to build a log entry from the values output by `git log` for the requested fields
 
-        if path_info:
-            commits = list(self.repo.iter_commits(path_info, **kwargs))
-        else:
-            commits = list(self.repo.iter_commits(self.get_current_branch_name(), **kwargs))
+        Args:
+            fields(list): Fields that were requested, in LOG_FIELDS order
+            values(list): Values for the commit hash and each field's placeholders
 
-        result = []
-        for c in commits:
-            result.append({
-                            "commit": c.hexsha,
-                            "author":  {"name": c.author.name, "email": c.author.email},
-                            "committer": {"name": c.committer.name, "email": c.committer.email},
-                            "committed_on": c.committed_datetime,
-                            "message": c.message
-                          })
+        Returns:
+            dict
+        """
+        entry = {"commit": values[0]}
+        values_iter = iter(values[1:])
+        for field in fields:
+            if field in ("author", "committer"):
+                entry[field] = {"name": next(values_iter), "email": next(values_iter)}
+            elif field == "parents":
+                entry[field] = next(values_iter).split()
+            elif field == "committed_on":
+                timestamp, iso_date = next(values_iter), next(values_iter)
+                sign = -1 if iso_date[-6] == '-' else 1
+                offset = datetime.timedelta(hours=int(iso_date[-5:-3]), minutes=int(iso_date[-2:]))
+                entry[field] = datetime.datetime.fromtimestamp(int(timestamp), datetime.timezone(sign * offset))
+            else:
+                entry[field] = next(values_iter)
+
+        return entry
+
+    @property
+    def commit_cache(self) -> Optional[CommitCache]:
+        """The commit metadata cache for the current repository, if enabled with `commit_cache` in the git config
+
+        Returns:
+            CommitCache
+        """
+        if not self.config.get('commit_cache') or self.repo is None or self.repo.bare:
+            return None
 
+        if self._commit_cache is None or os.path.dirname(self._commit_cache.path) != self.repo.git_dir:
+            if self._commit_cache is not None:
+                self._commit_cache.close()
+            self._commit_cache = CommitCache(self.repo.git_dir)
+
+        return self._commit_cache
+
+    def update_commit_cache(self, rev: str = "HEAD") -> int:
+        """Method to incrementally add the history of a revision to the commit metadata cache
+
+        Only commits that are not reachable from a revision whose history was already cached are loaded from git.
+
+        Args:
+            rev(str): Revision whose history to cache
+
+        Returns:
+            int: the number of commits added
+        """
+        cache = self.commit_cache
+        if cache is None:
+            return 0
+
+        sha = self.repo.git.rev_parse(rev)
+        tips = cache.get_tips()
+        if sha in tips:
+            return 0
+
+        try:
+            num_added = cache.put(self._run_log([sha, '--not'] + tips, COMMIT_CACHE_FIELDS))
+        except GitCommandError:
+            # A tip may no longer exist, e.g. after a branch was deleted and garbage collected. Start over
+            cache.clear_tips()
+            num_added = cache.put(self._run_log([sha], COMMIT_CACHE_FIELDS))
+
+        cache.add_tip(sha)
+        return num_added
+
+    def _get_cached_log_entries(self, shas, fields):
+        """Method to get log entries for a list of commits from the commit metadata cache, caching any that are
+        missing
+
+        Args:
+            shas(list): Full commit hashes, in the order to return them
+            fields(list): Fields to include in each entry
+
+        Returns:
+            list(dict)
+        """
+        entries = self.commit_cache.get(shas)
+        if len(entries) < len(shas):
+            self.update_commit_cache()
+            entries.update(self.commit_cache.get([s for s in shas if s not in entries]))
+
+            # Anything still missing isn't reachable from HEAD (e.g. another branch), so load it directly
+            missing = [s for s in shas if s not in entries]
+            if missing:
+                new_entries = list(self._run_log(['--no-walk=unsorted'] + missing, COMMIT_CACHE_FIELDS))
+                self.commit_cache.put(new_entries)
+                entries.update({e["commit"]: e for e in new_entries})
+
+        result = list()
+        for sha in shas:
+            entry = {"commit": sha}
+            entry.update({f: entries[sha][f] for f in fields})
+            result.append(entry)
         return result
 
     def log_entry(self, commit):
@@ -506,6 +993,9 @@ class GitFilesystem(GitRepoInterface):
             logger.error("Commit hash {} not found: {}".format(commit, BadName))
             raise ValueError("Commit {} not found".format(commit))
 
+        if self.commit_cache is not None:
+            return self._get_cached_log_entries([entry.hexsha], LOG_FIELDS)[0]
+
         return {
                  "commit": entry.hexsha,
                  "author":  {"name": entry.author.name, "email": entry.author.email},
@@ -514,6 +1004,110 @@ class GitFilesystem(GitRepoInterface):
                  "message": entry.message
                }
 
+    @property
+    def blame_cache(self) -> Optional[BlameCache]:
+        """The blame results cache for the current repository, if enabled with `blame_cache` in the git config
+
+        Returns:
+            BlameCache
+        """
+        if not self.config.get('blame_cache') or self.repo is None or self.repo.bare:
+            return None
+
+        if self._blame_cache is None or os.path.dirname(self._blame_cache.path) != self.repo.git_dir:
+            if self._blame_cache is not None:
+                self._blame_cache.close()
+            self._blame_cache = BlameCache(self.repo.git_dir)
+
+        return self._blame_cache
+
+    def _run_blame(self, rev, filename):
+        """Method to run `git blame` and parse the porcelain output into per line attribution
+
+        Args:
+            rev(str): Revision, or revision range, to blame
+            filename(str): Filename to query
+
+        Returns:
+            list(tuple): (commit hash, line number in that commit, boundary, filename in that commit, content) for
+            each line
+        """
+        output = self.repo.git.blame('--porcelain', rev, '--', filename, stdout_as_string=False)
+
+        result = list()
+        boundaries = set()
+        sha, orig_line, orig_filename = None, None, None
+        for line in output.split(b'\n'):
+            if line.startswith(b'\t'):
+                # Like GitPython, trailing whitespace is stripped from the content
+                content = line[1:].decode('utf-8', 'replace').rstrip()
+                result.append((sha, orig_line, sha in boundaries, orig_filename, content))
+                continue
+
+            parts = line.split(b' ')
+            if len(parts) in (3, 4) and BLAME_HEADER_SHA_RE.match(parts[0]):
+                sha = parts[0].decode()
+                orig_line = int(parts[1])
+            elif parts[0] == b'boundary':
+                boundaries.add(sha)
+            elif parts[0] == b'filename':
+                orig_filename = line[len(b'filename '):].decode('utf-8', 'replace')
+
+        return result
+
+    def _blame_lines(self, filename):
+        """Method to get the commit and line number in that commit for each line of a file, using the blame cache
+
+        If the version of the file at HEAD isn't cached, but an older version is, only the commits since the older
+        version was blamed are walked, and lines that are unchanged since then reuse its cached results.
+
+        Args:
+            filename(str): Filename to query
+
+        Returns:
+            tuple(list, list): (commit hash, line number in that commit) and content for each line
+        """
+        cache = self.blame_cache
+        path = os.path.relpath(filename, self.working_directory) if os.path.isabs(filename) else filename
+        path = os.path.normpath(path).replace(os.path.sep, '/')
+        try:
+            blob = self.repo.head.commit.tree[path].hexsha if cache else None
+        except KeyError:
+            blob = None
+
+        if blob is None:
+            blame = self._run_blame('HEAD', filename)
+            return [(b[0], b[1]) for b in blame], [b[4] for b in blame]
+
+        cached = cache.get(path, blob)
+        if cached:
+            return cached["lines"], cached["content"]
+
+        head = self.commit_hash
+        lines = None
+        previous = cache.get_latest(path)
+        if previous and self.repo.is_ancestor(previous["rev"], head):
+            lines = list()
+            blame = self._run_blame(f'{previous["rev"]}..{head}', filename)
+            for sha, orig_line, boundary, orig_filename, content in blame:
+                if not boundary:
+                    lines.append((sha, orig_line))
+                elif sha == previous["rev"] and orig_filename == path and orig_line <= len(previous["lines"]):
+                    # Unchanged since the previous blame, so reuse its result
+                    lines.append(tuple(previous["lines"][orig_line - 1]))
+                else:
+                    # Reached history the previous blame doesn't cover (e.g. through a merge)
+                    lines = None
+                    break
+
+        if lines is None:
+            blame = self._run_blame(head, filename)
+            lines = [(b[0], b[1]) for b in blame]
+        content = [b[4] for b in blame]
+
+        cache.put(path, blob, head, lines, content)
+        return lines, content
+
     def blame(self, filename):
         """Method to get the revision and author for each line of a file
 
@@ -534,16 +1128,35 @@ class GitFilesystem(GitRepoInterface):
         Returns:
             list(dict)
         """
-        blame_data = self.repo.blame('HEAD', filename)
+        lines, content = self._blame_lines(filename)
+
+        # Group consecutive lines from the same part of the same commit
+        blocks: List[Tuple[str, List[str]]] = list()
+        previous = None
+        for (sha, orig_line), line_content in zip(lines, content):
+            if previous and previous[0] == sha and previous[1] + 1 == orig_line:
+                blocks[-1][1].append(line_content)
+            else:
+                blocks.append((sha, [line_content]))
+            previous = (sha, orig_line)
+
+        shas = list(OrderedDict.fromkeys(b[0] for b in blocks))
+        fields = ["author", "committed_on", "message"]
+        if self.commit_cache is not None:
+            entries = self._get_cached_log_entries(shas, fields)
+        else:
+            entries = list(self._run_log(['--no-walk=unsorted'] + shas, fields)) if shas else []
+        entries_by_sha = {e["commit"]: e for e in entries}
 
         result = []
-        for b in blame_data:
+        for sha, block_content in blocks:
+            entry = entries_by_sha[sha]
             result.append({
-                            "commit": b[0].hexsha,
-                            "author": {"name": b[0].author.name, "email": b[0].author.email},
-                            "committed_on": b[0].committed_datetime,
-                            "message": b[0].message,
-                            "content": "\n".join(b[1])
+                            "commit": sha,
+                            "author": entry["author"],
+                            "committed_on": entry["committed_on"],
+                            "message": entry["message"],
+                            "content": "\n".join(block_content)
                           })
 
         return result
@@ -597,9 +1210,42 @@ class GitFilesystem(GitRepoInterface):
 
             where local are branches currently available locally
 
+        The listing is cached per repository until `HEAD`, `packed-refs` or any directory under `refs` changes, so
+        repeated calls only cost a few stats.
+
         Returns:
             dict
         """
+        git_dir = os.path.realpath(self.repo.git_dir)
+        snapshot = self._ref_snapshot(git_dir)
+        cached = _branch_cache.get(git_dir, snapshot)
+        if cached is not None:
+            return {key: list(names) for key, names in cached.items()}
+
+        listed_at = time.time()
+        branches = self._list_branches()
+        _branch_cache.put(git_dir, snapshot, {key: list(names) for key, names in branches.items()},
+                          max(entry[1] or 0 for entry in snapshot), listed_at)
+        return branches
+
+    @staticmethod
+    def _ref_snapshot(git_dir: str) -> tuple:
+        """Stat signature of everything branch listings are read from. Refs are updated by renaming lock files
+        into place, so adding, moving or deleting one changes the mtime of its directory or of packed-refs."""
+        snapshot: List[Tuple[str, Optional[int], Optional[int], Optional[int]]] = []
+        for path in [os.path.join(git_dir, 'HEAD'), os.path.join(git_dir, 'packed-refs')]:
+            try:
+                st = os.stat(path)
+                snapshot.append((path, st.st_mtime_ns, st.st_ino, st.st_size))
+            except FileNotFoundError:
+                snapshot.append((path, None, None, None))
+        for dirpath, _, _ in os.walk(os.path.join(git_dir, 'refs')):
+            st = os.stat(dirpath)
+            snapshot.append((dirpath, st.st_mtime_ns, st.st_ino, None))
+        return tuple(snapshot)
+
+    def _list_branches(self) -> Dict[str, List[str]]:
+        """List local and remote branches from the repository, bypassing the cache"""
         local = []
         remote = []
         for ref in self.repo.refs:
@@ -610,6 +1256,51 @@ class GitFilesystem(GitRepoInterface):
 
         return {"local": local, "remote": remote}
 
+    def ahead_behind(self, local_ref, remote_ref) -> Tuple[int, int]:
+        """Method to count the commits a local ref is ahead of and behind another (usually remote) ref
+
+        Both refs are resolved to commits first, and the counts are cached per process by that pair of SHAs, so
+        repeated checks only walk history again when either ref moves. Shallow repositories are never cached, as
+        their counts change when history is deepened.
+
+        Args:
+            local_ref(str): Local branch name or revision
+            remote_ref(str): Remote branch name (e.g. `origin/master`) or revision
+
+        Returns:
+            tuple(int, int): Commits reachable only from local_ref, and commits reachable only from remote_ref
+        """
+        key = self._resolve_commit_pair(local_ref, remote_ref)
+        if self.is_shallow:
+            return self._count_ahead_behind(*key)
+
+        with _ahead_behind_lock:
+            counts = _ahead_behind_cache.get(key)
+            if counts is not None:
+                _ahead_behind_cache.move_to_end(key)
+                return counts
+
+        counts = self._count_ahead_behind(*key)
+        with _ahead_behind_lock:
+            _ahead_behind_cache[key] = counts
+            while len(_ahead_behind_cache) > AHEAD_BEHIND_CACHE_SIZE:
+                _ahead_behind_cache.popitem(last=False)
+        return counts
+
+    def _resolve_commit_pair(self, local_ref: str, remote_ref: str) -> Tuple[str, str]:
+        """Resolve two revisions to commit SHAs with a single rev-parse"""
+        try:
+            local_sha, remote_sha = self.repo.git.rev_parse(f"{local_ref}^{{commit}}",
+                                                            f"{remote_ref}^{{commit}}").split()
+        except GitCommandError:
+            raise ValueError(f"Cannot resolve `{local_ref}` and `{remote_ref}` to commits")
+        return local_sha, remote_sha
+
+    def _count_ahead_behind(self, local_sha: str, remote_sha: str) -> Tuple[int, int]:
+        """Count commits only reachable from each side with a single `rev-list --left-right --count`"""
+        ahead, behind = self.repo.git.rev_list('--left-right', '--count', f"{local_sha}...{remote_sha}").split()
+        return int(ahead), int(behind)
+
     def delete_branch(self, name, delete_remote=False, remote="origin", force=False):
         """Method to delete a branch
 
@@ -773,6 +1464,22 @@ class GitFilesystem(GitRepoInterface):
         if len(self.repo.remotes) > 0:
             self.repo.remotes[remote].fetch(refspec)
 
+    def deepen(self, count, remote="origin"):
+        """Method to fetch more history into a shallow repository
+
+        Args:
+            count(int): Number of additional commits of history to fetch for each branch
+            remote(str): name of remote, default to `origin`
+
+        Returns:
+            None
+        """
+        if count < 1:
+            raise ValueError("count must be greater than or equal to 1")
+
+        logger.info(f"Deepening history by {count} commits in Git repo at {self.working_directory}")
+        self.repo.git.fetch(f"--deepen={count}", remote)
+
     def pull(self, refspec=None, remote="origin"):
         """Method fetch and integrate a remote
 
@@ -833,6 +1540,164 @@ class GitFilesystem(GitRepoInterface):
 
         # Now checkout latest commit
         current_branch.checkout(force=True)
+
+    def preview_merge(self, target, source) -> List[str]:
+        """Method to check whether merging one revision into another would conflict, without touching the index,
+        the working tree or any refs
+
+        Args:
+            target(str): Branch name or revision that would receive the merge
+            source(str): Branch name or revision to merge
+
+        Returns:
+            list(str): Paths that would conflict. Empty if the merge is clean
+        """
+        target_sha, source_sha = self._resolve_commit_pair(target, source)
+        if self._is_ancestor(source_sha, target_sha) or self._is_ancestor(target_sha, source_sha):
+            return []
+        return self._merge_trees(target_sha, source_sha)[1]
+
+    def merge_into(self, target_branch, source, message=None, author=None, committer=None) -> str:
+        """Method to merge a revision into a branch that is not checked out, by computing the merge in memory and
+        updating the branch ref directly. The index and working tree are never touched.
+
+        Like `git merge`, this fast-forwards when possible and does nothing if source is already merged.
+
+        Args:
+            target_branch(str): Name of the local branch to update. Must not be the checked out branch
+            source(str): Branch name or revision to merge
+            message(str): Merge commit message. Defaults to "Merged <source> into <target_branch>"
+            author(GitAuthor): User info for the author, if omitted, assume the "system"
+            committer(GitAuthor): User info for the committer. If omitted, set to the author
+
+        Returns:
+            str: The commit hash target_branch points to after the merge
+        """
+        if target_branch not in self.list_branches()["local"]:
+            raise ValueError("Branch `{}` not found.".format(target_branch))
+
+        target_sha, source_sha = self._resolve_commit_pair(f"refs/heads/{target_branch}", source)
+        if self._is_ancestor(source_sha, target_sha):
+            return target_sha
+
+        if target_branch == self.get_current_branch_name():
+            raise ValueError(f"Cannot merge into checked out branch `{target_branch}` without updating the working "
+                             f"tree, use merge() instead")
+
+        if author:
+            self.update_author(author, committer=committer)
+
+        if self._is_ancestor(target_sha, source_sha):
+            new_sha = source_sha
+        else:
+            tree_sha, conflicts = self._merge_trees(target_sha, source_sha)
+            if conflicts or tree_sha is None:
+                raise ValueError(f"Merging `{source}` into `{target_branch}` conflicts in: {', '.join(conflicts)}")
+            new_sha = self._create_merge_commit(tree_sha, [target_sha, source_sha],
+                                                message or f"Merged {source} into {target_branch}")
+
+        logger.info(f"Merged {source} into {target_branch} in Git repo at {self.working_directory}")
+        # Only move the ref if nobody else moved it while the merge was computed
+        self.repo.git.update_ref('-m', f"merge {source}", f"refs/heads/{target_branch}", new_sha, target_sha)
+        return new_sha
+
+    def _is_ancestor(self, ancestor_sha: str, sha: str) -> bool:
+        """Return True if ancestor_sha is sha or one of its ancestors"""
+        return ancestor_sha == sha or self.repo.is_ancestor(ancestor_sha, sha)
+
+    def _merge_trees(self, ours_sha: str, theirs_sha: str) -> Tuple[Optional[str], List[str]]:
+        """Compute the merged tree of two commits without a working tree
+
+        Returns:
+            tuple(str, list): Hash of the merged tree (None on conflicts), and the conflicting paths
+        """
+        status, out, _ = self.repo.git.merge_tree('--write-tree', '--name-only', '--no-messages', '-z',
+                                                  ours_sha, theirs_sha,
+                                                  with_extended_output=True, with_exceptions=False)
+        if status in (0, 1):
+            tree_sha, *conflicts = [x for x in out.split('\0') if x]
+            return (None, conflicts) if status == 1 else (tree_sha, [])
+
+        # git < 2.38 has no --write-tree mode. Fall back to a 3-way read-tree into a temporary index, which resolves
+        # path-level merges, then merge the contents of files changed on both sides like git merge does
+        bases = self.repo.merge_base(ours_sha, theirs_sha)
+        if not bases:
+            raise ValueError(f"Commits {ours_sha} and {theirs_sha} have no common history")
+        index = IndexFile.from_tree(self.repo, bases[0], ours_sha, theirs_sha)
+
+        unmerged: Dict[str, Dict[int, IndexEntry]] = dict()
+        for (path, stage), entry in index.entries.items():
+            if stage != 0:
+                unmerged.setdefault(path, dict())[stage] = entry
+
+        conflicts = []
+        for path, stages in sorted(unmerged.items()):
+            merged = self._merge_file(stages)
+            if merged is None:
+                conflicts.append(path)
+                continue
+            for stage in stages:
+                del index.entries[(path, stage)]
+            index.entries[(path, 0)] = IndexEntry.from_blob(Blob(self.repo, merged[0], merged[1], path))
+
+        if conflicts:
+            return None, conflicts
+        return index.write_tree().hexsha, []
+
+    def _merge_file(self, stages: Dict[int, IndexEntry]) -> Optional[Tuple[bytes, int]]:
+        """Merge the contents of a file changed on both sides with `git merge-file`
+
+        Args:
+            stages(dict): Index entries of the file by stage: 1 for the merge base (absent if added on both sides),
+                          2 for ours and 3 for theirs
+
+        Returns:
+            tuple(bytes, int): Binary hash of the merged blob, which is written to the object database, and its mode.
+                               None if the file conflicts
+        """
+        if 2 not in stages or 3 not in stages:
+            # Modified on one side and deleted on the other
+            return None
+
+        ours, theirs = stages[2], stages[3]
+        base_mode = stages[1].mode if 1 in stages else None
+        if ours.mode == theirs.mode or theirs.mode == base_mode:
+            mode = ours.mode
+        elif ours.mode == base_mode:
+            mode = theirs.mode
+        else:
+            return None
+        if not stat.S_ISREG(mode):
+            # Symlinks and submodules are never merged line by line
+            return None
+
+        contents = [self.repo.odb.stream(stages[1].binsha).read() if 1 in stages else b'',
+                    self.repo.odb.stream(ours.binsha).read(),
+                    self.repo.odb.stream(theirs.binsha).read()]
+        if any(b'\0' in c for c in contents):
+            # Binary files conflict unless identical, which read-tree has already resolved
+            return None
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            paths = [os.path.join(tempdir, name) for name in ('base', 'ours', 'theirs')]
+            for file_path, content in zip(paths, contents):
+                with open(file_path, 'wb') as f:
+                    f.write(content)
+            # Exit status is the number of conflicts. Run directly, as GitPython strips the output's final newline
+            r = subprocess.run(['git', 'merge-file', '-p', '-q', paths[1], paths[0], paths[2]],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=self.working_directory)
+        if r.returncode != 0:
+            return None
+
+        istream = self.repo.odb.store(IStream(Blob.type, len(r.stdout), BytesIO(r.stdout)))
+        return istream.binsha, mode
+
+    def _create_merge_commit(self, tree_sha: str, parents: List[str], message: str) -> str:
+        """Write a commit object without updating any ref, returning its hash"""
+        commit = Commit.create_from_tree(self.repo, self.repo.tree(tree_sha), message,
+                                         parent_commits=[self.repo.commit(p) for p in parents], head=False,
+                                         author=self.author, committer=self.committer)
+        return commit.hexsha
     # MERGE METHODS
 
     # UNDO METHODS
@@ -20,25 +20,152 @@
 from lmcommon.gitlib.git_fs import GitFilesystem
 from lmcommon.logging import LMLogger
 import subprocess
+from typing import Dict, List, Tuple
 
 logger = LMLogger.get_logger()
 
 
+# Map porcelain v2 XY status codes to the change names used by GitFilesystem.status
+STAGED_STATUS_CODES = {'A': 'added', 'C': 'added', 'D': 'deleted', 'M': 'modified', 'T': 'modified',
+                       'R': 'renamed'}
+UNSTAGED_STATUS_CODES = {'A': 'added', 'D': 'deleted', 'M': 'modified', 'T': 'modified', 'R': 'renamed'}
+
+# Bytes of paths passed to a single git process, well below ARG_MAX (at least 128 KiB on Linux) once the environment
+# and the pointer per argument are accounted for
+MAX_ARGV_BYTES = 64 * 1024
+
+
+def _chunk_paths(paths: List[str], max_bytes: int) -> List[List[str]]:
+    """Function to split a list of paths into chunks small enough to pass as arguments to one process
+
+    Args:
+        paths(list): Paths to split
+        max_bytes(int): Maximum encoded size of each chunk
+
+    Returns:
+        list(list)
+    """
+    chunks: List[List[str]] = list()
+    chunk: List[str] = list()
+    chunk_bytes = 0
+    for path in paths:
+        # Each argument also costs a NUL terminator and an argv pointer
+        path_bytes = len(path.encode('utf-8')) + 9
+        if chunk and chunk_bytes + path_bytes > max_bytes:
+            chunks.append(chunk)
+            chunk, chunk_bytes = list(), 0
+        chunk.append(path)
+        chunk_bytes += path_bytes
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
 class GitFilesystemShimmed(GitFilesystem):
 
-    def add(self, filename):
-        """Add a file to a commit
+    @staticmethod
+    def _parse_porcelain_v2_status(output: str) -> Dict[str, List]:
+        """Method to parse the output of `git status --porcelain=v2 -z` into the status dictionary format
 
         Args:
-            filename(str): Filename to add.
+            output(str): Decoded, NUL separated output of git status
 
         Returns:
-            None
+            (dict(list))
+        """
+        staged: List[Tuple[str, str]] = list()
+        unstaged: List[Tuple[str, str]] = list()
+        untracked: List[str] = list()
+
+        entries = iter(output.split('\0'))
+        for entry in entries:
+            if not entry:
+                continue
+
+            entry_type = entry[0]
+            if entry_type == '?':
+                untracked.append(entry[2:])
+            elif entry_type == '1':
+                # 1 <XY> <sub> <mH> <mI> <mW> <hH> <hI> <path>
+                fields = entry.split(' ', 8)
+                xy, path = fields[1], fields[8]
+                if xy[0] in STAGED_STATUS_CODES:
+                    staged.append((path, STAGED_STATUS_CODES[xy[0]]))
+                if xy[1] in UNSTAGED_STATUS_CODES:
+                    unstaged.append((path, UNSTAGED_STATUS_CODES[xy[1]]))
+            elif entry_type == '2':
+                # 2 <XY> <sub> <mH> <mI> <mW> <hH> <hI> <X><score> <path>, followed by the original path
+                fields = entry.split(' ', 9)
+                xy, path = fields[1], fields[9]
+                orig_path = next(entries)
+                if xy[0] in STAGED_STATUS_CODES:
+                    # Staged renames are reported by their original path, as GitPython's index diff does
+                    staged.append((orig_path if xy[0] == 'R' else path, STAGED_STATUS_CODES[xy[0]]))
+                if xy[1] in UNSTAGED_STATUS_CODES:
+                    unstaged.append((path, UNSTAGED_STATUS_CODES[xy[1]]))
+            elif entry_type == 'u':
+                # u <XY> <sub> <m1> <m2> <m3> <mW> <h1> <h2> <h3> <path>
+                staged.append((entry.split(' ', 10)[10], "unmerged"))
+            elif entry_type != '!':
+                raise ValueError("Unsupported status entry: {}".format(entry))
+
+        return {"staged": staged, "unstaged": unstaged, "untracked": untracked}
+
+    def status(self) -> Dict[str, List[Tuple[str, str]]]:
+        """Get the status of a repo
+
+        Should return a dictionary of lists of tuples of the following format:
+
+            {
+                "staged": [(filename, status), ...],
+                "unstaged": [(filename, status), ...],
+                "untracked": [filename, ...]
+            }
+
+            status is the status of the file (new, modified, deleted)
+
+        Unlike GitFilesystem, which walks the repository three times (untracked files, index vs. HEAD and working
+        tree vs. index), this runs a single `git status --porcelain=v2`. If `untracked_cache` is set in the git config,
+        git's untracked cache is enabled to speed up the untracked file scan.
+
+        Returns:
+            (dict(list))
         """
-        logger.info("Adding file {} to Git repository in {}".format(filename, self.working_directory))
+        cmd = ['git']
+        if self.config.get('untracked_cache'):
+            cmd.extend(['-c', 'core.untrackedCache=true'])
+        cmd.extend(['status', '--porcelain=v2', '-z', '--untracked-files=all'])
+
         try:
-            r = subprocess.run(['git', 'add', f'{filename}'], stderr=subprocess.PIPE, stdout=subprocess.PIPE,
-                               check=True, cwd=self.working_directory)
+            r = subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, check=True,
+                               cwd=self.working_directory)
         except subprocess.CalledProcessError as x:
             logger.error(f'{x.stdout}, {x.stderr}')
             raise
+
+        return self._parse_porcelain_v2_status(r.stdout.decode('utf-8'))
+
+    def add(self, filename):
+        """Add a file, or a batch of files, to a commit
+
+        A list of files is staged with a single `git add` process, or a few for batches too large for one command
+        line.
+
+        Args:
+            filename(str|list): Filename, or list of filenames, to add.
+
+        Returns:
+            None
+        """
+        paths = self._as_path_list(filename)
+        if not paths:
+            return
+
+        logger.info("Adding {} to Git repository in {}".format(self._describe_paths(paths), self.working_directory))
+        for chunk in _chunk_paths(paths, MAX_ARGV_BYTES):
+            try:
+                subprocess.run(['git', 'add', '--', *chunk], stderr=subprocess.PIPE, stdout=subprocess.PIPE,
+                               check=True, cwd=self.working_directory)
+            except subprocess.CalledProcessError as x:
+                logger.error(f'{x.stdout}, {x.stderr}')
+                raise
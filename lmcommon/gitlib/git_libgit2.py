@@ -0,0 +1,565 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import datetime
+import itertools
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pygit2
+
+from lmcommon.gitlib.git import LOG_FIELDS
+from lmcommon.gitlib.git_fs_shim import GitFilesystemShimmed
+from lmcommon.logging import LMLogger
+
+logger = LMLogger.get_logger()
+
+# Map libgit2 status flags to the change names used by GitFilesystem.status
+STAGED_STATUS_FLAGS = [(pygit2.GIT_STATUS_INDEX_NEW, 'added'),
+                       (pygit2.GIT_STATUS_INDEX_MODIFIED, 'modified'),
+                       (pygit2.GIT_STATUS_INDEX_TYPECHANGE, 'modified'),
+                       (pygit2.GIT_STATUS_INDEX_DELETED, 'deleted'),
+                       (pygit2.GIT_STATUS_INDEX_RENAMED, 'renamed')]
+UNSTAGED_STATUS_FLAGS = [(pygit2.GIT_STATUS_WT_MODIFIED, 'modified'),
+                         (pygit2.GIT_STATUS_WT_TYPECHANGE, 'modified'),
+                         (pygit2.GIT_STATUS_WT_DELETED, 'deleted'),
+                         (pygit2.GIT_STATUS_WT_RENAMED, 'renamed')]
+
+
+class GitFilesystemLibgit2(GitFilesystemShimmed):
+    """Git interface that runs common local operations in-process with libgit2 (via pygit2)
+
+    Status, staging, commits, history and branch listing don't spawn git processes or cat-file pipes. Everything
+    else (remotes, checkout, merge, diff, submodules) is inherited from the GitPython based implementations. Paths
+    that are handled by a filter such as git-lfs are added with git itself, since libgit2 doesn't run external
+    filters.
+    """
+
+    def __init__(self, config_dict, author=None, committer=None):
+        """Constructor
+
+        Args:
+            config_dict(dict): Configuration details for the interface
+            author(GitAuthor): User info for the author, if omitted, assume the "system"
+            committer(GitAuthor): User info for the committer. If omitted, set to the author
+        """
+        self._lg_repo: Optional[pygit2.Repository] = None
+        GitFilesystemShimmed.__init__(self, config_dict, author=author, committer=committer)
+
+    @property
+    def lg_repo(self) -> pygit2.Repository:
+        """The libgit2 repository for the current working directory, opened on first use
+
+        Returns:
+            pygit2.Repository
+        """
+        if self.repo is None:
+            raise ValueError(f"No git repository in {self.working_directory}")
+
+        if self._lg_repo is None or os.path.normpath(self._lg_repo.path) != os.path.normpath(self.repo.git_dir):
+            self._lg_repo = pygit2.Repository(self.repo.git_dir)
+        return self._lg_repo
+
+    def _index(self) -> pygit2.Index:
+        """Method to get the index, reloaded if it was changed on disk by another process or interface
+
+        Returns:
+            pygit2.Index
+        """
+        index = self.lg_repo.index
+        index.read(False)
+        return index
+
+    def _relative_path(self, filename: str) -> str:
+        """Method to get a path relative to the working directory, as libgit2 expects
+
+        Args:
+            filename(str): Absolute or relative path
+
+        Returns:
+            str
+        """
+        if os.path.isabs(filename):
+            filename = os.path.relpath(filename, self.working_directory)
+        return filename.replace(os.path.sep, '/')
+
+    def _is_filtered(self, relative_path: str) -> bool:
+        """Method to check if a path is handled by a filter (e.g. git-lfs) that libgit2 can't run
+
+        Args:
+            relative_path(str): Path relative to the working directory
+
+        Returns:
+            bool
+        """
+        return self.lg_repo.get_attr(relative_path, 'filter') not in (None, False)
+
+    def fetch(self, refspec=None, remote="origin"):
+        """Method to download objects and refs from a remote
+
+        libgit2 caches the shallow boundary and packs of an open repository, so it is reopened afterwards.
+
+        Args:
+            refspec(str): string describing the mapping between remote ref and local ref
+            remote(str): name of remote, default to `origin`
+
+        Returns:
+            None
+        """
+        try:
+            GitFilesystemShimmed.fetch(self, refspec=refspec, remote=remote)
+        finally:
+            self._lg_repo = None
+
+    def deepen(self, count, remote="origin"):
+        """Method to fetch more history into a shallow repository, reopening the libgit2 repository afterwards
+
+        Args:
+            count(int): Number of additional commits of history to fetch for each branch
+            remote(str): name of remote, default to `origin`
+
+        Returns:
+            None
+        """
+        try:
+            GitFilesystemShimmed.deepen(self, count, remote=remote)
+        finally:
+            self._lg_repo = None
+
+    def pull(self, refspec=None, remote="origin"):
+        """Method fetch and integrate a remote, reopening the libgit2 repository afterwards
+
+        Args:
+            refspec(str): string describing the mapping between remote ref and local ref
+            remote(str): name of remote, default to `origin`
+
+        Returns:
+            None
+        """
+        try:
+            GitFilesystemShimmed.pull(self, refspec=refspec, remote=remote)
+        finally:
+            self._lg_repo = None
+
+    @property
+    def commit_hash(self):
+        """Get the current commit hash
+
+        Returns:
+            str
+        """
+        return self.lg_repo.head.target.hex
+
+    @property
+    def commit_hash_short(self):
+        """Get the current commit hash, limit to 8 character
+
+        Returns:
+            str
+        """
+        return self.commit_hash[:8]
+
+    @property
+    def committed_on(self):
+        """Get the datetime the commit occurred
+
+        Returns:
+            datetime.datetime
+        """
+        return self._commit_datetime(self.lg_repo.head.peel(pygit2.Commit))
+
+    def get_current_branch_name(self):
+        """Method to get the current branch name
+
+        Returns:
+            str
+        """
+        if self.lg_repo.head_is_unborn or self.lg_repo.head_is_detached:
+            return GitFilesystemShimmed.get_current_branch_name(self)
+        return self.lg_repo.head.shorthand
+
+    def status(self) -> Dict[str, List[Any]]:
+        """Get the status of a repo
+
+        Should return a dictionary of lists of tuples of the following format:
+
+            {
+                "staged": [(filename, status), ...],
+                "unstaged": [(filename, status), ...],
+                "untracked": [filename, ...]
+            }
+
+            status is the status of the file (new, modified, deleted)
+
+        Returns:
+            (dict(list))
+        """
+        staged: List[Tuple[str, str]] = list()
+        unstaged: List[Tuple[str, str]] = list()
+        untracked: List[str] = list()
+
+        status = self.lg_repo.status()
+        renamed = self._staged_renames(status)
+
+        for path, flags in sorted(status.items()):
+            if flags & pygit2.GIT_STATUS_CONFLICTED:
+                staged.append((path, "unmerged"))
+                continue
+            if flags & pygit2.GIT_STATUS_WT_NEW:
+                untracked.append(path)
+            if path in renamed:
+                # Like GitPython, a staged rename is reported once, with the original path
+                if renamed[path] is not None:
+                    staged.append((path, "renamed"))
+            else:
+                for flag, change in STAGED_STATUS_FLAGS:
+                    if flags & flag:
+                        staged.append((path, change))
+                        break
+            for flag, change in UNSTAGED_STATUS_FLAGS:
+                if flags & flag:
+                    unstaged.append((path, change))
+                    break
+
+        return {"staged": staged, "unstaged": unstaged, "untracked": untracked}
+
+    def _staged_renames(self, status: Dict[str, int]) -> Dict[str, Optional[str]]:
+        """Method to detect staged renames, which libgit2 doesn't do when computing status
+
+        Args:
+            status(dict): Status flags by path, from pygit2.Repository.status()
+
+        Returns:
+            dict: original path -> new path, and new path -> None for each rename
+        """
+        flags = set(status.values())
+        if not any(f & pygit2.GIT_STATUS_INDEX_DELETED for f in flags) or \
+                not any(f & pygit2.GIT_STATUS_INDEX_NEW for f in flags):
+            return dict()
+
+        diff = self._index().diff_to_tree(self.lg_repo.head.peel(pygit2.Tree))
+        diff.find_similar()
+        renamed: Dict[str, Optional[str]] = dict()
+        for delta in diff.deltas:
+            if delta.status == pygit2.GIT_DELTA_RENAMED:
+                renamed[delta.old_file.path] = delta.new_file.path
+                renamed[delta.new_file.path] = None
+        return renamed
+
+    def is_dirty(self) -> bool:
+        """Check if a repo has any staged, unstaged, or untracked changes
+
+        Returns:
+            bool
+        """
+        return any(flags & ~pygit2.GIT_STATUS_IGNORED for flags in self.lg_repo.status().values())
+
+    def add(self, filename):
+        """Add a file, or a batch of files, to a commit
+
+        A list of files is staged with a single index update.
+
+        Args:
+            filename(str|list): Filename, or list of filenames, to add.
+
+        Returns:
+            None
+        """
+        paths = self._as_path_list(filename)
+        filtered: List[str] = list()
+        unfiltered: List[str] = list()
+        for path in paths:
+            relative_path = self._relative_path(path)
+            if self._is_filtered(relative_path):
+                filtered.append(path)
+            else:
+                unfiltered.append(relative_path)
+
+        if filtered:
+            GitFilesystemShimmed.add(self, filtered)
+
+        if unfiltered:
+            logger.info(f"Adding {self._describe_paths(unfiltered)} to Git repository in {self.working_directory}")
+            index = self._index()
+            # Like git, reject paths that neither exist nor are tracked, instead of matching nothing
+            for relative_path in unfiltered:
+                if not os.path.lexists(os.path.join(self.working_directory, relative_path)) and \
+                        relative_path not in index:
+                    raise ValueError(f"Cannot add {relative_path}, no such file in {self.working_directory}")
+            index.add_all(unfiltered)
+            index.write()
+
+    def add_all(self, relative_directory=None):
+        """Add all changes/files, like the `git add -A` command
+
+        Changed paths are staged in-process, except those handled by a filter (e.g. git-lfs), which are staged with
+        git so the filter runs. A labbook whose changes are all LFS tracked therefore gets no speedup.
+
+        Args:
+            relative_directory(str): Relative directory (from the root_dir) to add everything
+
+        Returns:
+            None
+        """
+        prefix = self._relative_path(relative_directory).rstrip('/') if relative_directory else ''
+        changed = [path for path, flags in self.lg_repo.status().items()
+                   if flags != pygit2.GIT_STATUS_IGNORED and
+                   (not prefix or path == prefix or path.startswith(prefix + '/'))]
+        if not changed:
+            return
+
+        # Only the changed paths handled by a filter (e.g. git-lfs) are staged with git, the rest in-process
+        filtered: List[str] = list()
+        unfiltered: List[str] = list()
+        for path in changed:
+            (filtered if self._is_filtered(path) else unfiltered).append(path)
+
+        if filtered:
+            GitFilesystemShimmed.add(self, [os.path.join(self.working_directory, p) for p in filtered])
+
+        if unfiltered:
+            index = self._index()
+            index.add_all(unfiltered)
+            index.write()
+
+    def remove(self, filename, force=False, keep_file=True):
+        """Remove a file, or a batch of files, from tracking
+
+        A list of files is removed with a single index update.
+
+        Args:
+            filename(str|list): Filename, or list of filenames, to remove.
+            force(bool): Force removal
+            keep_file(bool): If true, don't delete the file (e.g. use the --cached flag)
+
+        Returns:
+            None
+        """
+        paths = self._as_path_list(filename)
+        if not paths:
+            return
+
+        is_file = [os.path.isfile(os.path.join(self.working_directory, p)) for p in paths]
+        index = self._index()
+        for path, path_is_file in zip(paths, is_file):
+            path_type = 'file' if path_is_file else 'directory'
+            logger.info(f"Removing {path_type} {path} from Git repo at {self.working_directory}")
+
+            relative_path = self._relative_path(path)
+            if path_is_file:
+                index.remove(relative_path)
+            else:
+                # The path may also be a file that no longer exists
+                index.remove_all([relative_path, relative_path + '/*'])
+        index.write()
+
+        if not keep_file:
+            for path, path_is_file in zip(paths, is_file):
+                if path_is_file:
+                    os.remove(os.path.join(self.working_directory, path))
+                else:
+                    shutil.rmtree(os.path.join(self.working_directory, path))
+
+    def commit(self, message, author=None, committer=None):
+        """Method to perform a commit operation
+
+        Args:
+            message(str): Commit message
+            author(GitAuthor): User info for the author, if omitted, assume the "system"
+            committer(GitAuthor): User info for the committer. If omitted, set to the author
+
+        Returns:
+            git.Commit -- hash of new commit
+        """
+        if not message:
+            raise ValueError("message cannot be None or empty")
+
+        if author:
+            self.update_author(author, committer=committer)
+
+        logger.info("Committing changes to Git repo at {}".format(self.working_directory))
+        tree = self._index().write_tree()
+        parents = [] if self.lg_repo.head_is_unborn else [self.lg_repo.head.target]
+
+        # Update the current branch, even if HEAD is unborn, like `git commit` does
+        ref = self.lg_repo.references.get('HEAD').target if not self.lg_repo.head_is_detached else 'HEAD'
+        oid = self.lg_repo.create_commit(ref,
+                                         pygit2.Signature(self.author.name, self.author.email),
+                                         pygit2.Signature(self.committer.name, self.committer.email),
+                                         message, tree, parents)
+
+        # Return a GitPython commit object for compatibility with the other backends. It is loaded lazily
+        return self.repo.commit(oid.hex)
+
+    @staticmethod
+    def _commit_datetime(commit: pygit2.Commit) -> datetime.datetime:
+        """Method to get the timezone aware datetime a commit was committed on
+
+        Args:
+            commit(pygit2.Commit): The commit
+
+        Returns:
+            datetime.datetime
+        """
+        tz = datetime.timezone(datetime.timedelta(minutes=commit.commit_time_offset))
+        return datetime.datetime.fromtimestamp(commit.commit_time, tz)
+
+    def _log_entry_from_commit(self, commit: pygit2.Commit, fields: List[str]) -> dict:
+        """Method to build a log entry for a commit with the requested fields
+
+        Args:
+            commit(pygit2.Commit): The commit
+            fields(list): Fields to include
+
+        Returns:
+            dict
+        """
+        entry = {"commit": commit.hex}
+        for field in fields:
+            if field == "author":
+                entry[field] = {"name": commit.author.name, "email": commit.author.email}
+            elif field == "committer":
+                entry[field] = {"name": commit.committer.name, "email": commit.committer.email}
+            elif field == "committed_on":
+                entry[field] = self._commit_datetime(commit)
+            elif field == "message":
+                entry[field] = commit.message
+        return entry
+
+    def iter_log(self, path_info=None, max_count=None, filename=None, skip=None, since=None, author=None,
+                 fields=None):
+        """Method to lazily iterate over the commit history, loading only the requested fields
+
+        History of a single revision is walked in-process. Filtering by file, date, author, or a revision range,
+        and shallow repositories (whose truncated parents the walker can't skip), use the inherited `git log` based
+        implementation.
+
+        Args:
+            path_info(str): Optional path info to filter (e.g., hash1, hash2..hash1, master)
+            filename(str): Optional filename to filter on
+            max_count(int): Optional number of commit records to return
+            skip(int): Optional number of commit records to skip (supports building pagination)
+            since(datetime.datetime): Optional *date* to limit on
+            author(str): Optional filter based on author name
+            fields(list): Optional list of fields to load, from LOG_FIELDS. If omitted, load all fields
+
+        Returns:
+            iterator(dict)
+        """
+        if filename or since or author or (path_info and '..' in str(path_info)) or self.is_shallow:
+            yield from GitFilesystemShimmed.iter_log(self, path_info=path_info, max_count=max_count,
+                                                     filename=filename, skip=skip, since=since, author=author,
+                                                     fields=fields)
+            return
+
+        if fields is None:
+            fields = LOG_FIELDS
+        unsupported = set(fields) - set(LOG_FIELDS)
+        if unsupported:
+            raise ValueError(f"Unsupported log fields: {', '.join(sorted(unsupported))}")
+
+        start = self.lg_repo.revparse_single(str(path_info) if path_info else 'HEAD').peel(pygit2.Commit)
+        walker = self.lg_repo.walk(start.id, pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_TIME)
+        stop = skip + max_count if max_count and skip else max_count
+        for commit in itertools.islice(walker, skip, stop):
+            yield self._log_entry_from_commit(commit, fields)
+
+    def log_entry(self, commit):
+        """Method to get single commit records
+
+        Returns a single dictionary in format:
+
+            {
+                "commit": <commit hash (str)>,
+                "author": {"name": <name (str)>, "email": <email (str)>},
+                "committer": {"name": <name (str)>, "email": <email (str)>},
+                "committed_on": <commit datetime (datetime.datetime)>,
+                "message: <commit message (str)>
+            }
+
+        Args:
+            commit(str): The commit hash for the log entry to get
+
+        Returns:
+            dict
+
+        Raises:
+            ValueError
+        """
+        if not commit:
+            raise ValueError("commit cannot be None or empty")
+
+        try:
+            entry = self.lg_repo.revparse_single(str(commit)).peel(pygit2.Commit)
+        except (KeyError, ValueError, pygit2.GitError):
+            logger.error("Commit hash {} not found".format(commit))
+            raise ValueError("Commit {} not found".format(commit))
+
+        return self._log_entry_from_commit(entry, LOG_FIELDS)
+
+    def _list_branches(self) -> Dict[str, List[str]]:
+        """List local and remote branches from the repository in-process, bypassing the cache"""
+        local = []
+        remote = []
+        for name in sorted(self.lg_repo.references):
+            if name.startswith('refs/heads/'):
+                local.append(name[len('refs/heads/'):])
+            elif name.startswith('refs/remotes/'):
+                remote.append(name[len('refs/remotes/'):])
+
+        return {"local": local, "remote": remote}
+
+    def _resolve_commit_pair(self, local_ref: str, remote_ref: str) -> Tuple[str, str]:
+        """Resolve two revisions to commit SHAs in-process"""
+        try:
+            return (self.lg_repo.revparse_single(local_ref).peel(pygit2.Commit).hex,
+                    self.lg_repo.revparse_single(remote_ref).peel(pygit2.Commit).hex)
+        except (KeyError, ValueError, pygit2.GitError):
+            raise ValueError(f"Cannot resolve `{local_ref}` and `{remote_ref}` to commits")
+
+    def _count_ahead_behind(self, local_sha: str, remote_sha: str) -> Tuple[int, int]:
+        """Count commits only reachable from each side with libgit2's graph walk"""
+        return self.lg_repo.ahead_behind(local_sha, remote_sha)
+
+    def _is_ancestor(self, ancestor_sha: str, sha: str) -> bool:
+        """Return True if ancestor_sha is sha or one of its ancestors"""
+        return ancestor_sha == sha or self.lg_repo.descendant_of(sha, ancestor_sha)
+
+    def _merge_trees(self, ours_sha: str, theirs_sha: str) -> Tuple[Optional[str], List[str]]:
+        """Compute the merged tree of two commits in memory with libgit2"""
+        base = self.lg_repo.merge_base(ours_sha, theirs_sha)
+        if base is None:
+            raise ValueError(f"Commits {ours_sha} and {theirs_sha} have no common history")
+
+        index = self.lg_repo.merge_trees(base, ours_sha, theirs_sha)
+        if index.conflicts is not None:
+            conflicts: Set[str] = set()
+            for ancestor, ours, theirs in index.conflicts:
+                conflicts.update(entry.path for entry in (ancestor, ours, theirs) if entry is not None)
+            return None, sorted(conflicts)
+        return index.write_tree(self.lg_repo).hex, []
+
+    def _create_merge_commit(self, tree_sha: str, parents: List[str], message: str) -> str:
+        """Write a commit object without updating any ref, returning its hash"""
+        oid = self.lg_repo.create_commit(None,
+                                         pygit2.Signature(self.author.name, self.author.email),
+                                         pygit2.Signature(self.committer.name, self.committer.email),
+                                         message, pygit2.Oid(hex=tree_sha), [pygit2.Oid(hex=p) for p in parents])
+        return oid.hex
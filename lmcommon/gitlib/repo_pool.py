@@ -0,0 +1,220 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from git import Repo
+
+from lmcommon.logging import LMLogger
+
+logger = LMLogger.get_logger()
+
+
+class RepoPool(object):
+    """Process-wide, bounded pool of GitPython Repo handles keyed by working directory
+
+    Opening a Repo parses its config and each handle starts its own persistent `git cat-file` processes on first
+    use. Sharing handles lets repeated LabBook loads of the same repository reuse them. GitPython handles are not
+    thread safe, so handles are only shared within a thread.
+
+    Handles are evicted, and their `cat-file` processes closed, when the pool is full (least recently used first) or
+    when they haven't been used for `idle_timeout` seconds. Idle handles are also swept by a timer, so a process that
+    stops using the pool still releases them. An evicted handle stays usable by anything still holding it, it just
+    restarts its processes if needed.
+    """
+
+    def __init__(self, max_size: int = 32, idle_timeout: float = 300.0) -> None:
+        """Constructor
+
+        Args:
+            max_size(int): Maximum number of handles to keep open
+            idle_timeout(float): Seconds after which an unused handle is closed
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        # (directory, thread id) -> (Repo, git dir identity, last used time)
+        self._repos: 'OrderedDict[Tuple[str, int], Tuple[Repo, Tuple[int, int], float]]' = OrderedDict()
+        self._sweeper: Optional[threading.Timer] = None
+
+    def __len__(self) -> int:
+        return len(self._repos)
+
+    @staticmethod
+    def _identity(repo: Repo) -> Tuple[int, int]:
+        """Method to identify a repository's git dir, so a deleted and re-created repository isn't reused
+
+        Args:
+            repo(Repo): The repository
+
+        Returns:
+            tuple(int, int)
+        """
+        st = os.stat(repo.git_dir)
+        return st.st_dev, st.st_ino
+
+    def get(self, directory: str) -> Repo:
+        """Method to get a Repo handle for a directory, opening one if needed
+
+        Args:
+            directory(str): Absolute path to the working directory of the repository
+
+        Returns:
+            Repo
+
+        Raises:
+            InvalidGitRepositoryError: if the directory isn't a git repository
+        """
+        key = (os.path.realpath(directory), threading.get_ident())
+        with self._lock:
+            if self._pid != os.getpid():
+                # Handles (and their processes) inherited from a parent process can't be used, or closed, here.
+                # The parent's sweep timer thread doesn't survive the fork either.
+                self._repos.clear()
+                self._sweeper = None
+                self._pid = os.getpid()
+
+            self._evict_idle()
+
+            entry = self._repos.pop(key, None)
+            if entry is not None:
+                pooled, pooled_identity, _ = entry
+                try:
+                    if self._identity(pooled) == pooled_identity:
+                        self._repos[key] = (pooled, pooled_identity, time.monotonic())
+                        return pooled
+                except OSError:
+                    pass
+                pooled.close()
+
+        # Open outside the lock, since it touches the filesystem
+        repo = Repo(directory)
+        identity = self._identity(repo)
+
+        with self._lock:
+            self._repos[key] = (repo, identity, time.monotonic())
+            while len(self._repos) > self.max_size:
+                evicted = self._repos.popitem(last=False)[1][0]
+                evicted.close()
+            self._schedule_sweep()
+        return repo
+
+    def _evict_idle(self) -> None:
+        """Method to close handles that haven't been used for `idle_timeout` seconds. The lock must be held.
+
+        Returns:
+            None
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._repos:
+            key, entry = next(iter(self._repos.items()))
+            if entry[2] > cutoff:
+                break
+            del self._repos[key]
+            entry[0].close()
+
+    def _schedule_sweep(self) -> None:
+        """Method to start the idle sweep timer if handles are pooled and it isn't already running. The lock must be
+        held.
+
+        Returns:
+            None
+        """
+        if self._sweeper is None and self._repos:
+            self._sweeper = threading.Timer(max(self.idle_timeout, 1.0), self._sweep)
+            self._sweeper.daemon = True
+            self._sweeper.start()
+
+    def _sweep(self) -> None:
+        """Timer callback that closes idle handles, rescheduling itself while any remain
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._sweeper = None
+            if self._pid != os.getpid():
+                return
+            self._evict_idle()
+            self._schedule_sweep()
+
+    def discard(self, directory: str) -> None:
+        """Method to close and remove all handles for a directory, e.g. before it is deleted or moved
+
+        Args:
+            directory(str): Absolute path to the working directory of the repository
+
+        Returns:
+            None
+        """
+        directory = os.path.realpath(directory)
+        with self._lock:
+            for key in [k for k in self._repos if k[0] == directory]:
+                self._repos.pop(key)[0].close()
+
+    def clear(self) -> None:
+        """Method to close and remove all handles
+
+        Returns:
+            None
+        """
+        with self._lock:
+            while self._repos:
+                self._repos.popitem()[1][0].close()
+            if self._sweeper is not None:
+                self._sweeper.cancel()
+                self._sweeper = None
+
+
+_REPO_POOL: Optional[RepoPool] = None
+
+
+def get_repo_pool(max_size: int = 32, idle_timeout: float = 300.0) -> RepoPool:
+    """Function to get the process-wide repo pool, created with the provided settings on first use
+
+    Args:
+        max_size(int): Maximum number of handles to keep open
+        idle_timeout(float): Seconds after which an unused handle is closed
+
+    Returns:
+        RepoPool
+    """
+    global _REPO_POOL
+    if _REPO_POOL is None:
+        _REPO_POOL = RepoPool(max_size=max_size, idle_timeout=idle_timeout)
+    return _REPO_POOL
+
+
+def discard_pooled_repo(directory: str) -> None:
+    """Function to close any pooled handles for a repository that is about to be deleted or moved. Does nothing if
+    the pool hasn't been created in this process.
+
+    Args:
+        directory(str): Absolute path to the working directory of the repository
+
+    Returns:
+        None
+    """
+    if _REPO_POOL is not None:
+        _REPO_POOL.discard(directory)
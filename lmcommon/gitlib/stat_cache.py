@@ -0,0 +1,114 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+# Files modified less than this many seconds before they were read may change again without their mtime moving
+# (coarse filesystem timestamps), so values derived from them are not cached until they settle
+RACY_WINDOW = 1.0
+
+
+def stat_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Return the (mtime_ns, size, inode) signature of a file, or None if it does not exist. """
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class StatCache(Generic[T]):
+    """Bounded, thread-safe LRU of values derived from files, each stored with the stat signature of the file(s)
+    it was computed from and served only while that signature is unchanged.
+
+    Use `load` for a value parsed from a single file. Values derived from several files (e.g., a directory tree)
+    can be stored with `put` under any tuple signature, together with the latest mtime involved.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[tuple, T]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, signature: tuple) -> Optional[T]:
+        """Return the value cached for `key` if it was stored with `signature`, otherwise None. """
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != signature:
+                return None
+            self._entries.move_to_end(key)
+            return cached[1]
+
+    def put(self, key: str, signature: tuple, value: T, mtime_ns: int, read_at: float) -> None:
+        """Store a value, unless its source was modified within RACY_WINDOW of being read.
+
+        Args:
+            key: Cache key
+            signature: Signature of the source the value was computed from
+            value: Value to cache
+            mtime_ns: Latest modification time of the source, in nanoseconds
+            read_at: Time the source was read at, as returned by time.time()
+
+        Returns:
+            None
+        """
+        if read_at - mtime_ns / 1e9 <= RACY_WINDOW:
+            return
+        with self._lock:
+            self._entries[key] = (signature, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def load(self, path: str, parse: Callable[[str], T]) -> Optional[T]:
+        """Return the value parsed from the text file at `path`, re-reading it only when its signature changes.
+
+        Args:
+            path: Absolute path of the file
+            parse: Function computing the value from the file's contents
+
+        Returns:
+            The parsed value, or None if the file does not exist
+        """
+        signature = stat_signature(path)
+        if signature is None:
+            self.discard(path)
+            return None
+
+        value = self.get(path, signature)
+        if value is None:
+            read_at = time.time()
+            with open(path, encoding='utf-8', errors='replace') as f:
+                value = parse(f.read())
+            self.put(path, signature, value, signature[0], read_at)
+        return value
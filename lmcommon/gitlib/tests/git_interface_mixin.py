@@ -24,8 +24,9 @@ import os
 import shutil
 import uuid
 import datetime
+import mock
 from lmcommon.gitlib import GitFilesystem, GitFilesystemShimmed, GitAuthor
-from git import Repo
+from git import Repo, IndexFile
 from git.exc import GitCommandError
 
 
@@ -37,6 +38,9 @@ def get_fs_class():
         return GitFilesystem
     elif get_backend() == 'filesystem-shim':
         return GitFilesystemShimmed
+    elif get_backend() == 'filesystem-libgit2':
+        from lmcommon.gitlib.git_libgit2 import GitFilesystemLibgit2
+        return GitFilesystemLibgit2
     else:
         raise NotImplementedError('Invalid FS class')
 
@@ -247,6 +251,40 @@ class GitInterfaceMixin(object):
         # Delete temp dir
         shutil.rmtree(scratch_working_dir)
 
+    def test_clone_shallow(self, mock_initialized):
+        """Test cloning with truncated history and deepening it"""
+        git = mock_initialized[0]
+        for i in range(4):
+            write_file(git, "test1.txt", "Version {}\n".format(i), commit_msg="commit {}".format(i))
+
+        scratch_working_dir = os.path.join(tempfile.gettempdir(), uuid.uuid4().hex)
+        os.makedirs(scratch_working_dir)
+        config = {"backend": get_backend(), "working_directory": scratch_working_dir}
+
+        try:
+            clone = self.get_git_obj(config)
+            # Shallow clones of a local path need the file:// form, otherwise git ignores the depth
+            clone.clone("file://" + mock_initialized[1], depth=2)
+            assert clone.is_shallow is True
+            assert [c["message"] for c in clone.log()] == ["commit 3", "commit 2"]
+
+            # Counts in a shallow repository change as it is deepened, so they are never cached
+            with mock.patch.object(clone, '_count_ahead_behind', wraps=clone._count_ahead_behind) as count:
+                assert clone.ahead_behind("master", "origin/master") == (0, 0)
+                assert clone.ahead_behind("master", "origin/master") == (0, 0)
+                assert count.call_count == 2
+
+            clone.deepen(2)
+            assert len(clone.log()) == 4
+            assert clone.is_shallow is True
+
+            clone.deepen(10)
+            assert len(clone.log()) == 5
+            assert clone.is_shallow is False
+            assert git.is_shallow is False
+        finally:
+            shutil.rmtree(scratch_working_dir)
+
     def test_author_invalid(self, mock_initialized):
         """Test changing the git author info"""
         git = mock_initialized[0]
@@ -345,6 +383,39 @@ class GitInterfaceMixin(object):
         assert len(status["unstaged"]) == 2
         assert len(status["untracked"]) == 1
 
+    def test_is_dirty(self, mock_initialized):
+        """Test checking for changes without building the full status"""
+        git = mock_initialized[0]
+        working_directory = mock_initialized[1]
+
+        write_file(git, ".gitignore", "*.ignored\n", commit_msg="ignore file")
+        assert git.is_dirty() is False
+
+        # Ignored files and empty directories don't count
+        write_file(git, "file.ignored", "ignored", add=False)
+        os.makedirs(os.path.join(working_directory, "empty_dir"))
+        assert git.is_dirty() is False
+
+        # Untracked file in a sub-directory
+        os.makedirs(os.path.join(working_directory, "subdir"))
+        write_file(git, os.path.join("subdir", "untracked.txt"), "untracked", add=False)
+        assert git.is_dirty() is True
+
+        # Staged file
+        git.add(os.path.join(working_directory, "subdir", "untracked.txt"))
+        assert git.is_dirty() is True
+        git.commit("add file")
+        assert git.is_dirty() is False
+
+        # Unstaged change
+        write_file(git, "dummy.txt", "entry 2", add=False)
+        assert git.is_dirty() is True
+
+        # Staged change that was reverted in the working tree
+        git.add(os.path.join(working_directory, "dummy.txt"))
+        write_file(git, "dummy.txt", "entry 1", add=False)
+        assert git.is_dirty() is True
+
     def test_add(self, mock_initialized):
         """Test adding a file to a repository"""
         git = mock_initialized[0]
@@ -373,6 +444,180 @@ class GitInterfaceMixin(object):
         assert len(status["untracked"]) == 0
         assert status["staged"][0] == ("add.txt", 'added')
 
+    def test_add_remove_batch(self, mock_initialized):
+        """Test adding and removing a list of files at once"""
+        git = mock_initialized[0]
+        working_directory = mock_initialized[1]
+
+        os.makedirs(os.path.join(working_directory, "subdir"))
+        write_file(git, "file1.txt", "entry 1", add=False)
+        write_file(git, "file2.txt", "entry 2", add=False)
+        write_file(git, os.path.join("subdir", "file3.txt"), "entry 3", add=False)
+        paths = [os.path.join(working_directory, "file1.txt"), os.path.join(working_directory, "file2.txt"),
+                 os.path.join(working_directory, "subdir", "file3.txt")]
+
+        git.add(paths)
+        status = git.status()
+        assert status["staged"] == [("file1.txt", 'added'), ("file2.txt", 'added'),
+                                    ("subdir/file3.txt", 'added')]
+        assert status["untracked"] == []
+
+        git.commit("Add files")
+        git.remove([paths[0], os.path.join(working_directory, "subdir")], keep_file=False)
+        status = git.status()
+        assert status["staged"] == [("file1.txt", 'deleted'), ("subdir/file3.txt", 'deleted')]
+        assert status["untracked"] == []
+        assert not os.path.exists(paths[0])
+        assert not os.path.exists(os.path.join(working_directory, "subdir"))
+
+        # Empty batches are a no-op
+        git.add([])
+        git.remove([])
+
+    def test_transaction(self, mock_initialized):
+        """Test grouping several index updates into a single commit"""
+        git = mock_initialized[0]
+        working_directory = mock_initialized[1]
+
+        write_file(git, "move.txt", "moved", commit_msg="first commit")
+        write_file(git, "delete.txt", "deleted", commit_msg="second commit")
+        start_hash = git.commit_hash
+
+        with git.transaction("Transaction commit") as tx:
+            tx.remove(os.path.join(working_directory, "move.txt"))
+            shutil.move(os.path.join(working_directory, "move.txt"), os.path.join(working_directory, "moved.txt"))
+            tx.add(os.path.join(working_directory, "moved.txt"))
+            tx.remove(os.path.join(working_directory, "delete.txt"), keep_file=False)
+            write_file(git, "added.txt", "added", add=False)
+            tx.add(os.path.join(working_directory, "added.txt"))
+
+            # Nothing is staged until the block exits
+            assert git.status()["staged"] == []
+
+        assert git.repo.head.commit.parents[0].hexsha == start_hash
+        assert tx.commit.hexsha == git.commit_hash
+        assert git.log_entry(git.commit_hash)["message"] == "Transaction commit"
+        assert git.is_dirty() is False
+        assert not os.path.exists(os.path.join(working_directory, "delete.txt"))
+        tracked = git.repo.git.ls_files().split()
+        assert "added.txt" in tracked and "moved.txt" in tracked
+        assert "move.txt" not in tracked and "delete.txt" not in tracked
+
+        # Relative paths are resolved against the working directory, not the process's
+        write_file(git, "relative.txt", "relative", commit_msg="relative commit")
+        with git.transaction("Relative delete") as tx:
+            tx.remove("relative.txt", keep_file=False)
+        assert not os.path.exists(os.path.join(working_directory, "relative.txt"))
+        assert "relative.txt" not in git.repo.git.ls_files().split()
+
+        # An exception in the block applies nothing
+        commit_hash = git.commit_hash
+        write_file(git, "rollback.txt", "rollback", add=False)
+        with pytest.raises(ValueError):
+            with git.transaction("Failed commit") as tx:
+                tx.add(os.path.join(working_directory, "rollback.txt"))
+                tx.remove(os.path.join(working_directory, "added.txt"), keep_file=False)
+                raise ValueError("Failed")
+        assert git.commit_hash == commit_hash
+        assert tx.commit is None
+        assert git.status()["staged"] == []
+        assert os.path.exists(os.path.join(working_directory, "added.txt"))
+
+        # A failure applying the updates resets the index
+        with pytest.raises(Exception):
+            with git.transaction("Failed commit") as tx:
+                tx.remove(os.path.join(working_directory, "added.txt"))
+                tx.add(os.path.join(working_directory, "does-not-exist.txt"))
+        assert git.commit_hash == commit_hash
+        assert git.status()["staged"] == []
+        assert os.path.exists(os.path.join(working_directory, "added.txt"))
+
+    def test_transaction_call_order(self, mock_initialized):
+        """Test that transaction updates are applied in call order, with a single write of the index"""
+        git = mock_initialized[0]
+        working_directory = mock_initialized[1]
+
+        write_file(git, "tracked.txt", "tracked", commit_msg="first commit")
+        os.makedirs(os.path.join(working_directory, "dir"))
+        write_file(git, os.path.join("dir", "x.txt"), "x", add=False)
+        write_file(git, os.path.join("dir", "y.txt"), "y", add=False)
+        write_file(git, "new.txt", "new", add=False)
+
+        with mock.patch.object(IndexFile, 'write', autospec=True, side_effect=IndexFile.write) as index_write, \
+                mock.patch.object(type(git), 'add', side_effect=AssertionError("index written per call")), \
+                mock.patch.object(type(git), 'remove', side_effect=AssertionError("index written per call")):
+            with git.transaction("Ordered commit") as tx:
+                tx.add(os.path.join(working_directory, "new.txt"))
+                tx.remove(os.path.join(working_directory, "new.txt"))
+                tx.add_all("dir")
+                tx.remove(os.path.join(working_directory, "dir", "x.txt"))
+                tx.remove("tracked.txt")
+                tx.add("tracked.txt")
+            assert index_write.call_count == 1
+
+        committed = git.repo.git.ls_tree('-r', '--name-only', 'HEAD').split()
+        assert "dir/y.txt" in committed and "tracked.txt" in committed
+        assert "new.txt" not in committed and "dir/x.txt" not in committed
+        assert os.path.exists(os.path.join(working_directory, "new.txt"))
+        assert os.path.exists(os.path.join(working_directory, "dir", "x.txt"))
+        assert sorted(git.status()["untracked"]) == ["dir/x.txt", "new.txt"]
+
+    def test_transaction_runs_filters(self, mock_initialized):
+        """Test that files added in a transaction are hashed through their configured filters"""
+        git = mock_initialized[0]
+        working_directory = mock_initialized[1]
+
+        with open(os.path.join(working_directory, ".gitattributes"), 'wt') as af:
+            af.write("*.upper filter=upper\n")
+        git.repo.git.config("filter.upper.clean", "tr a-z A-Z")
+        write_file(git, "data.upper", "lower case", add=False)
+
+        with git.transaction("Add filtered file") as tx:
+            tx.add([os.path.join(working_directory, ".gitattributes"), os.path.join(working_directory, "data.upper")])
+        assert git.repo.commit("HEAD").tree["data.upper"].data_stream.read() == b"LOWER CASE"
+        assert git.is_dirty() is False
+
+    def test_ahead_behind(self, mock_initialized):
+        """Test counting commits ahead of and behind another branch"""
+        git = mock_initialized[0]
+
+        write_file(git, "test1.txt", "File number 1\n", commit_msg="commit 1")
+        git.create_branch("other")
+        git.checkout("master")
+        assert git.ahead_behind("master", "other") == (0, 0)
+
+        write_file(git, "test2.txt", "File number 2\n", commit_msg="commit 2")
+        write_file(git, "test3.txt", "File number 3\n", commit_msg="commit 3")
+        assert git.ahead_behind("master", "other") == (2, 0)
+        assert git.ahead_behind("other", "master") == (0, 2)
+
+        git.checkout("other")
+        write_file(git, "test4.txt", "File number 4\n", commit_msg="commit 4")
+        assert git.ahead_behind("master", "other") == (2, 1)
+        assert git.ahead_behind("master", git.commit_hash) == (2, 1)
+
+        with pytest.raises(ValueError):
+            git.ahead_behind("master", "does-not-exist")
+
+    def test_write_commit_graph(self, mock_initialized):
+        """Test writing the commit-graph incrementally"""
+        git = mock_initialized[0]
+        working_directory = mock_initialized[1]
+        graph_dir = os.path.join(working_directory, ".git", "objects", "info", "commit-graphs")
+
+        write_file(git, "test1.txt", "File number 1\n", commit_msg="commit 1")
+        git.write_commit_graph()
+        with open(os.path.join(graph_dir, "commit-graph-chain"), 'rt') as cg:
+            assert len(cg.read().split()) == 1
+
+        write_file(git, "test2.txt", "File number 2\n", commit_msg="commit 2")
+        git.write_commit_graph()
+        with open(os.path.join(graph_dir, "commit-graph-chain"), 'rt') as cg:
+            layers = cg.read().split()
+        assert 1 <= len(layers) <= 2
+        assert git.repo.git.commit_graph('verify') == ''
+        assert [c["message"] for c in git.log()][:2] == ["commit 2", "commit 1"]
+
     def test_add_all_working_dir(self, mock_initialized):
         """Test adding all files and changes in the working directory"""
         git = mock_initialized[0]
@@ -517,6 +762,54 @@ class GitInterfaceMixin(object):
         assert len(status["untracked"]) == 0
         assert status["staged"][0] == ("staged.txt", "deleted")
 
+    def test_iter_diff(self, mock_initialized):
+        """Test lazily iterating over a diff with size limits and binary files"""
+        git = mock_initialized[0]
+        working_directory = mock_initialized[1]
+
+        write_file(git, "a.txt", "".join("Line {}\n".format(i) for i in range(100)))
+        write_file(git, "b.txt", "File b\n")
+        with open(os.path.join(working_directory, "c.bin"), 'wb') as bf:
+            bf.write(b"\x00\x01\x02")
+        git.add(os.path.join(working_directory, "c.bin"))
+        git.commit("commit 1")
+
+        write_file(git, "a.txt", "".join("Changed line {}\n".format(i) for i in range(100)), add=False)
+        write_file(git, "b.txt", "File b changed\n", add=False)
+        with open(os.path.join(working_directory, "c.bin"), 'wb') as bf:
+            bf.write(b"\x00\x03")
+
+        diff = list(git.iter_diff())
+        assert [d["path"] for d in diff] == ["a.txt", "b.txt", "c.bin"]
+        assert (diff[0]["added"], diff[0]["deleted"], diff[0]["binary"]) == (100, 100, False)
+        assert diff[1]["hunks"] == git.diff_unstaged()["b.txt"]
+        assert len(diff[1]["hunks"]) == 1
+        assert diff[2]["binary"] is True
+        assert diff[2]["hunks"] is None
+        assert not any(d["truncated"] for d in diff)
+
+        diff = list(git.iter_diff(numstat_only=True))
+        assert [(d["path"], d["added"], d["hunks"]) for d in diff] == \
+            [("a.txt", 100, None), ("b.txt", 1, None), ("c.bin", None, None)]
+
+        diff = list(git.iter_diff(max_file_bytes=500))
+        assert diff[0]["truncated"] is True
+        assert diff[1]["truncated"] is False
+        assert len(diff[1]["hunks"]) == 1
+
+        diff = list(git.iter_diff(max_total_bytes=500))
+        assert [d["truncated"] for d in diff] == [True, True, False]
+        assert diff[1]["hunks"] is None
+
+        # Stopping early doesn't read the rest of the diff
+        diff_iter = git.iter_diff()
+        assert next(diff_iter)["path"] == "a.txt"
+        diff_iter.close()
+
+        git.add_all()
+        git.commit("commit 2")
+        assert [d["path"] for d in git.iter_diff(commit_a="HEAD~1", filename="b.txt")] == ["b.txt"]
+
     def test_diff_unstaged(self, mock_initialized):
         """Test getting the diff for unstaged changes"""
         git = mock_initialized[0]
@@ -823,6 +1116,36 @@ class GitInterfaceMixin(object):
         log_info[0]["message"] = "commit 4"
         log_info[1]["message"] = "commit 2"
 
+    def test_iter_log(self, mock_initialized):
+        """Test lazily iterating over commit history with field projection"""
+        git = mock_initialized[0]
+
+        write_file(git, "test1.txt", "File number 1\n", commit_msg="commit 1\n\nWith a body\n")
+        write_file(git, "test2.txt", "File number 2\n")
+        git.commit("commit 2", author=GitAuthor("U1", "test@gigantum.io"),
+                   committer=GitAuthor("U2", "test2@gigantum.io"))
+
+        log_iter = git.iter_log()
+        assert not isinstance(log_iter, list)
+        assert list(log_iter) == git.log()
+
+        entries = list(git.iter_log(fields=["message"]))
+        assert len(entries) == 3
+        assert entries[0] == {"commit": git.repo.head.commit.hexsha, "message": git.repo.head.commit.message}
+        assert entries[1]["message"] == git.repo.head.commit.parents[0].message
+
+        entries = list(git.iter_log(max_count=1, fields=["author", "committed_on"]))
+        assert len(entries) == 1
+        assert set(entries[0].keys()) == {"commit", "author", "committed_on"}
+        assert entries[0]["author"] == {"name": "U1", "email": "test@gigantum.io"}
+        assert entries[0]["committed_on"] == git.repo.head.commit.committed_datetime
+
+        assert list(git.iter_log(filename="test1.txt", fields=[])) == \
+            [{"commit": git.repo.head.commit.parents[0].hexsha}]
+
+        with pytest.raises(ValueError):
+            list(git.iter_log(fields=["sha"]))
+
     def test_log_page(self, mock_initialized):
         """Test getting commit history"""
         git = mock_initialized[0]
@@ -1084,6 +1407,35 @@ class GitInterfaceMixin(object):
         assert "origin/test_local_branch" not in branches["remote"]
         assert "origin/test_remote_branch" in branches["remote"]
 
+    def test_list_branches_cached(self, mock_initialized_remote):
+        """Method to test branch listings are reused until refs change"""
+        git = mock_initialized_remote[0]
+        git.create_branch("test_branch_1")
+
+        # Treat refs as settled immediately, instead of after the racy timestamp window
+        with mock.patch('lmcommon.gitlib.stat_cache.RACY_WINDOW', -1.0):
+            branches = git.list_branches()
+            with mock.patch.object(type(git), '_list_branches', side_effect=AssertionError("not cached")):
+                assert git.list_branches() == branches
+
+            # Mutating a returned listing doesn't affect the cache
+            branches["local"].append("bogus")
+            assert "bogus" not in git.list_branches()["local"]
+
+            git.create_branch("test_branch_2")
+            assert "test_branch_2" in git.list_branches()["local"]
+
+            git.publish_branch("test_branch_2")
+            assert "origin/test_branch_2" in git.list_branches()["remote"]
+
+            git.checkout("master")
+            git.delete_branch("test_branch_1")
+            assert "test_branch_1" not in git.list_branches()["local"]
+
+            # Packing refs moves them out of the refs directories without changing the listing
+            git.repo.git.pack_refs('--all')
+            assert sorted(git.list_branches()["local"]) == ["master", "test_branch_2"]
+
     def test_delete_branch(self, mock_initialized_remote):
         """Method to test deleting branches"""
         git = mock_initialized_remote[0]
@@ -1366,6 +1718,98 @@ class GitInterfaceMixin(object):
         assert os.path.isfile(os.path.join(cloned_working_dir, 'test2.txt')) is False
         assert os.path.isfile(os.path.join(cloned_working_dir, 'test3.txt')) is True
 
+    def test_merge_into(self, mock_initialized):
+        """Test merging into a branch that is not checked out"""
+        git = mock_initialized[0]
+        working_directory = mock_initialized[1]
+
+        write_file(git, "test1.txt", "Line 1\nLine 2\nLine 3\n", commit_msg="commit 1")
+        git.create_branch("target")
+        write_file(git, "test1.txt", "Line 1\nLine 2\nLine 3 changed\n", commit_msg="target commit")
+        target_hash = git.commit_hash
+
+        git.checkout("master")
+        write_file(git, "test1.txt", "Line 1 changed\nLine 2\nLine 3\n", commit_msg="master commit")
+        write_file(git, "test2.txt", "File 2\n", commit_msg="master commit 2")
+        master_hash = git.commit_hash
+
+        assert git.preview_merge("target", "master") == []
+        with pytest.raises(ValueError):
+            git.merge_into("master", "target")
+
+        merged_hash = git.merge_into("target", "master", message="Merged master")
+        # Only the target ref moved
+        assert git.commit_hash == master_hash
+        assert git.get_current_branch_name() == "master"
+        assert git.is_dirty() is False
+        merged = git.repo.commit(merged_hash)
+        assert merged.message == "Merged master"
+        assert [p.hexsha for p in merged.parents] == [target_hash, master_hash]
+        assert git.repo.heads["target"].commit.hexsha == merged_hash
+        blob = merged.tree / "test1.txt"
+        assert blob.data_stream.read() == b"Line 1 changed\nLine 2\nLine 3 changed\n"
+        assert "test2.txt" in [b.path for b in merged.tree.blobs]
+
+        # Merging again is a no-op, and merging back fast-forwards
+        assert git.merge_into("target", "master") == merged_hash
+        git.create_branch("other")
+        git.checkout("master")
+        assert git.merge_into("other", "target") == merged_hash
+
+        # Conflicts are reported and leave the branch alone
+        git.checkout("other")
+        write_file(git, "test2.txt", "File 2 on other\n", commit_msg="other commit")
+        other_hash = git.commit_hash
+        git.checkout("master")
+        write_file(git, "test2.txt", "File 2 on master\n", commit_msg="conflicting commit")
+        assert git.preview_merge("other", "master") == ["test2.txt"]
+        with pytest.raises(ValueError):
+            git.merge_into("other", "master")
+        assert git.repo.heads["other"].commit.hexsha == other_hash
+        with open(os.path.join(working_directory, "test2.txt"), 'rt') as tf:
+            assert tf.read() == "File 2 on master\n"
+
+    def test_merge_into_without_merge_tree(self, mock_initialized):
+        """Test in-memory merges with git versions that have no `merge-tree --write-tree`"""
+        git = mock_initialized[0]
+
+        write_file(git, "test1.txt", "Line 1\nLine 2\nLine 3\n", commit_msg="commit 1")
+        write_file(git, "test2.txt", "File 2\n", commit_msg="commit 2")
+        write_file(git, "data.bin", "\0binary", commit_msg="commit 3")
+        git.create_branch("target")
+        write_file(git, "test1.txt", "Line 1\nLine 2\nLine 3 changed\n", commit_msg="target commit")
+        git.checkout("master")
+        write_file(git, "test1.txt", "Line 1 changed\nLine 2\nLine 3\n", commit_msg="master commit")
+        write_file(git, "test3.txt", "Added on master\n", commit_msg="master commit 2")
+        master_hash = git.commit_hash
+
+        old_git = mock.patch('git.cmd.Git.merge_tree', create=True, return_value=(129, '', 'unknown option'))
+        with old_git:
+            # Edits to different lines of the same file merge cleanly
+            assert git.preview_merge("target", "master") == []
+            merged_hash = git.merge_into("target", "master")
+        merged = git.repo.commit(merged_hash)
+        assert (merged.tree / "test1.txt").data_stream.read() == b"Line 1 changed\nLine 2\nLine 3 changed\n"
+        assert (merged.tree / "test3.txt").data_stream.read() == b"Added on master\n"
+        assert [p.hexsha for p in merged.parents][1] == master_hash
+
+        # Overlapping edits, binary edits and modify/delete all conflict
+        git.checkout("target")
+        write_file(git, "test1.txt", "Line 1 on target\nLine 2\nLine 3 changed\n", commit_msg="target commit 2")
+        write_file(git, "data.bin", "\0binary on target", commit_msg="target commit 3")
+        write_file(git, "test2.txt", "File 2 on target\n", commit_msg="target commit 4")
+        target_hash = git.commit_hash
+        git.checkout("master")
+        write_file(git, "test1.txt", "Line 1 on master\nLine 2\nLine 3\n", commit_msg="master commit 3")
+        write_file(git, "data.bin", "\0binary on master", commit_msg="master commit 4")
+        git.remove(os.path.join(mock_initialized[1], "test2.txt"), keep_file=False)
+        git.commit("master commit 5")
+        with old_git:
+            assert git.preview_merge("target", "master") == ["data.bin", "test1.txt", "test2.txt"]
+            with pytest.raises(ValueError):
+                git.merge_into("target", "master")
+        assert git.repo.heads["target"].commit.hexsha == target_hash
+
     def test_discard_changes(self, mock_initialized):
         """Test discarding all changes in a repo"""
         git = mock_initialized[0]
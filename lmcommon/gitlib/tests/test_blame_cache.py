@@ -0,0 +1,95 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import pytest
+
+import os
+os.environ['GITLIB_FS_BACKEND'] = 'filesystem'
+
+from lmcommon.gitlib import GitFilesystem, GitAuthor
+from .git_interface_mixin import mock_initialized_filesystem as mock_initialized
+from .git_interface_mixin import write_file
+
+
+def gitpython_blame(git, filename):
+    """Blame a file with GitPython, in the format returned by GitFilesystem.blame"""
+    return [{"commit": b[0].hexsha,
+             "author": {"name": b[0].author.name, "email": b[0].author.email},
+             "committed_on": b[0].committed_datetime,
+             "message": b[0].message,
+             "content": "\n".join(b[1])} for b in git.repo.blame('HEAD', filename)]
+
+
+@pytest.fixture()
+def mock_cached(mock_initialized):
+    """A GitFilesystem instance with the blame cache enabled, with a file edited over a few commits"""
+    git, working_directory = mock_initialized
+    git = GitFilesystem(dict(git.config, blame_cache=True, commit_cache=False))
+
+    write_file(git, "test1.txt", "Line 1\nLine 2\nLine 3\n", commit_msg="commit 1")
+    write_file(git, "test1.txt", "Line 1\nLine 2\nLine 3\nLine 4 by U1\n", add=False)
+    git.add(os.path.join(working_directory, "test1.txt"))
+    git.commit("commit 2", author=GitAuthor("U1", "test@gigantum.io"))
+
+    yield git, working_directory
+
+
+class TestBlameCache(object):
+    def test_blame_matches_gitpython(self, mock_cached):
+        """Test that cached and incremental blame results match GitPython"""
+        git, working_directory = mock_cached
+
+        assert git.blame("test1.txt") == gitpython_blame(git, "test1.txt")
+        assert git.blame_cache.get_latest("test1.txt")["rev"] == git.commit_hash
+        assert git.blame("test1.txt") == gitpython_blame(git, "test1.txt")
+
+        write_file(git, "test1.txt", "Line 1\nEdited line 2   \nLine 3\nLine 4 by U1\nLine 5\n",
+                   commit_msg="commit 3")
+        write_file(git, "other.txt", "Other file\n", commit_msg="commit 4")
+        assert git.blame("test1.txt") == gitpython_blame(git, "test1.txt")
+        assert git.blame(os.path.join(working_directory, "test1.txt")) == gitpython_blame(git, "test1.txt")
+        assert [b["content"] for b in git.blame("test1.txt")] == ["Line 1", "Edited line 2", "Line 3",
+                                                                 "Line 4 by U1", "Line 5"]
+
+    def test_incremental(self, mock_cached):
+        """Test that lines unchanged since a cached blame reuse its results"""
+        git, working_directory = mock_cached
+        first_commit = git.repo.head.commit.parents[0].hexsha
+        git.blame("test1.txt")
+
+        # Make the cached attribution of line 3 recognizable
+        cached = git.blame_cache.get_latest("test1.txt")
+        lines = list(cached["lines"])
+        lines[2] = (git.commit_hash, 3)
+        blob = git.repo.head.commit.tree["test1.txt"].hexsha
+        git.blame_cache.put("test1.txt", blob, cached["rev"], lines, cached["content"])
+
+        write_file(git, "test1.txt", "Line 1\nLine 2 edited\nLine 3\nLine 4 by U1\n", commit_msg="commit 3")
+        blame = git.blame("test1.txt")
+        assert [b["commit"] for b in blame] == [first_commit, git.commit_hash, git.repo.head.commit.parents[0].hexsha]
+        assert blame[2]["content"] == "Line 3\nLine 4 by U1"
+
+    def test_not_ancestor(self, mock_cached):
+        """Test that the full blame is computed if the cached revision isn't in the current history"""
+        git, working_directory = mock_cached
+        git.blame("test1.txt")
+
+        git.repo.git.reset("--hard", "HEAD~1")
+        write_file(git, "test1.txt", "Line 1\nLine 2\nLine 3\nLine 4\n", commit_msg="commit 2b")
+        assert git.blame("test1.txt") == gitpython_blame(git, "test1.txt")
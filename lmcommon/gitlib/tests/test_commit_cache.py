@@ -0,0 +1,107 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import pytest
+
+import os
+os.environ['GITLIB_FS_BACKEND'] = 'filesystem'
+
+from lmcommon.gitlib import GitFilesystem
+from lmcommon.gitlib.commit_cache import CommitCache
+from .git_interface_mixin import mock_initialized_filesystem as mock_initialized
+from .git_interface_mixin import write_file
+
+
+@pytest.fixture()
+def mock_cached(mock_initialized):
+    """A GitFilesystem instance with the commit cache enabled, and one without, for the same repository"""
+    git, working_directory = mock_initialized
+    config = dict(git.config, commit_cache=True)
+
+    yield GitFilesystem(config), GitFilesystem(dict(git.config, commit_cache=False))
+
+
+class TestCommitCache(object):
+    def test_log_matches_uncached(self, mock_cached):
+        """Test that history read through the cache matches history read from git"""
+        git, uncached = mock_cached
+        write_file(git, "test1.txt", "File number 1\n", commit_msg="commit 1\n\nWith a body\n")
+        write_file(git, "test2.txt", "File number 2\n", commit_msg="commit 2")
+
+        assert git.log() == uncached.log()
+        assert os.path.exists(os.path.join(git.repo.git_dir, 'lmcommon-commit-cache.sqlite'))
+        assert git.commit_cache.get_tips() == [git.commit_hash]
+
+        # Second read is served from the cache
+        assert git.log() == uncached.log()
+        assert list(git.iter_log(skip=1, fields=["message"])) == list(uncached.iter_log(skip=1, fields=["message"]))
+        assert list(git.iter_log(filename="test1.txt", fields=["committed_on"])) == \
+            list(uncached.iter_log(filename="test1.txt", fields=["committed_on"]))
+        assert git.log_entry(git.commit_hash) == uncached.log_entry(git.commit_hash)
+
+    def test_incremental_update(self, mock_cached):
+        """Test that only new commits are loaded when updating the cache"""
+        git, uncached = mock_cached
+        write_file(git, "test1.txt", "File number 1\n", commit_msg="commit 1")
+
+        assert git.update_commit_cache() == 2
+        assert git.update_commit_cache() == 0
+
+        write_file(git, "test2.txt", "File number 2\n", commit_msg="commit 2")
+        assert git.update_commit_cache() == 1
+
+        cached = git.commit_cache.get([git.commit_hash])[git.commit_hash]
+        assert cached["message"] == "commit 2"
+        assert cached["parents"] == [git.repo.head.commit.parents[0].hexsha]
+
+    def test_log_entry_from_cache(self, mock_cached):
+        """Test that log entries are read from the cache"""
+        git, uncached = mock_cached
+        write_file(git, "test1.txt", "File number 1\n", commit_msg="commit 1")
+        git.update_commit_cache()
+
+        git.commit_cache.conn.execute("UPDATE commits SET message = 'cached' WHERE sha = ?", (git.commit_hash,))
+        assert git.log_entry(git.commit_hash)["message"] == "cached"
+        assert uncached.log_entry(git.commit_hash)["message"] == "commit 1"
+
+    def test_other_branch_and_missing_tip(self, mock_cached):
+        """Test reading history not reachable from HEAD, and recovering from a tip that no longer exists"""
+        git, uncached = mock_cached
+        git.update_commit_cache()
+
+        git.create_branch("other")
+        git.checkout("other")
+        write_file(git, "test1.txt", "File number 1\n", commit_msg="commit on other")
+        git.checkout("master")
+
+        assert git.log(path_info="other") == uncached.log(path_info="other")
+
+        git.commit_cache.add_tip("0" * 40)
+        write_file(git, "test2.txt", "File number 2\n", commit_msg="commit on master")
+        assert git.update_commit_cache() == 1
+        assert git.commit_cache.get_tips() == [git.commit_hash]
+
+    def test_disabled(self, mock_cached):
+        """Test that the cache is not used unless enabled"""
+        git, uncached = mock_cached
+        assert uncached.commit_cache is None
+        assert uncached.update_commit_cache() == 0
+        uncached.log()
+        assert not os.path.exists(os.path.join(git.repo.git_dir, 'lmcommon-commit-cache.sqlite'))
+        assert isinstance(git.commit_cache, CommitCache)
@@ -19,11 +19,14 @@
 # SOFTWARE.
 import pytest
 
+import mock
 import os
+import subprocess
 os.environ['GITLIB_FS_BACKEND'] = 'filesystem-shim'
 
-from lmcommon.gitlib import GitFilesystemShimmed
-from .git_interface_mixin import GitInterfaceMixin
+from lmcommon.gitlib import GitFilesystem, GitFilesystemShimmed
+from lmcommon.gitlib.git_fs_shim import _chunk_paths
+from .git_interface_mixin import GitInterfaceMixin, write_file
 from .git_interface_mixin import mock_config_filesystem as mock_config
 from .git_interface_mixin import mock_initialized_filesystem as mock_initialized
 from .git_interface_mixin import mock_initialized_filesystem_with_remote as mock_initialized_remote
@@ -39,3 +42,64 @@ class TestGitFilesystem(GitInterfaceMixin):
         print('----------------------')
         import pprint; pprint.pprint(config)
         return GitFilesystemShimmed(config)
+
+    def test_status_matches_gitpython(self, mock_initialized):
+        """Test that the porcelain v2 status matches the GitPython implementation"""
+        git, working_directory = mock_initialized
+
+        write_file(git, "modified.txt", "entry 1", commit_msg="first commit")
+        write_file(git, "renamed.txt", "renamed entry", commit_msg="second commit")
+        write_file(git, "deleted.txt", "deleted entry", commit_msg="third commit")
+
+        write_file(git, "modified.txt", "entry 1 edited", add=False)
+        write_file(git, "new file.txt", "staged entry")
+        git.repo.git.mv("renamed.txt", "renamed2.txt")
+        os.remove(os.path.join(working_directory, "deleted.txt"))
+        os.makedirs(os.path.join(working_directory, "subdir", "nested"))
+        write_file(git, os.path.join("subdir", "nested", "untracked.txt"), "untracked entry", add=False)
+
+        status = git.status()
+        assert status == GitFilesystem(git.config).status()
+        assert status["staged"] == [("new file.txt", "added"), ("renamed.txt", "renamed")]
+        assert status["unstaged"] == [("deleted.txt", "deleted"), ("modified.txt", "modified")]
+        assert status["untracked"] == ["subdir/nested/untracked.txt"]
+
+    def test_parse_porcelain_v2_status(self):
+        """Test parsing porcelain v2 status entries"""
+        output = "\0".join(["1 AM N... 000000 100644 100644 0000000 3e75765 both changed.txt",
+                            "2 R. N... 100644 100644 100644 4286f42 4286f42 R100 new name.txt",
+                            "old name.txt",
+                            "1 .T N... 100644 100644 120000 7189822 7189822 link",
+                            "u UU N... 100644 100644 100644 100644 a1 b2 c3 conflict.txt",
+                            "? untracked dir/file.txt",
+                            ""])
+
+        status = GitFilesystemShimmed._parse_porcelain_v2_status(output)
+
+        assert status["staged"] == [("both changed.txt", "added"), ("old name.txt", "renamed"),
+                                    ("conflict.txt", "unmerged")]
+        assert status["unstaged"] == [("both changed.txt", "modified"), ("link", "modified")]
+        assert status["untracked"] == ["untracked dir/file.txt"]
+
+    def test_add_batch_in_argv_chunks(self, mock_initialized):
+        """Test that large batches are split across several `git add` command lines"""
+        git, working_directory = mock_initialized
+        git = GitFilesystemShimmed(git.config)
+
+        # A leading dash must not be read as an option
+        paths = ["-n.txt"] + [f"batch file {i}.txt" for i in range(40)]
+        for p in paths:
+            write_file(git, p, f"entry {p}", add=False)
+
+        chunks = _chunk_paths(paths, max_bytes=200)
+        assert len(chunks) > 1
+        assert [p for chunk in chunks for p in chunk] == paths
+        assert all(sum(len(p) + 9 for p in chunk) <= 200 for chunk in chunks)
+
+        with mock.patch('lmcommon.gitlib.git_fs_shim.MAX_ARGV_BYTES', 200):
+            with mock.patch('subprocess.run', wraps=subprocess.run) as run:
+                git.add(paths)
+                assert run.call_count > 1
+                assert all(c[0][0][:3] == ['git', 'add', '--'] for c in run.call_args_list)
+
+        assert sorted(git.status()["staged"]) == sorted((p, "added") for p in paths)
@@ -0,0 +1,121 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import mock
+import pytest
+
+import os
+os.environ['GITLIB_FS_BACKEND'] = 'filesystem-libgit2'
+
+from lmcommon.gitlib import GitFilesystem, GitFilesystemShimmed
+from lmcommon.gitlib.git import get_git_interface
+from lmcommon.gitlib.git_libgit2 import GitFilesystemLibgit2
+from .git_interface_mixin import GitInterfaceMixin, write_file
+from .git_interface_mixin import mock_config_filesystem as mock_config
+from .git_interface_mixin import mock_initialized_filesystem as mock_initialized
+from .git_interface_mixin import mock_initialized_filesystem_with_remote as mock_initialized_remote
+
+
+@pytest.mark.usefixtures("mock_config")
+class TestGitFilesystemLibgit2(GitInterfaceMixin):
+    """Class to test the libgit2 GitFilesystem interface"""
+    class_type = GitFilesystemLibgit2
+
+    def get_git_obj(self, config):
+        return GitFilesystemLibgit2(config)
+
+    def test_get_git_interface(self, mock_config):
+        """Test that the libgit2 backend is selectable from the config"""
+        git = get_git_interface(dict(mock_config, backend='filesystem-libgit2'))
+        assert type(git) is GitFilesystemLibgit2
+
+    def test_matches_gitpython(self, mock_initialized):
+        """Test that status and history match the GitPython implementation"""
+        working_directory = mock_initialized[1]
+        git = self.get_git_obj(mock_initialized[0].config)
+
+        write_file(git, "modified.txt", "entry 1", commit_msg="first commit")
+        write_file(git, "deleted.txt", "deleted entry", commit_msg="second commit")
+
+        write_file(git, "modified.txt", "entry 1 edited", add=False)
+        write_file(git, "new file.txt", "staged entry")
+        os.remove(os.path.join(working_directory, "deleted.txt"))
+        os.makedirs(os.path.join(working_directory, "subdir"))
+        write_file(git, os.path.join("subdir", "untracked.txt"), "untracked entry", add=False)
+
+        gitpython = GitFilesystem(git.config)
+        assert git.status() == gitpython.status()
+        assert git.is_dirty() is True
+        assert git.log() == gitpython.log()
+        assert git.log(max_count=1, skip=1) == gitpython.log(max_count=1, skip=1)
+        assert git.log_entry(git.commit_hash) == gitpython.log_entry(git.commit_hash)
+        assert git.list_branches() == gitpython.list_branches()
+        assert git.get_current_branch_name() == gitpython.get_current_branch_name()
+
+    def test_add_filtered_path(self, mock_initialized):
+        """Test that paths handled by a filter are added with git, so the filter runs"""
+        working_directory = mock_initialized[1]
+        git = self.get_git_obj(mock_initialized[0].config)
+
+        with open(os.path.join(working_directory, ".gitattributes"), 'wt') as af:
+            af.write("*.upper filter=upper\n")
+        git.repo.git.config("filter.upper.clean", "tr a-z A-Z")
+
+        write_file(git, "data.upper", "lower case", commit_msg="Add filtered file")
+        blob = git.repo.commit("HEAD").tree["data.upper"]
+        assert blob.data_stream.read() == b"LOWER CASE"
+
+    def test_add_all_with_filters(self, mock_initialized):
+        """Test that add_all only hands the changed paths handled by a filter to git"""
+        working_directory = mock_initialized[1]
+        git = self.get_git_obj(mock_initialized[0].config)
+
+        with open(os.path.join(working_directory, ".gitattributes"), 'wt') as af:
+            af.write("*.upper filter=upper\n")
+        git.repo.git.config("filter.upper.clean", "tr a-z A-Z")
+        write_file(git, "deleted.txt", "deleted", commit_msg="Add file to delete")
+
+        os.makedirs(os.path.join(working_directory, "subdir"))
+        write_file(git, os.path.join("subdir", "data.upper"), "lower case", add=False)
+        write_file(git, os.path.join("subdir", "plain.txt"), "lower case", add=False)
+        os.remove(os.path.join(working_directory, "deleted.txt"))
+
+        shim_add = GitFilesystemShimmed.add
+        with mock.patch.object(GitFilesystemShimmed, 'add', side_effect=shim_add, autospec=True) as add:
+            git.add_all()
+            assert add.call_count == 1
+            assert add.call_args[0][1] == [os.path.join(working_directory, "subdir", "data.upper")]
+
+        git.commit("Add all")
+        tree = git.repo.commit("HEAD").tree
+        assert tree["subdir/data.upper"].data_stream.read() == b"LOWER CASE"
+        assert tree["subdir/plain.txt"].data_stream.read() == b"lower case"
+        assert ".gitattributes" in tree
+        assert "deleted.txt" not in tree
+        assert git.is_dirty() is False
+
+    def test_reopen_after_fetch(self, mock_initialized):
+        """Test that the libgit2 repository is reopened after git changes its objects or shallow boundary"""
+        git = self.get_git_obj(mock_initialized[0].config)
+
+        for method, args in [('fetch', ()), ('deepen', (1,)), ('pull', ())]:
+            lg_repo = git.lg_repo
+            with mock.patch.object(GitFilesystemShimmed, method):
+                getattr(git, method)(*args)
+            assert git.lg_repo is not lg_repo
@@ -0,0 +1,128 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import pytest
+
+import os
+import shutil
+import threading
+os.environ['GITLIB_FS_BACKEND'] = 'filesystem'
+
+from git import Repo
+
+from lmcommon.gitlib import GitFilesystem
+from lmcommon.gitlib.repo_pool import RepoPool
+from .git_interface_mixin import mock_initialized_filesystem as mock_initialized
+from .git_interface_mixin import write_file
+
+
+class TestRepoPool(object):
+    def test_reuse(self, mock_initialized):
+        """Test that handles are shared within a thread, but not across threads"""
+        git, working_directory = mock_initialized
+        pool = RepoPool()
+
+        repo = pool.get(working_directory)
+        assert pool.get(working_directory) is repo
+        assert pool.get(working_directory + os.path.sep) is repo
+
+        other_thread = []
+        t = threading.Thread(target=lambda: other_thread.append(pool.get(working_directory)))
+        t.start()
+        t.join()
+        assert other_thread[0] is not repo
+        assert len(pool) == 2
+
+    def test_eviction(self, mock_initialized):
+        """Test that handles are closed when the pool is full or they have been idle"""
+        git, working_directory = mock_initialized
+        other_directory = working_directory + "-other"
+        Repo.init(other_directory)
+
+        try:
+            pool = RepoPool(max_size=1)
+            repo = pool.get(working_directory)
+            repo.git.cat_file_all = repo.git._get_persistent_cmd("cat_file_all", "cat_file", batch=True)
+
+            pool.get(other_directory)
+            assert len(pool) == 1
+            assert repo.git.cat_file_all is None
+            assert pool.get(working_directory) is not repo
+
+            pool = RepoPool(idle_timeout=0)
+            repo = pool.get(working_directory)
+            assert pool.get(working_directory) is not repo
+            assert len(pool) == 1
+        finally:
+            shutil.rmtree(other_directory)
+
+    def test_recreated_repo(self, mock_initialized):
+        """Test that a handle isn't reused after the repository is deleted and re-created"""
+        git, working_directory = mock_initialized
+        pool = RepoPool()
+
+        repo = pool.get(working_directory)
+        # Move the old repository aside, rather than deleting it, so its inode can't be reused
+        old_git_dir = working_directory + "-old.git"
+        shutil.move(os.path.join(working_directory, '.git'), old_git_dir)
+        try:
+            Repo.init(working_directory)
+            assert pool.get(working_directory) is not repo
+        finally:
+            shutil.rmtree(old_git_dir)
+
+    def test_git_filesystem(self, mock_initialized):
+        """Test that GitFilesystem instances share a handle when the pool is enabled"""
+        git, working_directory = mock_initialized
+        config = dict(git.config, repo_pool={"max_size": 4, "idle_timeout": 60})
+
+        git1 = GitFilesystem(config)
+        git2 = GitFilesystem(config)
+        assert git1.repo is git2.repo
+        assert GitFilesystem(git.config).repo is not git1.repo
+
+        write_file(git1, "test1.txt", "File number 1\n", commit_msg="commit 1")
+        assert git2.log_entry(git2.commit_hash)["message"] == "commit 1"
+
+    def test_idle_sweep(self, mock_initialized):
+        """Test that idle handles are closed by the sweep timer without further use of the pool"""
+        git, working_directory = mock_initialized
+        pool = RepoPool(idle_timeout=0)
+        repo = pool.get(working_directory)
+        repo.git.cat_file_all = repo.git._get_persistent_cmd("cat_file_all", "cat_file", batch=True)
+
+        pool._sweeper.join()
+        assert len(pool) == 0
+        assert repo.git.cat_file_all is None
+        assert pool._sweeper is None
+
+    def test_discard(self, mock_initialized):
+        """Test that discarding a directory closes its handles in every thread"""
+        git, working_directory = mock_initialized
+        pool = RepoPool()
+        repo = pool.get(working_directory)
+        t = threading.Thread(target=lambda: pool.get(working_directory))
+        t.start()
+        t.join()
+        assert len(pool) == 2
+
+        pool.discard(working_directory)
+        assert len(pool) == 0
+        assert pool.get(working_directory) is not repo
+        pool.clear()
@@ -0,0 +1,80 @@
+# Copyright (c) 2017 FlashX, LLC
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import tempfile
+import shutil
+
+import mock
+import pytest
+
+from lmcommon.gitlib.stat_cache import StatCache, stat_signature
+
+
+@pytest.fixture()
+def scratch_dir():
+    d = tempfile.mkdtemp()
+    yield d
+    shutil.rmtree(d)
+
+
+class TestStatCache(object):
+    def test_load_until_file_changes(self, scratch_dir):
+        """Test that a file is parsed once and re-read when its signature changes"""
+        path = os.path.join(scratch_dir, 'lines.txt')
+        with open(path, 'w') as f:
+            f.write('a\nb\n')
+
+        cache: StatCache[list] = StatCache(2)
+        parse = mock.Mock(side_effect=str.splitlines)
+        with mock.patch('lmcommon.gitlib.stat_cache.RACY_WINDOW', -1.0):
+            assert cache.load(path, parse) == ['a', 'b']
+            assert cache.load(path, parse) == ['a', 'b']
+            assert parse.call_count == 1
+
+            with open(path, 'a') as f:
+                f.write('c\n')
+            assert cache.load(path, parse) == ['a', 'b', 'c']
+            assert parse.call_count == 2
+
+            os.remove(path)
+            assert cache.load(path, parse) is None
+            assert stat_signature(path) is None
+
+    def test_racy_files_not_cached(self, scratch_dir):
+        """Test that files modified within the racy window are re-read"""
+        path = os.path.join(scratch_dir, 'lines.txt')
+        with open(path, 'w') as f:
+            f.write('a\n')
+
+        cache: StatCache[list] = StatCache(2)
+        parse = mock.Mock(side_effect=str.splitlines)
+        assert cache.load(path, parse) == ['a']
+        assert cache.load(path, parse) == ['a']
+        assert parse.call_count == 2
+
+    def test_lru_bound(self):
+        """Test that the least recently used entries are evicted"""
+        cache: StatCache[int] = StatCache(2)
+        for key in ['a', 'b', 'c']:
+            cache.put(key, (1,), ord(key), 0, 100.0)
+        assert cache.get('a', (1,)) is None
+        assert cache.get('b', (2,)) is None
+        assert cache.get('b', (1,)) == ord('b')
+        assert cache.get('c', (1,)) == ord('c')
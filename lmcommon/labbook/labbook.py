@@ -33,11 +33,11 @@ from pkg_resources import resource_filename
 from collections import OrderedDict
 from redis import StrictRedis
 from natsort import natsorted
-from typing import (Any, Dict, List, Optional, Tuple)
+from typing import (Any, Dict, FrozenSet, List, Optional, Tuple)
 
 from lmcommon.configuration import Configuration
 from lmcommon.configuration.utils import call_subprocess
-from lmcommon.gitlib import get_git_interface, GitAuthor, GitRepoInterface
+from lmcommon.gitlib import get_git_interface, GitAuthor, GitRepoInterface, discard_pooled_repo
 from lmcommon.logging import LMLogger
 from lmcommon.labbook.schemas import validate_labbook_schema
 from lmcommon.labbook import shims
@@ -77,6 +77,10 @@ def _check_git_tracked(repo: GitRepoInterface) -> None:
         logger.info("Not checking Git status, appears to be uninitialized.")
         return
 
+    # Only build the full status to report what was found if there are changes
+    if not repo.is_dirty():
+        return
+
     result_status = repo.status()
     # status_key is one of "staged", "unstaged", "untracked"
     for status_key in result_status.keys():
@@ -243,6 +247,8 @@ class LabBook(object):
         # Rename directory
         if self._root_dir:
             base_dir, _ = self._root_dir.rsplit(os.path.sep, 1)
+            # Pooled repo handles hold the old path, so close them before moving the directory
+            discard_pooled_repo(self._root_dir)
             os.rename(self._root_dir, os.path.join(base_dir, value))
         else:
             raise ValueError("Lab Book root dir not specified. Failed to configure git.")
@@ -345,6 +351,15 @@ class LabBook(object):
 
         return self._favorite_keys
 
+    @property
+    def untracked_sections(self) -> FrozenSet[str]:
+        """Property that provides the sections set as untracked in the .gitignore, re-read only when it changes
+
+        Returns:
+            frozenset
+        """
+        return shims.untracked_sections(self.root_dir)
+
     @property
     def has_remote(self):
         """Return True if the Labbook has a remote that it can push/pull to/from
@@ -501,7 +516,7 @@ class LabBook(object):
         Returns:
 
         """
-        result_status = self.git.status()
+        result_status = self.git.status() if self.git.is_dirty() else dict()
         if any([result_status[k] for k in result_status.keys()]):
             self.git.add_all()
             self.git.commit("Sweep of uncommitted changes")
@@ -613,12 +628,9 @@ class LabBook(object):
         or un-tracked files. """
 
         try:
-            result_status = self.git.status()
-            for status_key in result_status.keys():
-                n = result_status.get(status_key)
-                if n:
-                    logger.warning(f"Found {status_key} in {str(self)}: {n}")
-                    return False
+            if self.git.is_dirty():
+                logger.warning(f"Found uncommitted changes or untracked files in {str(self)}")
+                return False
             return True
         except gitdb.exc.BadName as e:
             logger.error(e)
@@ -653,39 +665,39 @@ class LabBook(object):
             logger.error(f"Cannot checkout branch {branch_name}: {e}")
             raise LabbookException(e)
 
-    def get_commits_behind_remote(self, remote_name: str = "origin") -> Tuple[str, int]:
+    def get_commits_behind_remote(self, remote_name: str = "origin", fetch: bool = True) -> Tuple[str, int]:
         """Return the number of commits local branch is behind remote. Note, only works with
         currently checked-out branch.
 
         Args:
             remote_name: Name of remote, e.g., "origin"
+            fetch: Fetch from the remote first. If False, use the remote refs from the last fetch and schedule the
+                   `fetch_labbook_remote` background job to refresh them, so the check never blocks on the network.
 
         Returns:
             tuple containing branch name, and number of commits behind (zero implies up-to-date)
         """
         try:
-            if remote_name in [n['name'] for n in self.git.list_remotes()]:
+            if fetch and remote_name in [n['name'] for n in self.git.list_remotes()]:
                 self.git.fetch(remote=remote_name)
-            result_str = self.git.repo.git.status().replace('\n', ' ')
+            elif not fetch:
+                # Imported here since lmcommon.workflows depends on this module
+                from lmcommon.workflows.core import schedule_remote_refresh
+                schedule_remote_refresh(self, remote=remote_name)
+
+            tracking_branch = self.git.repo.active_branch.tracking_branch()
+            if tracking_branch is None or not tracking_branch.is_valid():
+                # This branch is local-only
+                return self.active_branch, 0
+
+            ahead, behind = self.git.ahead_behind(self.active_branch, tracking_branch.name)
         except Exception as e:
             logger.exception(e)
             raise LabbookException(e)
 
-        logger.info(f"Checking state of branch {self.active_branch}: {result_str}")
-
-        if 'branch is up-to-date' in result_str:
-            return self.active_branch, 0
-        elif 'branch is behind' in result_str:
-            m = re.search(' by ([\d]+) commit', result_str)
-            if m:
-                assert int(m.groups()[0]) > 0
-                return self.active_branch, int(m.groups()[0])
-            else:
-                logger.error("Could not find count in: {result_str}")
-                raise LabbookException("Unable to determine commit behind-count")
-        else:
-            # This branch is local-only
-            return self.active_branch, 0
+        logger.info(f"Checking state of branch {self.active_branch}: {ahead} ahead, {behind} behind "
+                    f"{tracking_branch.name}")
+        return self.active_branch, behind
 
     def add_remote(self, remote_name: str, url: str) -> None:
         """Add a new git remote
@@ -1102,13 +1114,15 @@ class LabBook(object):
                 os.path.join('.gigantum', 'activity', 'importance'),
             ]
 
+            gitkeep_paths = []
             for d in dirs:
                 p = os.path.join(self.root_dir, d, '.gitkeep')
                 os.makedirs(os.path.dirname(p), exist_ok=True)
                 with open(p, 'w') as gk:
                     gk.write("This file is necessary to keep this directory tracked by Git"
                              " and archivable by compression tools. Do not delete or modify!")
-                self.git.add(p)
+                gitkeep_paths.append(p)
+            self.git.add(gitkeep_paths)
 
             # Create labbook.yaml file
             self._save_labbook_data()
@@ -1136,8 +1150,8 @@ class LabBook(object):
             # Commit
             for s in ['code', 'input', 'output', '.gigantum']:
                 self.git.add_all(os.path.join(self.root_dir, s))
-            self.git.add(os.path.join(self.root_dir, ".gigantum", "labbook.yaml"))
-            self.git.add(os.path.join(self.root_dir, ".gitignore"))
+            self.git.add([os.path.join(self.root_dir, ".gigantum", "labbook.yaml"),
+                          os.path.join(self.root_dir, ".gitignore")])
             self.git.create_branch(name="gm.workspace")
 
             # NOTE: this string is used to indicate there are no more activity records to get. Changing the string will
@@ -1291,7 +1305,8 @@ class LabBook(object):
                     try:
                         lb = LabBook()
                         lb.from_directory(dir_path)
-                        lb_item['sort_val'] = lb.git.log(max_count=1)[0]['committed_on']
+                        last_commit = next(lb.git.iter_log(max_count=1, fields=['committed_on']))
+                        lb_item['sort_val'] = last_commit['committed_on']
                     except Exception as e:
                         logger.error(e)
                         continue
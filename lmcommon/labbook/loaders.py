@@ -11,6 +11,18 @@ from lmcommon.logging import LMLogger
 logger = LMLogger.get_logger()
 
 
+def _schedule_lfs_prefetch(labbook: LabBook) -> None:
+    """Dispatch a background job to hydrate the LFS files touched by recent commits of a lazily cloned labbook. """
+    try:
+        # Imported here since the jobs module itself depends on lmcommon.labbook
+        from lmcommon.dispatcher import jobs
+        from lmcommon.dispatcher.dispatcher import Dispatcher
+        Dispatcher().dispatch_task(jobs.prefetch_lfs_objects, args=(labbook.root_dir,),
+                                   metadata={'labbook': labbook.root_dir, 'method': 'prefetch_lfs_objects'})
+    except Exception as e:
+        logger.warning(f"Could not schedule LFS prefetch for {str(labbook)}: {e}")
+
+
 def from_remote(remote_url: str, username: str, owner: str,
                 labbook_name: str, labbook: Optional[LabBook] = None,
                 make_owner: bool = False) -> LabBook:
@@ -48,11 +60,26 @@ def from_remote(remote_url: str, username: str, owner: str,
 
     os.makedirs(lb_dir, exist_ok=True)
 
+    clone_config = labbook.labmanager_config.config["git"].get("clone") or {}
+    depth = clone_config.get("depth") or None
+    depth_args = ['--depth', str(depth), '--no-single-branch'] if depth else []
+    lfs_lazy = labbook.labmanager_config.config["git"]["lfs_enabled"] is True and clone_config.get("lfs_lazy") is True
+
     if labbook.labmanager_config.config["git"]["lfs_enabled"] is True:
-        logger.info(f"Cloning labbook with `git lfs clone ...` from remote `{remote_url}` into `{est_root_dir}...")
+        logger.info(f"Cloning labbook with {'lazy LFS' if lfs_lazy else '`git lfs clone ...`'} from remote "
+                    f"`{remote_url}` into `{est_root_dir}...")
         t0 = time.time()
         try:
-            call_subprocess(['git', 'lfs', 'clone', remote_url], cwd=lb_dir)
+            if lfs_lazy:
+                # Leave LFS files as pointers, now and on later checkouts/pulls. FileOperations.get_file_path
+                # hydrates them on first access, and exports hydrate everything.
+                call_subprocess(['git', 'clone', *depth_args, remote_url], cwd=lb_dir,
+                                env={'GIT_LFS_SKIP_SMUDGE': '1'})
+                call_subprocess(['git', 'lfs', 'install', '--local', '--skip-smudge'], cwd=est_root_dir)
+                # Pushes must not fail on LFS objects that were never downloaded
+                call_subprocess(['git', 'config', 'lfs.allowincompletepush', 'true'], cwd=est_root_dir)
+            else:
+                call_subprocess(['git', 'lfs', 'clone', *depth_args, remote_url], cwd=lb_dir)
             labbook.git.set_working_directory(est_root_dir)
         except subprocess.CalledProcessError as e:
             logger.error(e)
@@ -61,7 +88,7 @@ def from_remote(remote_url: str, username: str, owner: str,
             raise
         logger.info(f"Git LFS cloned from `{remote_url}` in {time.time()-t0}s")
     else:
-        labbook.git.clone(remote_url, directory=est_root_dir)
+        labbook.git.clone(remote_url, directory=est_root_dir, depth=depth)
         labbook.git.fetch()
 
     # NOTE!! using self.checkout_branch fails w/Git error:
@@ -72,6 +99,11 @@ def from_remote(remote_url: str, username: str, owner: str,
     labbook._set_root_dir(est_root_dir)
     labbook._load_labbook_data()
 
+    # Index the cloned history so ancestry queries don't have to parse every commit. Imported here since
+    # lmcommon.workflows depends on lmcommon.labbook
+    from lmcommon.workflows.core import git_refresh_commit_graph
+    git_refresh_commit_graph(labbook)
+
     with labbook.lock_labbook():
         logger.info(f"Checking out gm.workspace-{username}")
         if f'origin/gm.workspace-{username}' in labbook.get_branches()['remote']:
@@ -79,6 +111,9 @@ def from_remote(remote_url: str, username: str, owner: str,
         else:
             labbook.checkout_branch(f"gm.workspace-{username}", new=True)
 
+    if lfs_lazy:
+        _schedule_lfs_prefetch(labbook)
+
     if make_owner:
         with labbook.lock_labbook():
             logger.info(f"Cloning public repo; changing owner to {username}")
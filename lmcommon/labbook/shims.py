@@ -18,13 +18,18 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import os
-from typing import Any, Callable, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
 
+from lmcommon.gitlib.stat_cache import StatCache
 from lmcommon.logging import LMLogger
 from lmcommon.activity import ActivityAction, ActivityRecord, ActivityDetailRecord, ActivityType
 
 logger = LMLogger.get_logger()
 
+# Untracked sections keyed by .gitignore path, stored with the stat signature of the .gitignore they were parsed from
+UNTRACKED_CACHE_SIZE = 256
+_untracked_cache: StatCache[FrozenSet[str]] = StatCache(UNTRACKED_CACHE_SIZE)
+
 
 def process_sweep_status(result_obj: ActivityRecord, status: Dict[str, Any],
                          section_infer_method: Callable) -> Tuple[ActivityRecord, int, int]:
@@ -133,12 +138,30 @@ def to_workspace_branch(labbook, username: Optional[str] = None) -> str:
     return labbook.active_branch
 
 
+def _parse_untracked_sections(gitignore_text: str) -> FrozenSet[str]:
+    gitignore_lines = set(l.strip() for l in gitignore_text.splitlines())
+    return frozenset(l[:-2] for l in gitignore_lines
+                     if l.endswith('/*') and f'!{l[:-2]}/.gitkeep' in gitignore_lines)
+
+
+def untracked_sections(labbook_root: str) -> FrozenSet[str]:
+    """ Return the sections of a labbook that are set as untracked in its .gitignore.
+
+    The .gitignore is parsed once and reused until its stat signature changes, so this costs a single stat per call.
+
+    Args:
+         labbook_root: Root directory of labbook
+
+    Returns:
+        Names of the untracked sections
+    """
+    sections = _untracked_cache.load(os.path.join(labbook_root, '.gitignore'), _parse_untracked_sections)
+    return sections if sections is not None else frozenset()
+
+
 def in_untracked(labbook_root: str, section: str) -> bool:
     """ Query whether the given section for a labbook root dir is tracked in Git.
 
-    THIS IS A DUPLICATE TO AVOID A CIRCULAR DEPENDENCY.
-    This will get removed once the file operations are factored out of labbook.py
-
     Args:
          labbook_root: Root directory of labbook
          section: Section to check if tracked or not
@@ -146,12 +169,4 @@ def in_untracked(labbook_root: str, section: str) -> bool:
     Returns:
         True if the given section is untracked (as workaround for Git performance).
     """
-    gitignore_path = os.path.join(labbook_root, '.gitignore')
-    if not os.path.exists(gitignore_path):
-        return False
-    gitignore_lines = [l.strip() for l in open(gitignore_path).readlines()]
-    target_lines = [f'{section}/*', f'!{section}/.gitkeep']
-    if all([a in gitignore_lines for a in target_lines]):
-        return True
-    else:
-        return False
+    return section in untracked_sections(labbook_root)
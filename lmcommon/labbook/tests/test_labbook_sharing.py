@@ -20,6 +20,7 @@
 
 import pytest
 import os
+import mock
 
 
 from lmcommon.labbook import LabBook, LabbookException
@@ -140,6 +141,29 @@ class TestLabBook(object):
         # This is 2, in order to account for the notes entry.
         assert r[1] == 2
 
+    def test_count_commits_behind_remote_without_fetch(self, mock_config_file, remote_labbook_repo,
+                                                       mock_labbook_lfs_disabled):
+        # Without fetching, the count reflects the remote refs as of the last fetch, and a background fetch is
+        # scheduled to refresh them.
+        lb = mock_labbook_lfs_disabled[2]
+        lb.add_remote("origin", remote_labbook_repo)
+        lb.checkout_branch("testing-branch")
+        with mock.patch('lmcommon.workflows.core.schedule_remote_refresh') as schedule:
+            assert lb.get_commits_behind_remote("origin", fetch=False) == ('testing-branch', 0)
+            assert schedule.call_count == 1
+
+            remote_lb = LabBook(mock_config_file[0])
+            remote_lb.from_directory(remote_labbook_repo)
+            remote_lb.checkout_branch("testing-branch")
+            FileOperations.delete_file(remote_lb, "code", "codefile.c")
+
+            assert lb.get_commits_behind_remote("origin", fetch=False) == ('testing-branch', 0)
+            lb.git.fetch(remote="origin")
+            assert lb.get_commits_behind_remote("origin", fetch=False) == ('testing-branch', 2)
+
+            assert lb.get_commits_behind_remote("origin") == ('testing-branch', 2)
+            assert schedule.call_count == 3
+
     def test_count_commits_behind_remote_when_no_change(self, mock_config_file, remote_labbook_repo,
                                                         mock_labbook_lfs_disabled):
         # When the branch is up to date, ensure it doesn't report being behind.
@@ -164,6 +164,11 @@ class BranchManager(object):
                     call_subprocess(['git', 'merge', '-s', 'recursive', '-X', 'theirs', other_branch],
                                     cwd=self.labbook.root_dir)
                 else:
+                    # Detect conflicts in memory first, so a conflicting merge never touches the working tree
+                    conflicts = self.labbook.git.preview_merge(self.active_branch, other_branch)
+                    if conflicts:
+                        logger.error(f"Merge conflict syncing {str(self.labbook)} - Use `force` to overwrite.")
+                        raise BranchException(f"Cannot merge - conflicts in {', '.join(conflicts)}")
                     try:
                         call_subprocess(['git', 'merge', other_branch], cwd=self.labbook.root_dir)
                     except (git.exc.GitCommandError, subprocess.CalledProcessError) as merge_error:
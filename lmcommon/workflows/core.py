@@ -18,14 +18,18 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 import subprocess
+import tempfile
 import time
 import os
-from typing import Optional
+from typing import Any, Dict, List, Optional
+
+from rq import get_current_job
 
 from lmcommon.gitlib.gitlab import GitLabManager
 from lmcommon.labbook import LabBook, LabbookException, LabbookMergeException
 from lmcommon.logging import LMLogger
 from lmcommon.configuration.utils import call_subprocess
+from lmcommon.files import utils as files_utils
 
 logger = LMLogger.get_logger()
 
@@ -68,6 +72,266 @@ def git_garbage_collect(labbook: LabBook) -> None:
         logger.warning(f"Ignore `git gc` error - {str(labbook)} repo remains unpruned")
 
 
+def _maintenance_config(labbook: LabBook) -> dict:
+    """Return the git maintenance settings from the labmanager config, with defaults filled in. """
+    cfg = {'enabled': True, 'min_interval': 3600}
+    cfg.update(labbook.labmanager_config.config['git'].get('maintenance') or {})
+    return cfg
+
+
+def _maintenance_stamp_path(labbook: LabBook) -> str:
+    return os.path.join(labbook.root_dir, '.git', 'lmcommon-maintenance')
+
+
+def git_refresh_commit_graph(labbook: LabBook) -> None:
+    """Extend the repo's commit-graph with any commits it does not cover yet. Call this after commits are
+    created in bulk (clone, import, pull) so ancestry queries and push/pull negotiation stay fast between
+    maintenance runs. Errors (e.g., a git too old to support split commit-graphs) are logged and ignored.
+
+    Args:
+        labbook: Subject LabBook
+
+    Returns:
+        None
+    """
+    if os.environ.get('WINDOWS_HOST'):
+        return
+
+    try:
+        labbook.git.write_commit_graph()
+    except Exception as e:
+        logger.warning(f"Ignore commit-graph write error in {str(labbook)}: {e}")
+
+
+def git_maintenance_due(labbook: LabBook) -> bool:
+    """Return True if background maintenance is enabled and has not run within the configured interval.
+
+    Args:
+        labbook: Subject LabBook
+
+    Returns:
+        bool
+    """
+    cfg = _maintenance_config(labbook)
+    if not cfg['enabled'] or os.environ.get('WINDOWS_HOST'):
+        return False
+
+    try:
+        last_run = os.path.getmtime(_maintenance_stamp_path(labbook))
+    except OSError:
+        return True
+    return time.time() - last_run >= float(cfg['min_interval'])
+
+
+def git_maintenance(labbook: LabBook, force: bool = False) -> bool:
+    """Run incremental, rate-limited maintenance over the repo: pack loose objects into a new pack, let
+    `git gc --auto` decide whether packs need to be consolidated, write a multi-pack-index with a reachability
+    bitmap covering all packs, and refresh the commit-graph.
+
+    Unlike `git_garbage_collect` this is safe to run without holding the labbook lock, since every step
+    only adds packs or relies on git's own lock files. It is normally run by the `run_git_maintenance` job.
+
+    Args:
+        labbook: Subject LabBook
+        force: Run even if maintenance already ran within the configured interval
+
+    Returns:
+        bool: True if maintenance ran, False if it was skipped
+    """
+    if not force and not git_maintenance_due(labbook):
+        return False
+    if os.environ.get('WINDOWS_HOST'):
+        logger.warning(f"Avoiding git maintenance in {str(labbook)} on Windows host fs")
+        return False
+
+    # Touch the stamp first, so concurrent schedulers see the project as recently maintained
+    with open(_maintenance_stamp_path(labbook), 'a'):
+        os.utime(_maintenance_stamp_path(labbook), None)
+
+    t0 = time.time()
+    steps = [['git', 'repack', '-d', '-l', '-q'],
+             ['git', '-c', 'gc.autoDetach=false', '-c', 'repack.writeBitmaps=true', 'gc', '--auto', '--quiet'],
+             # The multi-pack bitmap lets pushes and reachability checks skip object walks even when the
+             # objects are spread over several incremental packs.
+             ['git', 'multi-pack-index', 'write', '--bitmap']]
+    for tokens in steps:
+        try:
+            call_subprocess(tokens, cwd=labbook.root_dir)
+        except subprocess.CalledProcessError:
+            logger.warning(f"Ignore `{' '.join(tokens)}` error in {str(labbook)}")
+    git_refresh_commit_graph(labbook)
+
+    logger.info(f"Ran git maintenance in {str(labbook)} in {time.time()-t0:.2f}s")
+    return True
+
+
+def schedule_git_maintenance(labbook: LabBook) -> None:
+    """Dispatch the background maintenance job for the labbook if it is due. Never raises, since this is
+    called at the end of user-facing operations that have already succeeded.
+
+    Args:
+        labbook: Subject LabBook
+
+    Returns:
+        None
+    """
+    try:
+        if not git_maintenance_due(labbook):
+            return
+
+        # Imported here since the jobs module itself depends on lmcommon.workflows
+        from lmcommon.dispatcher import jobs
+        from lmcommon.dispatcher.dispatcher import Dispatcher
+        Dispatcher().dispatch_task(jobs.run_git_maintenance, args=(labbook.root_dir,),
+                                   metadata={'labbook': labbook.root_dir, 'method': 'run_git_maintenance'})
+    except Exception as e:
+        logger.warning(f"Could not schedule git maintenance for {str(labbook)}: {e}")
+
+
+def _remote_refresh_config(labbook: LabBook) -> dict:
+    """Return the background remote fetch settings from the labmanager config, with defaults filled in. """
+    cfg = {'enabled': True, 'min_interval': 60}
+    cfg.update(labbook.labmanager_config.config['git'].get('remote_refresh') or {})
+    return cfg
+
+
+def _remote_refresh_stamp_path(labbook: LabBook) -> str:
+    return os.path.join(labbook.root_dir, '.git', 'lmcommon-remote-refresh')
+
+
+def _touch_remote_refresh_stamp(labbook: LabBook) -> None:
+    stamp_path = _remote_refresh_stamp_path(labbook)
+    with open(stamp_path, 'a'):
+        os.utime(stamp_path, None)
+
+
+def schedule_remote_refresh(labbook: LabBook, remote: str = "origin") -> None:
+    """Dispatch the `fetch_labbook_remote` job for the labbook, at most once per configured interval, so
+    sync status checks that skip the fetch (`LabBook.get_commits_behind_remote(fetch=False)`) see remote
+    refs that are at most that old. Never raises, since it is called from read-only status queries.
+
+    Args:
+        labbook: Subject LabBook
+        remote: Name of the git remote
+
+    Returns:
+        None
+    """
+    try:
+        cfg = _remote_refresh_config(labbook)
+        if not cfg['enabled'] or remote not in [n['name'] for n in labbook.git.list_remotes()]:
+            return
+
+        stamp_path = _remote_refresh_stamp_path(labbook)
+        try:
+            if time.time() - os.path.getmtime(stamp_path) < float(cfg['min_interval']):
+                return
+        except OSError:
+            pass
+
+        # Touch the stamp first, so concurrent status checks do not dispatch duplicate fetches
+        _touch_remote_refresh_stamp(labbook)
+
+        # Imported here since the jobs module itself depends on lmcommon.workflows
+        from lmcommon.dispatcher import jobs
+        from lmcommon.dispatcher.dispatcher import Dispatcher
+        Dispatcher().dispatch_task(jobs.fetch_labbook_remote, args=(labbook.root_dir, remote),
+                                   metadata={'labbook': labbook.root_dir, 'method': 'fetch_labbook_remote'})
+    except Exception as e:
+        logger.warning(f"Could not schedule remote fetch for {str(labbook)}: {e}")
+
+
+def lfs_is_lazy(labbook: LabBook) -> bool:
+    """Return True if the labbook was cloned with lazy LFS, so LFS files stay pointers until they are hydrated
+    by FileOperations.hydrate.
+
+    Args:
+        labbook: Subject LabBook
+
+    Returns:
+        bool
+    """
+    return files_utils.lfs_is_lazy(labbook.root_dir)
+
+
+def parse_lfs_progress(lines: List[str]) -> Dict[str, Any]:
+    """Summarize the lines git-lfs writes to its GIT_LFS_PROGRESS file. Each line has the form
+    "<direction> <file index>/<total files> <bytes so far>/<file bytes> <name>".
+
+    Args:
+        lines: Progress lines written so far
+
+    Returns:
+        dict with direction, objects_done, objects_total, bytes_done and bytes_total
+    """
+    direction = None
+    objects_total = 0
+    file_bytes: Dict[str, List[int]] = dict()
+    for line in lines:
+        tokens = line.split(' ', 3)
+        if len(tokens) != 4 or '/' not in tokens[1] or '/' not in tokens[2]:
+            continue
+        try:
+            objects_total = max(objects_total, int(tokens[1].split('/')[1]))
+            file_bytes[tokens[3]] = [int(b) for b in tokens[2].split('/')]
+        except ValueError:
+            continue
+        direction = tokens[0]
+
+    return {'direction': direction,
+            'objects_done': sum(1 for done, total in file_bytes.values() if done >= total),
+            'objects_total': objects_total,
+            'bytes_done': sum(done for done, _ in file_bytes.values()),
+            'bytes_total': sum(total for _, total in file_bytes.values())}
+
+
+def run_lfs_transfer(labbook: LabBook, lfs_args: List[str]) -> None:
+    """Run a `git lfs` transfer command with the configured number of concurrent transfers. While it runs,
+    progress (objects, bytes and rate) is published to the meta of the current background job, if any.
+
+    Args:
+        labbook: Subject LabBook
+        lfs_args: Arguments to `git lfs`, e.g., ['push', 'origin', 'gm.workspace']
+
+    Returns:
+        None
+
+    Raises:
+        subprocess.CalledProcessError when the transfer fails.
+    """
+    concurrency = labbook.labmanager_config.config['git'].get('lfs_concurrent_transfers') or 8
+    tokens = ['git', '-c', f'lfs.concurrenttransfers={concurrency}', 'lfs', *lfs_args]
+    job = get_current_job()
+
+    def report_progress(progress_path: str, elapsed: float) -> None:
+        if not job or not os.path.exists(progress_path):
+            return
+        with open(progress_path, 'rt') as progress_file:
+            progress = parse_lfs_progress(progress_file.read().splitlines())
+        progress['rate'] = progress['bytes_done'] / elapsed if elapsed > 0 else 0
+        job.meta['lfs_progress'] = progress
+        job.save_meta()
+
+    logger.info(f"Running `{' '.join(tokens)}` in {str(labbook)}")
+    t0 = time.time()
+    with tempfile.TemporaryDirectory() as tempdir:
+        progress_path = os.path.join(tempdir, 'lfs-progress')
+        proc = subprocess.Popen(tokens, cwd=labbook.root_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                env=dict(os.environ, GIT_LFS_PROGRESS=progress_path))
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=1.0)
+                break
+            except subprocess.TimeoutExpired:
+                report_progress(progress_path, time.time() - t0)
+        report_progress(progress_path, time.time() - t0)
+
+    if proc.returncode != 0:
+        logger.error(f"Command failed `{' '.join(tokens)}` in {str(labbook)}: stderr={stderr}")
+        raise subprocess.CalledProcessError(proc.returncode, tokens, output=stdout, stderr=stderr)
+    logger.info(f"Ran in {str(labbook)} `git lfs {' '.join(lfs_args)}` in {time.time()-t0:.2f}s")
+
+
 def push(labbook: LabBook, remote: str) -> None:
     """Push commits to a remote git repository. Assume current working branch.
 
@@ -129,8 +393,6 @@ def publish_to_remote(labbook: LabBook, username: str, remote: str) -> None:
     if 'gm.workspace' not in labbook.get_branches()['local']:
         raise ValueError('Branch gm.workspace does not exist in local Labbook branches')
 
-    git_garbage_collect(labbook)
-
     # Try five attempts to fetch - the remote repo could have been created just milliseconds
     # ago, so may need a few moments to settle before it supports all the git operations.
     for tr in range(5):
@@ -142,30 +404,31 @@ def publish_to_remote(labbook: LabBook, username: str, remote: str) -> None:
             time.sleep(1)
     else:
         raise ValueError(f"Timed out trying to fetch repo for {str(labbook)}")
+    # The refs were just refreshed, so the status check below need not schedule another fetch
+    _touch_remote_refresh_stamp(labbook)
 
     # Make sure user's workspace is synced (in case they are working on it on other machines)
-    if labbook.get_commits_behind_remote(remote_name=remote)[1] > 0:
+    if labbook.get_commits_behind_remote(remote_name=remote, fetch=False)[1] > 0:
         raise ValueError(f'Cannot publish since {labbook.active_branch} is not synced')
 
     # Make sure the master workspace is synced before attempting to publish.
-    labbook.checkout_branch("gm.workspace")
+    remote_workspace = f'{remote}/gm.workspace'
+    if remote_workspace in labbook.get_branches()['remote'] \
+            and labbook.git.ahead_behind('gm.workspace', remote_workspace)[1] > 0:
+        raise ValueError('Cannot publish since gm.workspace is not synced')
 
-    if labbook.get_commits_behind_remote(remote_name=remote)[1] > 0:
-        raise ValueError(f'Cannot publish since {labbook.active_branch} is not synced')
+    # Now, it should be safe to pull the user's workspace into the master workspace. This is done in memory
+    # without checking out gm.workspace, so the working tree is never rewritten.
+    labbook.git.merge_into('gm.workspace', f'gm.workspace-{username}', message=f"Merged gm.workspace-{username}")
 
-    # Now, it should be safe to pull the user's workspace into the master workspace.
-    call_subprocess(['git', 'merge', f'gm.workspace-{username}'], cwd=labbook.root_dir)
-    labbook.git.add_all(labbook.root_dir)
-    labbook.git.commit(f"Merged gm.workspace-{username}")
+    if labbook.labmanager_config.config["git"]["lfs_enabled"] is True:
+        # Without --all, only objects referenced by commits the remote doesn't have yet are pushed. This has to
+        # run before the refs are pushed, since the remote-tracking refs mark which commits the remote has.
+        run_lfs_transfer(labbook, ['push', 'origin', 'gm.workspace'])
 
     call_subprocess(['git', 'push', '--set-upstream', 'origin', 'gm.workspace'], cwd=labbook.root_dir)
 
-    if labbook.labmanager_config.config["git"]["lfs_enabled"] is True:
-        t0 = time.time()
-        call_subprocess(['git', 'lfs', 'push', '--all', 'origin', 'gm.workspace'], cwd=labbook.root_dir)
-        logger.info(f"Ran in {str(labbook)} `git lfs push --all` in {t0-time.time()}s")
-    # Return to the user's workspace, merge it with the global workspace (as a precaution)
-    labbook.checkout_branch(branch_name=f'gm.workspace-{username}')
+    schedule_git_maintenance(labbook)
 
 
 def sync_with_remote(labbook: LabBook, username: str, remote: str, force: bool) -> int:
@@ -200,7 +463,6 @@ def sync_with_remote(labbook: LabBook, username: str, remote: str, force: bool)
         logger.info(f"Syncing {str(labbook)} for user {username} to remote {remote}")
         with labbook.lock_labbook():
             labbook.sweep_uncommitted_changes()
-            git_garbage_collect(labbook)
 
             tokens = ['git', 'pull', '--commit', 'origin', 'gm.workspace']
             tokens_force = ['git', 'pull', '--commit', '-s', 'recursive', '-X', 'theirs', 'origin',
@@ -209,8 +471,8 @@ def sync_with_remote(labbook: LabBook, username: str, remote: str, force: bool)
             checkpoint = labbook.git.commit_hash
             try:
                 call_subprocess(tokens if not force else tokens_force, cwd=labbook.root_dir)
-                if labbook.labmanager_config.config["git"]["lfs_enabled"] is True:
-                    call_subprocess(['git', 'lfs', 'pull', 'origin', 'gm.workspace'], cwd=labbook.root_dir)
+                if labbook.labmanager_config.config["git"]["lfs_enabled"] is True and not lfs_is_lazy(labbook):
+                    run_lfs_transfer(labbook, ['pull', 'origin', 'gm.workspace'])
             except subprocess.CalledProcessError as x:
                 logger.error(f"{str(labbook)} cannot merge with remote; resetting to revision {checkpoint}...")
                 call_subprocess(['git', 'merge', '--abort'], cwd=labbook.root_dir)
@@ -218,18 +480,18 @@ def sync_with_remote(labbook: LabBook, username: str, remote: str, force: bool)
                 raise LabbookMergeException('Merge conflict pulling upstream changes')
 
             checkpoint2 = labbook.git.commit_hash
-            # TODO - A lot of this can be removed
-            call_subprocess(['git', 'checkout', 'gm.workspace'], cwd=labbook.root_dir)
-            call_subprocess(['git', 'merge', f'gm.workspace-{username}'], cwd=labbook.root_dir)
-            call_subprocess(['git', 'push', 'origin', 'gm.workspace'], cwd=labbook.root_dir)
+            # Update gm.workspace in memory rather than checking it out to merge
+            labbook.git.merge_into('gm.workspace', f'gm.workspace-{username}')
             if labbook.labmanager_config.config["git"]["lfs_enabled"] is True:
-                t0 = time.time()
-                call_subprocess(['git', 'lfs', 'push', '--all', 'origin', 'gm.workspace'], cwd=labbook.root_dir)
-                logger.info(f'Ran in {str(labbook)} `git lfs push all` in {t0-time.time()}s')
-            labbook.checkout_branch(f"gm.workspace-{username}")
+                run_lfs_transfer(labbook, ['push', 'origin', 'gm.workspace'])
+            call_subprocess(['git', 'push', 'origin', 'gm.workspace'], cwd=labbook.root_dir)
 
             updates = 0 if checkpoint == checkpoint2 else 1
 
+        if updates:
+            git_refresh_commit_graph(labbook)
+        schedule_git_maintenance(labbook)
+
         # Return 1 if there have been updates made
         return updates
 
@@ -260,19 +522,16 @@ def sync_locally(labbook: LabBook, username: Optional[str] = None) -> None:
         with labbook.lock_labbook():
             labbook.sweep_uncommitted_changes()
 
-            git_garbage_collect(labbook)
-
             if username and f"gm.workspace-{username}" not in labbook.get_branches()['local']:
                 labbook.checkout_branch("gm.workspace")
                 labbook.checkout_branch(f"gm.workspace-{username}", new=True)
                 labbook.git.merge("gm.workspace")
                 labbook.git.commit(f"Created and merged new user workspace gm.workspace-{username}")
             else:
-                orig_branch = labbook.active_branch
-                labbook.checkout_branch("gm.workspace")
-                labbook.git.merge(orig_branch)
-                labbook.git.commit(f"Merged from local workspace")
-                labbook.checkout_branch(orig_branch)
+                # Merge in memory, so the working tree is left alone
+                labbook.git.merge_into("gm.workspace", labbook.active_branch, message="Merged from local workspace")
+
+        schedule_git_maintenance(labbook)
     except Exception as e:
         logger.error(e)
         raise LabbookException(e)
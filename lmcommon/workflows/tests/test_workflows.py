@@ -24,7 +24,9 @@ import os
 
 
 from lmcommon.labbook import LabBook, loaders
-from lmcommon.workflows import GitWorkflow, MergeError
+from lmcommon.workflows import GitWorkflow, MergeError, sync_locally
+from lmcommon.workflows.core import (git_maintenance, git_maintenance_due, schedule_git_maintenance,
+                                     schedule_remote_refresh, parse_lfs_progress)
 from lmcommon.files import FileOperations
 from lmcommon.fixtures import (mock_config_file, mock_labbook_lfs_disabled, mock_duplicate_labbook, remote_bare_repo,
                                sample_src_file, _MOCK_create_remote_repo2 as _MOCK_create_remote_repo,
@@ -230,4 +232,82 @@ class TestLabbookShareProtocol(object):
         test_wf.sync('test')
         assert os.path.exists(os.path.join(test_user_lb.root_dir, 'input/stuff-for-inputs-yyy'))
         assert not os.path.exists(os.path.join(test_user_lb.root_dir, 'code', 'testy-tracked-dir'))
-        assert test_user_lb.active_branch == "gm.workspace-test"
\ No newline at end of file
+        assert test_user_lb.active_branch == "gm.workspace-test"
+
+
+class TestSyncLocally(object):
+
+    def test_sync_locally_merges_without_checkout(self, mock_labbook_lfs_disabled):
+        lb = mock_labbook_lfs_disabled[2]
+        FileOperations.makedir(lb, relative_path='code/sync-dir', create_activity_record=True)
+        head = lb.git.commit_hash
+        assert lb.git.ahead_behind('gm.workspace', 'gm.workspace-test')[1] > 0
+
+        sync_locally(lb, username='test')
+
+        assert lb.active_branch == 'gm.workspace-test'
+        assert lb.git.commit_hash == head
+        assert lb.git.ahead_behind('gm.workspace', 'gm.workspace-test')[1] == 0
+        assert os.path.exists(os.path.join(lb.root_dir, 'code', 'sync-dir'))
+
+
+class TestGitMaintenance(object):
+
+    def test_maintenance_rate_limited(self, mock_labbook_lfs_disabled):
+        lb = mock_labbook_lfs_disabled[2]
+        FileOperations.makedir(lb, relative_path='code/maint-dir', create_activity_record=True)
+
+        assert git_maintenance_due(lb)
+        assert git_maintenance(lb) is True
+        info_dir = os.path.join(lb.root_dir, '.git', 'objects', 'info')
+        assert os.path.exists(os.path.join(info_dir, 'commit-graphs', 'commit-graph-chain'))
+        pack_dir = os.path.join(lb.root_dir, '.git', 'objects', 'pack')
+        assert os.path.exists(os.path.join(pack_dir, 'multi-pack-index'))
+        assert any(f.endswith('.bitmap') for f in os.listdir(pack_dir))
+        # All loose objects are now in a pack
+        loose = [d for d in os.listdir(os.path.join(lb.root_dir, '.git', 'objects')) if len(d) == 2]
+        assert not any(os.listdir(os.path.join(lb.root_dir, '.git', 'objects', d)) for d in loose)
+
+        assert not git_maintenance_due(lb)
+        assert git_maintenance(lb) is False
+        assert git_maintenance(lb, force=True) is True
+
+    def test_schedule_only_when_due(self, mock_labbook_lfs_disabled):
+        lb = mock_labbook_lfs_disabled[2]
+        with mock.patch('lmcommon.dispatcher.Dispatcher.dispatch_task') as dispatch:
+            schedule_git_maintenance(lb)
+            assert dispatch.call_count == 1
+            assert dispatch.call_args[1]['args'] == (lb.root_dir,)
+
+            git_maintenance(lb)
+            schedule_git_maintenance(lb)
+            assert dispatch.call_count == 1
+
+    def test_schedule_remote_refresh_rate_limited(self, mock_labbook_lfs_disabled, remote_bare_repo):
+        lb = mock_labbook_lfs_disabled[2]
+        with mock.patch('lmcommon.dispatcher.Dispatcher.dispatch_task') as dispatch:
+            # Nothing to fetch without the remote
+            schedule_remote_refresh(lb)
+            assert dispatch.call_count == 0
+
+            lb.add_remote("origin", remote_bare_repo)
+            schedule_remote_refresh(lb)
+            assert dispatch.call_count == 1
+            assert dispatch.call_args[1]['args'] == (lb.root_dir, 'origin')
+
+            schedule_remote_refresh(lb)
+            assert dispatch.call_count == 1
+
+
+class TestLfsProgress(object):
+
+    def test_parse_lfs_progress(self):
+        lines = ["upload 1/3 100/1000 input/a.dat",
+                 "upload 1/3 1000/1000 input/a.dat",
+                 "upload 2/3 500/2000 input/b b.dat",
+                 "garbage line",
+                 "upload 3/3 10/10 input/c.dat"]
+        assert parse_lfs_progress(lines) == {'direction': 'upload', 'objects_done': 2, 'objects_total': 3,
+                                             'bytes_done': 1510, 'bytes_total': 3010}
+        assert parse_lfs_progress([]) == {'direction': None, 'objects_done': 0, 'objects_total': 0,
+                                          'bytes_done': 0, 'bytes_total': 0}
@@ -40,6 +40,7 @@ setup(
     include_package_data=True,
     author='Gigantum/FlashX LLC',
     install_requires=install_requires,
+    extras_require={'libgit2': ['pygit2==1.6.1']},
     dependency_links=dependency_links,
     author_email='hello@gigantum.io'
 )